@@ -10,7 +10,24 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 import pickle
+import threading
+import time
 import warnings
+import os
+import sys
+from collections import OrderedDict
+
+# Módulos compartidos del pipeline (src/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from interpretar_resultados import categorizar
+from almacenamiento import columnas_tabla, leer_tabla, ruta_parquet, ruta_particionada
+from transformador import cargar_transformador, fuera_de_rango, transformar, vector_entrada
+from explicaciones import cargar_cache_explicaciones, explicar_municipio, explicar_escenario
+from cache_compartido import objeto_compartido, tabla_compartida
+import umbrales_riesgo
+from umbrales_riesgo import (ESTRATIFICACION, calcular_umbrales, columna_mortalidad_fetal, columnas_indicadores,
+                             puntuar_riesgo, tabla_estratos, umbrales_estratificados, umbrales_por_fila,
+                             umbrales_por_partes)
 
 warnings.filterwarnings('ignore')
 
@@ -162,16 +179,20 @@ st.markdown("""
 # Rutas
 DATA_DIR = 'data/processed/'
 MODEL_DIR = 'models/'
+FEATURES_FILE = f'{DATA_DIR}features_municipio_anio.csv'
+
+DPTOS_MAP = {50: 'Meta', 81: 'Arauca', 85: 'Casanare', 95: 'Guaviare', 99: 'Vichada'}
+CODIGOS_DPTO = {nombre: codigo for codigo, nombre in DPTOS_MAP.items()}
+MIN_NACIMIENTOS = 10  # criterio de validez estadística (OMS)
+MAX_VISTAS = 64  # combinaciones año × departamento en memoria por proceso
+
+# Colores del mapa por mortalidad fetal (‰): Verde <10, Amarillo <30, Naranja <50, Rojo
+TABLA_COLOR_MAPA = ([10.0, 30.0, 50.0], ['#27AE60', '#F39C12', '#E67E22', '#E74C3C'])
 
 # ============================================================================
 # CARGA DE DATOS
 # ============================================================================
 
-@st.cache_data
-def cargar_datos():
-    """Carga datos principales"""
-    return pd.read_csv(f'{DATA_DIR}features_municipio_anio.csv')
-
 @st.cache_data
 def cargar_coordenadas():
     """Carga coordenadas de municipios desde DIVIPOLA"""
@@ -202,44 +223,67 @@ def cargar_coordenadas():
         st.sidebar.warning(f"Nota: No se pudo cargar mapa geográfico ({str(e)})")
         return None
 
+@st.cache_data
+def cargar_pronostico():
+    """Carga el pronóstico P10/P50/P90 del año siguiente (src/pronostico.py), si existe"""
+    try:
+        return leer_tabla(f'{DATA_DIR}pronostico_municipio.csv')
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource
+def cargar_explicaciones():
+    """Caché de atribuciones TreeSHAP precalculada en el entrenamiento (src/explicaciones.py), si existe"""
+    try:
+        return cargar_cache_explicaciones(MODEL_DIR)
+    except Exception:
+        return None
+
+def _leer_pickle(ruta):
+    with open(ruta, 'rb') as f:
+        return pickle.load(f)
+
 @st.cache_resource
 def cargar_modelo():
-    """Carga modelo de predicción"""
+    """Carga modelo de predicción (compartido entre réplicas, ver cache_compartido.py)"""
+    archivos = [f'{MODEL_DIR}modelo_mortalidad_xgb.pkl', f'{MODEL_DIR}transformador_features.pkl']
     try:
-        with open(f'{MODEL_DIR}modelo_mortalidad_xgb.pkl', 'rb') as f:
-            model = pickle.load(f)
-        with open(f'{MODEL_DIR}scaler_mortalidad.pkl', 'rb') as f:
-            scaler = pickle.load(f)
-        return model, scaler
+        # Derivadas + imputación + escalado del entrenamiento (src/transformador.py)
+        return objeto_compartido(
+            'modelo_mortalidad',
+            lambda: (_leer_pickle(archivos[0]), cargar_transformador(archivos[1])),
+            fuentes=archivos,
+        )
     except Exception as e:
         st.sidebar.error(f"Error cargando modelo: {e}")
         return None, None
 
 @st.cache_resource
 def cargar_modelos_quantile():
-    """Carga modelos de regresión por cuantiles (P10, P50, P90)"""
+    """Carga modelos de regresión por cuantiles (P10, P50, P90), compartidos entre réplicas"""
+    modelos = [f'{MODEL_DIR}modelo_quantile_{q}.pkl' for q in ('p10', 'p50', 'p90')]
+    archivo_transformador = f'{MODEL_DIR}transformador_quantile.pkl'
     try:
-        with open(f'{MODEL_DIR}modelo_quantile_p10.pkl', 'rb') as f:
-            modelo_p10 = pickle.load(f)
-        with open(f'{MODEL_DIR}modelo_quantile_p50.pkl', 'rb') as f:
-            modelo_p50 = pickle.load(f)
-        with open(f'{MODEL_DIR}modelo_quantile_p90.pkl', 'rb') as f:
-            modelo_p90 = pickle.load(f)
-        with open(f'{MODEL_DIR}scaler_quantile.pkl', 'rb') as f:
-            scaler_q = pickle.load(f)
-        with open(f'{MODEL_DIR}feature_names_quantile.pkl', 'rb') as f:
-            feature_names = pickle.load(f)
-        return modelo_p10, modelo_p50, modelo_p90, scaler_q, feature_names
+        return objeto_compartido(
+            'modelos_quantile',
+            lambda: (*[_leer_pickle(ruta) for ruta in modelos], cargar_transformador(archivo_transformador)),
+            fuentes=modelos + [archivo_transformador],
+        )
     except Exception as e:
         # Modelos de cuantiles son opcionales
-        return None, None, None, None, None
+        return None, None, None, None
 
 # ============================================================================
 # FUNCIONES AUXILIARES
 # ============================================================================
 
-def preparar_datos(df):
-    """Prepara los datos para visualización"""
+def preparar_datos(df, umbrales=None):
+    """
+    Prepara los datos para visualización.
+
+    umbrales: los del índice de riesgo calculados sobre la tabla completa
+    (cargar_catalogo); si no se dan, se calculan sobre df.
+    """
     coords = cargar_coordenadas()
     
     # Agregar nombres y coordenadas
@@ -267,32 +311,16 @@ def preparar_datos(df):
         df['LONGITUD'] = np.nan
     
     # Mapear departamentos
-    dptos_map = {50: 'Meta', 81: 'Arauca', 85: 'Casanare', 95: 'Guaviare', 99: 'Vichada'}
-    df['DEPARTAMENTO'] = df['COD_DPTO'].map(dptos_map)
+    df['DEPARTAMENTO'] = df['COD_DPTO'].map(DPTOS_MAP)
     
     # Calcular riesgo obstétrico basado en criterios híbridos
-    # Umbrales críticos
-    UMBRAL_CRITICO_MORTALIDAD = 50.0  # 50‰
-    UMBRAL_CRITICO_SIN_PRENATAL = 0.50
-    
-    # Calcular percentiles para criterios
-    p75_mort_fetal = df['tasa_mortalidad_fetal'].quantile(0.75)
-    p75_sin_prenatal = df['pct_sin_control_prenatal'].quantile(0.75)
-    p75_bajo_peso = df['pct_bajo_peso'].quantile(0.75)
-    p75_prematuro = df['pct_prematuros'].quantile(0.75)
-    p25_cesarea = df['pct_cesareas'].quantile(0.25)
-    p75_presion_obs = df['presion_obstetrica'].quantile(0.75)
-    
-    # Calcular puntuación (0-8 puntos máximo)
-    df['puntos_riesgo'] = 0
-    df.loc[df['tasa_mortalidad_fetal'] > p75_mort_fetal, 'puntos_riesgo'] += 1
-    df.loc[df['pct_bajo_peso'] > p75_bajo_peso, 'puntos_riesgo'] += 1
-    df.loc[df['pct_prematuros'] > p75_prematuro, 'puntos_riesgo'] += 1
-    df.loc[df['pct_cesareas'] < p25_cesarea, 'puntos_riesgo'] += 1
-    df.loc[df['presion_obstetrica'] > p75_presion_obs, 'puntos_riesgo'] += 1
-    df.loc[df['pct_sin_control_prenatal'] > p75_sin_prenatal, 'puntos_riesgo'] += 1
-    df.loc[df['pct_sin_control_prenatal'] > UMBRAL_CRITICO_SIN_PRENATAL, 'puntos_riesgo'] += 1
-    df.loc[df['tasa_mortalidad_fetal'] > UMBRAL_CRITICO_MORTALIDAD, 'puntos_riesgo'] += 3
+    # (percentiles con sketches por departamento + umbrales críticos, ver umbrales_riesgo.py)
+    col_mort_fetal = columna_mortalidad_fetal(df.columns)
+    if umbrales is None:
+        umbrales, _ = calcular_umbrales(df, col_mort_fetal)
+        if ESTRATIFICACION is not None:
+            umbrales, _ = umbrales_estratificados(df, ESTRATIFICACION, col_mort_fetal, umbrales)
+    df['puntos_riesgo'] = puntuar_riesgo(df, umbrales, col_mort_fetal)
     
     # Clasificar: ≥3 puntos = alto riesgo
     df['riesgo_obstetrico'] = (df['puntos_riesgo'] >= 3).astype(int)
@@ -302,9 +330,512 @@ def preparar_datos(df):
     # Se mantiene la variable _pct por compatibilidad, pero el valor es ‰
     df['tasa_mortalidad_fetal_pct'] = df['tasa_mortalidad_fetal']
     df['tasa_mortalidad_neonatal_pct'] = df['tasa_mortalidad_neonatal']
-    
+
+    # Defunciones fetales estimadas (para medias ponderadas de la evolución temporal)
+    df['defunciones_estimadas'] = (df['tasa_mortalidad_fetal'] * df['total_nacimientos'] / 1000)
+
     return df
 
+# ============================================================================
+# VISTAS MATERIALIZADAS (AÑO × DEPARTAMENTO)
+# ============================================================================
+
+UMBRAL_CRITICO = 50.0  # Mortalidad fetal >50‰ → alerta crítica
+
+def evolucion_ponderada(df):
+    """Tasa de mortalidad fetal ponderada por nacimientos para cada año"""
+    if df.empty:
+        return pd.DataFrame(columns=['ANO', 'tasa_mortalidad_fetal_pct'])
+
+    por_anio = df.groupby('ANO')[['defunciones_estimadas', 'total_nacimientos']].sum()
+    tasa = (por_anio['defunciones_estimadas'] / por_anio['total_nacimientos'] * 1000).where(por_anio['total_nacimientos'] > 0, 0)
+    return tasa.reset_index(name='tasa_mortalidad_fetal_pct')
+
+def construir_vista(df, anio, depto):
+    """Filtra los datos y precalcula KPIs, alertas y top 10 para una combinación de filtros"""
+    df_vista = df if anio == 'Todos' else df[df['ANO'] == anio]
+    if depto != 'Todos':
+        df_vista = df_vista[df_vista['DEPARTAMENTO'] == depto]
+
+    # Filtrar registros excluidos (puntos_riesgo == -1)
+    df_vista = df_vista[df_vista['puntos_riesgo'] >= 0].copy()
+
+    alto = df_vista[df_vista['RIESGO'] == 'ALTO']
+    criticos = df_vista[df_vista['tasa_mortalidad_fetal_pct'] > UMBRAL_CRITICO]
+
+    return {
+        'df': df_vista,
+        # Alertas críticas
+        'criticos': criticos,
+        'num_registros_criticos': len(criticos),
+        'num_registros_alto_riesgo': len(alto),
+        'num_municipios_criticos': criticos['NOMBRE_MUNICIPIO'].nunique(),
+        'num_municipios_alto_riesgo': alto['NOMBRE_MUNICIPIO'].nunique(),
+        # KPIs del panorama de impacto
+        'mort_promedio': df_vista['tasa_mortalidad_fetal_pct'].mean(),
+        'total_muertes': df_vista['total_defunciones'].sum(),
+        'municipios_crisis': alto['NOMBRE_MUNICIPIO'].nunique(),
+        'total_municipios': df_vista['NOMBRE_MUNICIPIO'].nunique(),
+        # Top 10 por mortalidad fetal
+        'top10': df_vista.nlargest(10, 'tasa_mortalidad_fetal'),
+    }
+
+# ============================================================================
+# CAPA DE DATOS (FILTROS RESUELTOS EN EL ALMACÉN, PORCIONES COMPARTIDAS)
+# ============================================================================
+# Ningún proceso carga la tabla completa: el sidebar y los umbrales del índice
+# leen solo claves e indicadores, y cada porción año × departamento lee solo sus
+# filas de la copia particionada (almacenamiento.leer_tabla con filtros). La
+# porción preparada se publica una vez para todas las réplicas en un archivo
+# Arrow mapeado en memoria (cache_compartido.py). Todo lo que devuelven estas
+# funciones se comparte entre sesiones: tratarlo como de solo lectura.
+
+def _filtros_vista(anio='Todos', depto='Todos'):
+    """Filtros del sidebar como predicados de lectura (≥10 nacimientos siempre)"""
+    filtros = {'total_nacimientos': (MIN_NACIMIENTOS, None)}
+    if anio != 'Todos':
+        filtros['ANO'] = anio
+    if depto != 'Todos':
+        filtros['COD_DPTO'] = CODIGOS_DPTO[depto]
+    return filtros
+
+def umbrales_tabla_completa():
+    """
+    Umbrales del índice de riesgo sobre todos los registros con ≥10 nacimientos
+    (los mismos que usan train_model.py y verificar_dashboard.py).
+
+    Se acumulan departamento por departamento en sketches (umbrales_riesgo.py),
+    leyendo solo las columnas de los indicadores.
+    """
+    col_mort_fetal = columna_mortalidad_fetal(columnas_tabla(FEATURES_FILE))
+    indicadores = columnas_indicadores(col_mort_fetal)
+    codigos = leer_tabla(FEATURES_FILE, columnas=['COD_DPTO'])['COD_DPTO'].unique()
+    umbrales, _ = umbrales_por_partes(
+        (leer_tabla(FEATURES_FILE, columnas=indicadores, filtros={'COD_DPTO': codigo, **_filtros_vista()})
+         for codigo in codigos),
+        col_mort_fetal,
+    )
+    estratos = None
+    if ESTRATIFICACION is not None:
+        columnas = indicadores + ['ANO', 'COD_DPTO', 'total_nacimientos']
+        estratos = tabla_estratos(leer_tabla(FEATURES_FILE, columnas=columnas, filtros=_filtros_vista()),
+                                  ESTRATIFICACION, col_mort_fetal)
+    return umbrales, estratos
+
+@st.cache_resource
+def cargar_catalogo():
+    """Opciones del sidebar y umbrales del índice de riesgo"""
+    claves = leer_tabla(FEATURES_FILE, columnas=['ANO', 'COD_DPTO'], filtros=_filtros_vista())
+    umbrales, estratos = umbrales_tabla_completa()
+    return {
+        'anios': ['Todos'] + sorted(claves['ANO'].unique(), reverse=True),
+        'deptos': ['Todos'] + sorted(claves['COD_DPTO'].map(DPTOS_MAP).dropna().unique().tolist()),
+        'umbrales': umbrales,
+        'estratos': estratos,
+    }
+
+def construir_porcion(anio, depto):
+    """Filas preparadas (nombres, coordenadas, puntaje de riesgo) de una combinación de filtros"""
+    catalogo = cargar_catalogo()
+    df = leer_tabla(FEATURES_FILE, filtros=_filtros_vista(anio, depto))
+    df = df.sort_values(['COD_DPTO', 'COD_MUNIC', 'ANO']).reset_index(drop=True)
+
+    umbrales = catalogo['umbrales']
+    if catalogo['estratos'] is not None:
+        umbrales = umbrales_por_fila(df, catalogo['estratos'], ESTRATIFICACION, umbrales)
+    return preparar_datos(df, umbrales)
+
+@st.cache_resource(max_entries=MAX_VISTAS)
+def cargar_vista(anio, depto):
+    """Vista (KPIs, alertas, top 10) sobre la porción compartida (se reconstruye si cambian datos o código)"""
+    fuentes = [
+        ruta_parquet(FEATURES_FILE), ruta_particionada(FEATURES_FILE), FEATURES_FILE,
+        f'{DATA_DIR}DIVIPOLA-_Códigos_municipios_20251128.csv',
+        os.path.abspath(__file__), umbrales_riesgo.__file__,
+    ]
+    df = tabla_compartida(f'vista_{anio}_{depto}', lambda: construir_porcion(anio, depto),
+                          fuentes=fuentes, version=repr(ESTRATIFICACION))
+    return construir_vista(df, anio, depto)
+
+@st.cache_resource(max_entries=MAX_VISTAS)
+def cargar_evolucion(depto):
+    """Evolución ponderada del departamento (solo año, tasa y nacimientos)"""
+    df = leer_tabla(FEATURES_FILE, columnas=['ANO', 'tasa_mortalidad_fetal', 'total_nacimientos'],
+                    filtros=_filtros_vista(depto=depto))
+    df['defunciones_estimadas'] = df['tasa_mortalidad_fetal'] * df['total_nacimientos'] / 1000
+    return evolucion_ponderada(df)
+
+@st.cache_resource
+def cargar_referencia_arauca():
+    """Promedio anual de Arauca (coincide con documentación técnica)"""
+    df = leer_tabla(FEATURES_FILE, columnas=['ANO', 'tasa_mortalidad_fetal'], filtros=_filtros_vista(depto='Arauca'))
+    return df.groupby('ANO')['tasa_mortalidad_fetal'].mean().rename('tasa_mortalidad_fetal_pct').reset_index()
+
+# ============================================================================
+# PREDICTOR (CACHÉ DE ESCENARIOS)
+# ============================================================================
+
+# Paso de cada control del predictor: las entradas se cuantizan a su paso,
+# así un mismo escenario siempre produce la misma clave de caché
+PASOS_PREDICTOR = {
+    'nac': 1, 'edad_materna': 0.5, 'adolesc': 0.5, 'edad_avanz': 0.5, 'bajo_educ': 1.0,
+    'mort_neonatal': 0.5, 'mort_fetal': 0.5, 'bajo_peso': 0.5, 'prematuro': 0.5, 'apgar_bajo': 0.5,
+    'sin_prenatal': 1.0, 'consultas': 0.5, 'cesarea': 1.0, 'num_inst': 1,
+}
+MAX_ESCENARIOS = 4096
+
+def cuantizar_entradas(valores):
+    """Entradas del predictor redondeadas al paso de su control, en el orden de PASOS_PREDICTOR"""
+    return tuple(round(valores[nombre] / paso) * paso for nombre, paso in PASOS_PREDICTOR.items())
+
+def calcular_prediccion(entradas, model, transformador, modelos_quantile):
+    """
+    Predicción del escenario: heurística epidemiológica, modelo XGBoost,
+    explicación y cuantiles P10/P50/P90. entradas: cuantizar_entradas().
+    """
+    (nac, edad_materna, adolesc, edad_avanz, bajo_educ, mort_neonatal, mort_fetal, bajo_peso,
+     prematuro, apgar_bajo, sin_prenatal, consultas, cesarea, num_inst) = entradas
+
+    # CÁLCULO ADAPTATIVO: Ajustar variables ocultas basadas en indicadores ingresados
+
+    # ===================================================================
+    # CÁLCULO DE VARIABLES DERIVADAS (TRANSPARENTE)
+    # ===================================================================
+
+    # 1. % Embarazos alto riesgo: Basado en prematuridad + bajo peso
+    pct_alto_riesgo = (prematuro + bajo_peso) / 2  # Promedio simple (%)
+
+    # 2. % Mortalidad evitable: Basado en causas prevenibles esperadas
+    # Fórmula conservadora: Si hay control prenatal, la evitabilidad es menor
+    if sin_prenatal > 50:
+        pct_evitable = 60.0  # Sin prenatal = alta evitabilidad
+    elif sin_prenatal > 25:
+        pct_evitable = 45.0
+    elif sin_prenatal > 10:
+        pct_evitable = 30.0
+    else:
+        pct_evitable = 20.0  # Buen control = baja evitabilidad
+
+    # Ajustar por mortalidad observada
+    if mort_fetal > 50 or mort_neonatal > 15:
+        pct_evitable = min(pct_evitable + 15.0, 70.0)
+
+    # Entradas crudas de los modelos, en las unidades del entrenamiento: los pct_* de
+    # features_municipio_anio van en 0-100, igual que los sliders.
+    # Features sintéticas, imputación y escalado: transformador compilado (src/transformador.py)
+    features = {
+        'tasa_mortalidad_neonatal': mort_neonatal,
+        'tasa_mortalidad_fetal': mort_fetal,
+        'pct_bajo_peso': bajo_peso,
+        'pct_prematuros': prematuro,
+        'pct_apgar_bajo': apgar_bajo,
+        'pct_mortalidad_evitable': pct_evitable,
+        'pct_sin_control_prenatal': sin_prenatal,
+        'num_instituciones': num_inst,
+        'consultas_promedio': consultas,
+        # presion_obstetrica del entrenamiento = (defunciones fetales + < 1 año) por 1000
+        # nacimientos: incluye el propio objetivo y no es el slider (nacimientos por
+        # institución). No tiene control en el formulario: se deja faltante -> mediana
+        # del entrenamiento.
+        'presion_obstetrica': np.nan,
+        'pct_madres_adolescentes': adolesc,
+        'pct_educacion_baja': bajo_educ,
+        'total_nacimientos': nac,
+        'pct_cesareas': cesarea,
+        'pct_embarazos_alto_riesgo': pct_alto_riesgo,
+    }
+
+    # ========================================================================
+    # MODELO HÍBRIDO: EPIDEMIOLOGÍA + MACHINE LEARNING
+    # ========================================================================
+    # 
+    # INNOVACIÓN: Combinamos conocimiento médico establecido con ML para
+    # crear predicciones que son tanto científicamente válidas como
+    # sensibles a los indicadores del municipio.
+    #
+    # COMPONENTE 1: Fórmula Epidemiológica Base (WHO/DANE)
+    # --------------------------------------------------------
+    # La mortalidad neonatal representa ~60-70% de la mortalidad infantil
+    # en países en desarrollo (Lawn et al., Lancet 2005).
+    # 
+    # MI_base = Mortalidad Neonatal / 0.6 (factor WHO)
+    #
+    # COMPONENTE 2: Ajustes por Factores de Riesgo (ML-calibrado)
+    # --------------------------------------------------------
+    # Cada factor de riesgo adicional incrementa la mortalidad esperada
+    # según coeficientes estimados por el modelo XGBoost y validados
+    # con literatura médica.
+    #
+    # Referencias:
+    # - WHO (2020). Trends in maternal mortality 2000 to 2017
+    # - Lawn et al. (2005). "4 million neonatal deaths: when? where? why?"
+    # - DANE (2023). Estadísticas Vitales Colombia
+    # - PAHO (2019). Regional Health Report Latin America
+    # ========================================================================
+
+    # COMPONENTE 1: Base epidemiológica
+    # MI ≈ MN / 0.6 (la mortalidad neonatal es ~60% de la infantil)
+    factor_neonatal = 0.60  # WHO/Lawn et al.
+    mi_base = mort_neonatal / factor_neonatal if mort_neonatal > 0 else 2.5
+
+    # COMPONENTE 2: Ajustes por factores de riesgo
+    # (Coeficientes basados en literatura y calibrados con datos Orinoquía)
+    ajuste_total = 0.0
+    factores_detectados = []
+
+    # 2.1 Mortalidad Fetal (correlación fuerte con MI)
+    # Lawn et al.: Sistemas con alta MF tienen alta MI
+    if mort_fetal > 50:
+        ajuste_fetal = 8.0
+        factores_detectados.append(('Mortalidad Fetal Crítica', mort_fetal, ajuste_fetal))
+    elif mort_fetal > 30:
+        ajuste_fetal = 4.0
+        factores_detectados.append(('Mortalidad Fetal Alta', mort_fetal, ajuste_fetal))
+    elif mort_fetal > 15:
+        ajuste_fetal = 2.0
+        factores_detectados.append(('Mortalidad Fetal Moderada', mort_fetal, ajuste_fetal))
+    else:
+        ajuste_fetal = 0.0
+    ajuste_total += ajuste_fetal
+
+    # 2.2 Falta de Control Prenatal
+    # WHO (2016): <8 consultas aumenta riesgo de mortalidad
+    if sin_prenatal > 40:
+        ajuste_prenatal = 5.0
+        factores_detectados.append(('Sin Control Prenatal Crítico', sin_prenatal, ajuste_prenatal))
+    elif sin_prenatal > 25:
+        ajuste_prenatal = 3.0
+        factores_detectados.append(('Sin Control Prenatal Alto', sin_prenatal, ajuste_prenatal))
+    elif sin_prenatal > 15:
+        ajuste_prenatal = 1.5
+        factores_detectados.append(('Sin Control Prenatal Moderado', sin_prenatal, ajuste_prenatal))
+    else:
+        ajuste_prenatal = 0.0
+    ajuste_total += ajuste_prenatal
+
+    # 2.3 Bajo Peso al Nacer
+    # PAHO (2019): Bajo peso es el predictor más fuerte de mortalidad neonatal
+    if bajo_peso > 15:
+        ajuste_peso = 4.0
+        factores_detectados.append(('Bajo Peso Crítico', bajo_peso, ajuste_peso))
+    elif bajo_peso > 10:
+        ajuste_peso = 2.0
+        factores_detectados.append(('Bajo Peso Alto', bajo_peso, ajuste_peso))
+    else:
+        ajuste_peso = 0.0
+    ajuste_total += ajuste_peso
+
+    # 2.4 Prematuridad
+    # March of Dimes (2019): Prematuridad es causa principal de muerte neonatal
+    if prematuro > 15:
+        ajuste_prematuro = 3.0
+        factores_detectados.append(('Prematuridad Alta', prematuro, ajuste_prematuro))
+    elif prematuro > 10:
+        ajuste_prematuro = 1.5
+        factores_detectados.append(('Prematuridad Moderada', prematuro, ajuste_prematuro))
+    else:
+        ajuste_prematuro = 0.0
+    ajuste_total += ajuste_prematuro
+
+    # 2.5 Infraestructura de Salud
+    # OMS: Cobertura de servicios es determinante de mortalidad evitable
+    if num_inst < 3:
+        ajuste_infra = 4.0
+        factores_detectados.append(('Infraestructura Crítica', num_inst, ajuste_infra))
+    elif num_inst < 5:
+        ajuste_infra = 2.0
+        factores_detectados.append(('Infraestructura Limitada', num_inst, ajuste_infra))
+    else:
+        ajuste_infra = 0.0
+    ajuste_total += ajuste_infra
+
+    # 2.6 Factores Demográficos
+    # UNFPA (2013): Embarazo adolescente aumenta riesgo
+    if adolesc > 25:
+        ajuste_demo = 2.0
+        factores_detectados.append(('Alto % Madres Adolescentes', adolesc, ajuste_demo))
+    elif adolesc > 15:
+        ajuste_demo = 1.0
+    else:
+        ajuste_demo = 0.0
+    ajuste_total += ajuste_demo
+
+    # PREDICCIÓN FINAL: Base + Ajustes
+    tasa_pred = mi_base + ajuste_total
+
+    # LÍMITES DE COHERENCIA (validación final)
+    # Piso: No puede ser menor que la neonatal + margen post-neonatal
+    limite_inferior = max(mort_neonatal + 0.5, 2.5)
+    tasa_pred = max(tasa_pred, limite_inferior)
+
+    # Techo: Limitar a valores plausibles (máximo observado en datos: ~180‰)
+    tasa_pred = min(tasa_pred, 150.0)
+
+    # Para referencia, también calculamos la predicción del modelo ML puro
+    # (respaldos: pasos que cayeron a su valor de respaldo; esos resultados no se cachean)
+    respaldos = []
+    fuera_rango = {}
+    try:
+        X_scaled = transformar(transformador, vector_entrada(transformador, features))
+        tasa_pred_ml = model.predict(X_scaled)[0]
+        # Entradas lejos de la tabla de entrenamiento: la predicción ML es extrapolación
+        fuera_rango = fuera_de_rango(transformador, X_scaled)
+    except Exception:
+        tasa_pred_ml = tasa_pred  # Fallback
+        respaldos.append('modelo')
+
+    # Atribución del escenario: si falla, la predicción ML se conserva
+    factores_modelo = None
+    if 'modelo' not in respaldos:
+        try:
+            factores_modelo = explicar_escenario(model, X_scaled, transformador['feature_cols'])
+        except Exception:
+            respaldos.append('explicacion')
+
+    # ========================================================================
+    # INTERVALOS DE CONFIANZA CON REGRESIÓN POR CUANTILES (P10/P50/P90)
+    # ========================================================================
+    # Proporcionan un rango epidemiológico profesional, no solo un punto
+    p10_pred, p50_pred, p90_pred = None, None, None
+
+    if modelos_quantile[0] is not None:  # Si hay modelos de cuantiles disponibles
+        try:
+            modelo_p10, modelo_p50, modelo_p90, transformador_q = modelos_quantile
+
+            # Mismas entradas crudas, con el transformador de los modelos de cuantiles
+            X_q_scaled = transformar(transformador_q, vector_entrada(transformador_q, features))
+
+            # Predicciones de cuantiles
+            p10_raw = modelo_p10.predict(X_q_scaled)[0]
+            p50_raw = modelo_p50.predict(X_q_scaled)[0]
+            p90_raw = modelo_p90.predict(X_q_scaled)[0]
+
+            # Clip a valores no negativos y ordenar
+            preds = sorted([max(0, p10_raw), max(0, p50_raw), max(0, p90_raw)])
+            p10_pred, p50_pred, p90_pred = preds[0], preds[1], preds[2]
+
+            # ================================================================
+            # REGLAS DE COHERENCIA EPIDEMIOLÓGICA
+            # ================================================================
+            # Solo aplicamos restricciones con sustento científico demostrable
+
+            # REGLA 1: RESTRICCIÓN MATEMÁTICA (Definición OMS)
+            # ------------------------------------------------
+            # Mortalidad Infantil = Neonatal + Post-neonatal
+            # Por lo tanto: MI >= MN (siempre)
+            # Fuente: WHO ICD-10, definiciones de mortalidad
+            #
+            # P10 (mejor caso) no puede ser menor que la mortalidad neonatal
+            # porque eso implicaría mortalidad post-neonatal negativa (imposible)
+            piso_neonatal = mort_neonatal
+
+            # REGLA 2: PISO MÍNIMO OBSERVABLE
+            # ------------------------------------------------
+            # Los países con mejores indicadores (Japón, Finlandia) tienen
+            # tasas de ~1.5-2.0‰. No existe lugar con 0‰.
+            # Fuente: UNICEF State of World's Children 2023
+            piso_minimo_mundial = 1.5
+
+            # REGLA 3: TECHO MÁXIMO OBSERVABLE
+            # ------------------------------------------------
+            # Las tasas más altas registradas en zonas de crisis son ~100-120‰
+            # En Colombia/Orinoquía histórico máximo ~180‰ (casos extremos)
+            # Fuente: DANE Estadísticas Vitales 2020-2024
+            techo_maximo = 150.0
+
+            # APLICAR RESTRICCIONES
+            # P10: el mejor caso realista
+            p10_pred = max(p10_pred, piso_neonatal, piso_minimo_mundial)
+
+            # P50: mediana, debe estar entre P10 y P90
+            p50_pred = max(p50_pred, p10_pred + 0.1)
+
+            # P90: el peor caso, limitado por observaciones históricas
+            p90_pred = max(p90_pred, p50_pred + 0.1)
+            p90_pred = min(p90_pred, techo_maximo)
+
+            # REGLA 4: ANCHO MÍNIMO DE INTERVALO
+            # ------------------------------------------------
+            # Un intervalo de confianza con ancho 0 no tiene sentido estadístico
+            # Mínimo práctico: diferencia observable entre cuantiles
+            if (p90_pred - p10_pred) < 2.0:
+                # Expandir simétricamente
+                centro = (p10_pred + p90_pred) / 2
+                p10_pred = max(centro - 1.0, piso_minimo_mundial)
+                p90_pred = min(centro + 1.0, techo_maximo)
+                p50_pred = centro
+
+        except Exception as e:
+            # Fallback si falla predicción de cuantiles
+            # Usamos heurística basada en coeficiente de variación observado
+            respaldos.append('cuantiles')
+            cv = 0.35  # CV típico en datos de mortalidad infantil
+            p10_pred = max(tasa_pred * (1 - cv), mort_neonatal, 1.5)
+            p50_pred = tasa_pred
+            p90_pred = min(tasa_pred * (1 + cv), 150.0)
+    else:
+        # Sin modelos de cuantiles: estimación por CV
+        # Fuente: Variabilidad observada en datos DANE Orinoquía
+        cv = 0.35
+        p10_pred = max(tasa_pred * (1 - cv), mort_neonatal, 1.5)
+        p50_pred = tasa_pred
+        p90_pred = min(tasa_pred * (1 + cv), 150.0)
+
+    return {
+        'tasa_pred': tasa_pred,
+        'tasa_pred_raw': tasa_pred_ml,  # Predicción ML pura para referencia
+        'mi_base': mi_base,
+        'ajuste_total': ajuste_total,
+        'factores_detectados': factores_detectados,
+        'factores_modelo': factores_modelo,
+        'features': features,
+        'X_columns': list(features),
+        'restricciones_aplicadas': {
+            'limite_inferior': limite_inferior,
+            'formula_base': f"MN({mort_neonatal:.1f}) / 0.6 = {mi_base:.2f}‰"
+        },
+        # Nuevos: Intervalos de confianza
+        'p10': p10_pred,
+        'p50': p50_pred,
+        'p90': p90_pred,
+        'respaldos': respaldos,
+        'fuera_de_rango': fuera_rango,
+    }
+
+@st.cache_resource
+def cache_predicciones():
+    """
+    LRU de escenarios compartida entre sesiones (por proceso), con contadores
+    de aciertos. Los modelos quedan fijados al crearla; los resultados son de
+    solo lectura.
+    """
+    return {
+        'modelos': (*cargar_modelo(), cargar_modelos_quantile()),
+        'escenarios': OrderedDict(),
+        'candado': threading.Lock(),
+        'aciertos': 0,
+        'consultas': 0,
+    }
+
+def predecir_escenario(entradas):
+    """Predicción desde la caché; los resultados con algún paso de respaldo se recalculan siempre"""
+    cache = cache_predicciones()
+    with cache['candado']:
+        cache['consultas'] += 1
+        resultado = cache['escenarios'].get(entradas)
+        if resultado is not None:
+            cache['aciertos'] += 1
+            cache['escenarios'].move_to_end(entradas)
+            return resultado
+
+    resultado = calcular_prediccion(entradas, *cache['modelos'])
+    if not resultado['respaldos']:
+        with cache['candado']:
+            cache['escenarios'][entradas] = resultado
+            if len(cache['escenarios']) > MAX_ESCENARIOS:
+                cache['escenarios'].popitem(last=False)
+    return resultado
+
 # ============================================================================
 # DASHBOARD PRINCIPAL
 # ============================================================================
@@ -328,24 +859,20 @@ def main():
     """, unsafe_allow_html=True)
     st.markdown("---")
     
-    # Cargar datos
-    df = cargar_datos()
-    df = preparar_datos(df)
-    
-    # Filtrar registros válidos (≥10 nacimientos) - Consistente con documentación técnica
-    df = df[df['total_nacimientos'] >= 10].copy()
+    # Opciones de filtros (tabla preparada compartida entre réplicas)
+    catalogo = cargar_catalogo()
     
     # Sidebar - Filtros
     with st.sidebar:
         st.header("Filtros")
         
         # Filtro de año - Predeterminado 2024
-        anios = ['Todos'] + sorted(df['ANO'].unique(), reverse=True)
+        anios = catalogo['anios']
         default_anio = anios.index(2024) if 2024 in anios else 0
         anio_sel = st.selectbox("Año", anios, index=default_anio)
         
         # Filtro de departamento
-        deptos = ['Todos'] + sorted(df['DEPARTAMENTO'].unique().tolist())
+        deptos = catalogo['deptos']
         depto_sel = st.selectbox("Departamento", deptos)
         
         st.markdown("---")
@@ -412,32 +939,23 @@ def main():
         st.markdown("**Período:** 2020-2024")
         st.markdown("**Región:** Orinoquía")
     
-    # Aplicar filtros
-    if anio_sel == 'Todos':
-        df_filtrado = df.copy()
-    else:
-        df_filtrado = df[df['ANO'] == anio_sel].copy()
-    
-    if depto_sel != 'Todos':
-        df_filtrado = df_filtrado[df_filtrado['DEPARTAMENTO'] == depto_sel]
-    
-    # Filtrar registros excluidos (puntos_riesgo == -1)
-    df_filtrado = df_filtrado[df_filtrado['puntos_riesgo'] >= 0].copy()
+    # Aplicar filtros (porción de la tabla compartida, en caché por combinación)
+    vista = cargar_vista(anio_sel, depto_sel)
+    df_filtrado = vista['df']
     
     # ALERTAS CRÍTICAS
-    UMBRAL_CRITICO = 50.0
-    municipios_criticos = df_filtrado[df_filtrado['tasa_mortalidad_fetal_pct'] > UMBRAL_CRITICO]
+    municipios_criticos = vista['criticos']
     
-    if len(municipios_criticos) > 0:
+    if vista['num_registros_criticos'] > 0:
         # Determinar texto según filtro
         if anio_sel == 'Todos':
-            num_criticos = len(municipios_criticos)
-            num_alto_riesgo_total = len(df_filtrado[df_filtrado['RIESGO'] == 'ALTO'])
+            num_criticos = vista['num_registros_criticos']
+            num_alto_riesgo_total = vista['num_registros_alto_riesgo']
             texto_alerta = f"URGENTE: {num_criticos} de {num_alto_riesgo_total} registros de alto riesgo están en ALERTA CRÍTICA (mortalidad fetal >50‰)"
             texto_expander = "Ver registros en alerta crítica"
         else:
-            num_municipios_criticos = municipios_criticos['NOMBRE_MUNICIPIO'].nunique()
-            num_municipios_alto_riesgo = df_filtrado[df_filtrado['RIESGO'] == 'ALTO']['NOMBRE_MUNICIPIO'].nunique()
+            num_municipios_criticos = vista['num_municipios_criticos']
+            num_municipios_alto_riesgo = vista['num_municipios_alto_riesgo']
             texto_alerta = f"URGENTE: {num_municipios_criticos} de {num_municipios_alto_riesgo} municipios en alto riesgo en {anio_sel} están en ALERTA CRÍTICA (mortalidad fetal >50‰)"
             texto_expander = f"Ver municipios en alerta crítica {anio_sel}"
         
@@ -472,10 +990,10 @@ def main():
         # ==========================================
         
         # Calcular métricas de impacto
-        mort_promedio = df_filtrado['tasa_mortalidad_fetal_pct'].mean()
-        total_muertes = df_filtrado['total_defunciones'].sum()
-        municipios_crisis = df_filtrado[df_filtrado['RIESGO'] == 'ALTO']['NOMBRE_MUNICIPIO'].nunique()
-        total_municipios = df_filtrado['NOMBRE_MUNICIPIO'].nunique()
+        mort_promedio = vista['mort_promedio']
+        total_muertes = vista['total_muertes']
+        municipios_crisis = vista['municipios_crisis']
+        total_municipios = vista['total_municipios']
         
         # Calcular deltas (comparación con año anterior o promedio histórico)
         delta_mort_str = ""
@@ -483,12 +1001,10 @@ def main():
         
         if anio_sel != 'Todos' and isinstance(anio_sel, int) and anio_sel > 2020:
             anio_prev = anio_sel - 1
-            df_prev = df[df['ANO'] == anio_prev]
-            if depto_sel != 'Todos':
-                df_prev = df_prev[df_prev['DEPARTAMENTO'] == depto_sel]
+            vista_prev = cargar_vista(anio_prev, depto_sel) if anio_prev in catalogo['anios'] else None
             
-            if not df_prev.empty:
-                mort_prev = df_prev['tasa_mortalidad_fetal_pct'].mean()
+            if vista_prev is not None and not vista_prev['df'].empty:
+                mort_prev = vista_prev['mort_promedio']
                 delta_mort = mort_promedio - mort_prev
                 delta_mort_str = f"{delta_mort:+.1f}‰ vs {anio_prev}"
                 delta_color_val = "inverse"
@@ -533,30 +1049,15 @@ def main():
         
         st.subheader("📈 Evolución de la Mortalidad (2020-2024)")
         
-        # Preparar datos para media ponderada (más precisa)
-        df['defunciones_estimadas'] = (df['tasa_mortalidad_fetal'] * df['total_nacimientos'] / 1000)
+        # Media ponderada por nacimientos (solo las columnas y filas del departamento)
+        df_evol = cargar_evolucion(depto_sel)
         
-        # Agrupar por año
         if depto_sel == 'Todos':
-            # Media Ponderada Regional
-            df_evol = df.groupby('ANO').apply(
-                lambda x: (x['defunciones_estimadas'].sum() / x['total_nacimientos'].sum() * 1000)
-            ).reset_index(name='tasa_mortalidad_fetal_pct')
             titulo_evol = "Evolución Ponderada Orinoquía"
             
-            # Calcular Arauca para referencia (coincide con documentación técnica)
-            df_arauca_ref = df[df['DEPARTAMENTO'] == 'Arauca'].groupby('ANO')['tasa_mortalidad_fetal_pct'].mean().reset_index()
-            
+            # Referencia Arauca (coincide con documentación técnica)
+            df_arauca_ref = cargar_referencia_arauca()
         else:
-            # Media Ponderada Departamento
-            df_dept = df[df['DEPARTAMENTO'] == depto_sel]
-            if not df_dept.empty:
-                df_evol = df_dept.groupby('ANO').apply(
-                    lambda x: (x['defunciones_estimadas'].sum() / x['total_nacimientos'].sum() * 1000) if x['total_nacimientos'].sum() > 0 else 0
-                ).reset_index(name='tasa_mortalidad_fetal_pct')
-            else:
-                df_evol = pd.DataFrame(columns=['ANO', 'tasa_mortalidad_fetal_pct'])
-                
             titulo_evol = f"Evolución Ponderada {depto_sel}"
             df_arauca_ref = None
             
@@ -613,6 +1114,40 @@ def main():
                 Se observa un **incremento del {((val_2024-val_2023)/val_2023*100):.1f}%** en la mortalidad fetal ponderada en 2024 respecto a 2023.
                 """)
 
+        # Pronóstico del año siguiente (modelo global de series municipales)
+        df_pron = cargar_pronostico()
+        if df_pron is not None:
+            df_pron = df_pron.assign(DEPARTAMENTO=df_pron['COD_DPTO'].map(DPTOS_MAP))
+            if depto_sel != 'Todos':
+                df_pron = df_pron[df_pron['DEPARTAMENTO'] == depto_sel]
+
+            anio_pron = int(df_pron['ANO'].max()) if not df_pron.empty else None
+            en_alza = df_pron[df_pron['p50'] > df_pron['ultimo_valor']]
+            riesgo_critico = df_pron[df_pron['p90'] > UMBRAL_CRITICO]
+
+            if anio_pron is not None and (len(en_alza) > 0 or len(riesgo_critico) > 0):
+                st.warning(f"""
+                ### 🔮 Alerta Temprana {anio_pron}
+                **{len(en_alza)}** de {len(df_pron)} municipios tienen un alza esperada (P50) en la mortalidad fetal
+                y **{len(riesgo_critico)}** podrían superar {UMBRAL_CRITICO:.0f}‰ en el escenario pesimista (P90).
+                """)
+
+                with st.expander(f"Ver pronóstico {anio_pron} por municipio"):
+                    coords = cargar_coordenadas()
+                    if coords is not None:
+                        df_pron = df_pron.merge(coords[['COD_DPTO', 'COD_MUNIC', 'NOMBRE_MUNICIPIO']],
+                                                on=['COD_DPTO', 'COD_MUNIC'], how='left')
+                    else:
+                        df_pron['NOMBRE_MUNICIPIO'] = 'Municipio ' + df_pron['COD_MUNIC'].astype(str)
+                    st.dataframe(
+                        df_pron.sort_values('p90', ascending=False)[
+                            ['NOMBRE_MUNICIPIO', 'DEPARTAMENTO', 'ultimo_valor', 'p10', 'p50', 'p90']
+                        ].rename(columns={'NOMBRE_MUNICIPIO': 'Municipio', 'DEPARTAMENTO': 'Departamento',
+                                          'ultimo_valor': 'Último año (‰)', 'p10': 'P10 (‰)',
+                                          'p50': 'P50 (‰)', 'p90': 'P90 (‰)'}).round(1),
+                        use_container_width=True, hide_index=True
+                    )
+
         st.markdown("---")
         
         # MAPA INTERACTIVO DE RIESGO
@@ -624,17 +1159,7 @@ def main():
             
             if not df_mapa.empty:
                 # Definir colores según mortalidad
-                def get_color(mort):
-                    if mort < 10.0:
-                        return '#27AE60'  # Verde
-                    elif mort < 30.0:
-                        return '#F39C12'  # Amarillo
-                    elif mort < 50.0:
-                        return '#E67E22'  # Naranja
-                    else:
-                        return '#E74C3C'  # Rojo
-                
-                df_mapa['color'] = df_mapa['tasa_mortalidad_fetal_pct'].apply(get_color)
+                df_mapa['color'] = categorizar(df_mapa['tasa_mortalidad_fetal_pct'], TABLA_COLOR_MAPA).astype(str)
                 
                 fig_mapa = go.Figure()
                 
@@ -849,8 +1374,8 @@ def main():
         st.subheader(f"🚨 Top 10 Municipios en Emergencia Sanitaria {anio_sel}")
         st.caption("Municipios con mayor tasa de mortalidad fetal (‰).")
         
-        # Top 10 por mortalidad
-        df_top10 = df_filtrado.nlargest(10, 'tasa_mortalidad_fetal')
+        # Top 10 por mortalidad (precalculado en la vista)
+        df_top10 = vista['top10']
         
         if len(df_top10) > 0:
             fig_top10 = px.bar(
@@ -909,6 +1434,28 @@ def main():
                     f"top10_mortalidad_{anio_sel}.csv",
                     "text/csv"
                 )
+            # Explicación del modelo ML (atribuciones precalculadas)
+            cache_shap = cargar_explicaciones()
+            if cache_shap is not None:
+                with st.expander("¿Por qué este municipio? (factores del modelo ML)"):
+                    opciones = {
+                        f"{fila.NOMBRE_MUNICIPIO} ({fila.DEPARTAMENTO}, {int(fila.ANO)})": fila
+                        for fila in df_top10.itertuples()
+                    }
+                    seleccion = opciones[st.selectbox("Municipio", list(opciones))]
+                    factores = explicar_municipio(cache_shap, seleccion.COD_DPTO, seleccion.COD_MUNIC, seleccion.ANO)
+                    if factores is None:
+                        st.info("Este municipio-año no está en la caché de explicaciones (reentrenar el modelo).")
+                    else:
+                        fig_shap = px.bar(
+                            factores.iloc[::-1], x='contribucion', y='feature', orientation='h',
+                            color='contribucion', color_continuous_scale='RdYlGn_r', color_continuous_midpoint=0,
+                            labels={'contribucion': 'Aporte a la predicción (‰)', 'feature': ''}
+                        )
+                        fig_shap.update_layout(height=300, coloraxis_showscale=False, font=dict(size=14))
+                        st.plotly_chart(fig_shap, use_container_width=True)
+                        st.caption(f"Valor base del modelo: {factores['valor_base'].iloc[0]:.1f}‰. "
+                                   "Atribuciones TreeSHAP: aporte de cada variable a la mortalidad infantil predicha.")
         else:
             st.success("No hay datos suficientes para mostrar el Top 10.")
         
@@ -945,8 +1492,8 @@ def main():
         **Modelo:** XGBoost Regressor + Regresión por Cuantiles (P10/P50/P90) entrenado con datos de Orinoquía 2020-2024.
         """)
         
-        model, scaler = cargar_modelo()
-        modelos_quantile = cargar_modelos_quantile()  # (p10, p50, p90, scaler_q, feature_names)
+        model, transformador = cargar_modelo()
+        modelos_quantile = cargar_modelos_quantile()  # (p10, p50, p90, transformador_q)
         
         if model is None:
             st.error("Error: No se pudo cargar el modelo de predicción.")
@@ -982,370 +1529,27 @@ def main():
             consultas = st.slider("Consultas Promedio", 0.0, 15.0, 6.5, 0.5, help="OMS recomienda mínimo 8 consultas")
             cesarea = st.slider("% Cesáreas", 0.0, 100.0, 38.0, 1.0, help="OMS recomienda 10-15%. Valores >30% indican sobreuso")
             num_inst = st.number_input("Nº Instituciones de Salud", 0, 50, 8, help="Feature importante (8.3%). Más instituciones = mejor cobertura")
-            presion_obs = st.number_input("Presión Obstétrica (nacim/inst)", 0.0, 500.0, 100.0, 5.0, help="Nacimientos por institución. >200 indica saturación")
         
         if st.button("Calcular Riesgo", type="primary"):
-            # CÁLCULO ADAPTATIVO: Ajustar variables ocultas basadas en indicadores ingresados
-            
-            # ===================================================================
-            # CÁLCULO DE VARIABLES DERIVADAS (TRANSPARENTE)
-            # ===================================================================
-
-            # 1. Índice de fragilidad: Basado en indicadores reales
-            fragilidad_components = []
-            if mort_neonatal > 10:
-                fragilidad_components.append(30)
-            elif mort_neonatal > 5:
-                fragilidad_components.append(15)
-            else:
-                fragilidad_components.append(5)
+            entradas = cuantizar_entradas({
+                'nac': nac, 'edad_materna': edad_materna, 'adolesc': adolesc, 'edad_avanz': edad_avanz,
+                'bajo_educ': bajo_educ, 'mort_neonatal': mort_neonatal, 'mort_fetal': mort_fetal,
+                'bajo_peso': bajo_peso, 'prematuro': prematuro, 'apgar_bajo': apgar_bajo,
+                'sin_prenatal': sin_prenatal, 'consultas': consultas, 'cesarea': cesarea,
+                'num_inst': num_inst,
+            })
+            inicio = time.perf_counter()
+            st.session_state.resultado_prediccion = predecir_escenario(entradas)
+            st.session_state.ms_prediccion = (time.perf_counter() - inicio) * 1000
 
-            if mort_fetal > 50:
-                fragilidad_components.append(30)
-            elif mort_fetal > 20:
-                fragilidad_components.append(15)
-            else:
-                fragilidad_components.append(5)
-
-            if sin_prenatal > 50:
-                fragilidad_components.append(20)
-            elif sin_prenatal > 25:
-                fragilidad_components.append(10)
-            else:
-                fragilidad_components.append(3)
-
-            if num_inst < 3:
-                fragilidad_components.append(15)
-            elif num_inst < 8:
-                fragilidad_components.append(8)
-            else:
-                fragilidad_components.append(2)
-
-            fragilidad_base = sum(fragilidad_components) / 4  # Promedio
-
-            # 2. % Embarazos alto riesgo: Basado en prematuridad + bajo peso
-            pct_alto_riesgo = (prematuro + bajo_peso) / 200  # Promedio simple
-
-            # 3. % Mortalidad evitable: Basado en causas prevenibles esperadas
-            # Fórmula conservadora: Si hay control prenatal, la evitabilidad es menor
-            if sin_prenatal > 50:
-                pct_evitable = 0.60  # Sin prenatal = alta evitabilidad
-            elif sin_prenatal > 25:
-                pct_evitable = 0.45
-            elif sin_prenatal > 10:
-                pct_evitable = 0.30
-            else:
-                pct_evitable = 0.20  # Buen control = baja evitabilidad
-
-            # Ajustar por mortalidad observada
-            if mort_fetal > 50 or mort_neonatal > 15:
-                pct_evitable = min(pct_evitable + 0.15, 0.70)
-            
-            # Preparar features
-            features = {
-                'apgar_bajo_promedio': apgar_bajo / 100,
-                'atenciones_per_nacimiento': 12.0,
-                'consultas_per_nacimiento': max(consultas / nac * 1000, 0.01) if nac > 0 else 0.01,
-                'consultas_promedio': consultas,
-                'defunciones_fetales': int(nac * mort_fetal / 1000),
-                'edad_materna_promedio': edad_materna,
-                'indice_fragilidad_sistema': fragilidad_base,
-                'instituciones_per_1000nac': (num_inst / nac * 1000) if nac > 0 else 0,
-                'num_instituciones': num_inst,
-                'pct_apgar_bajo': apgar_bajo / 100,
-                'pct_bajo_peso': bajo_peso / 100,
-                'pct_cesareas': cesarea / 100,
-                'pct_consultas_insuficientes': sin_prenatal / 100,
-                'pct_educacion_baja': bajo_educ / 100,
-                'pct_embarazos_alto_riesgo': pct_alto_riesgo,
-                'pct_instituciones_publicas': 0.60,
-                'pct_madres_adolescentes': adolesc / 100,
-                'pct_madres_solteras': 0.35,
-                'pct_mortalidad_evitable': pct_evitable,
-                'pct_multiparidad': 0.30,
-                'pct_partos_multiples': 0.02,
-                'pct_prematuros': prematuro / 100,
-                'pct_regimen_subsidiado': 0.50,
-                'pct_sin_control_prenatal': sin_prenatal / 100,
-                'pct_sin_seguridad': 0.08,
-                'pct_urgencias': 0.15,
-                'presion_obstetrica': presion_obs,
-                'procedimientos_per_nacimiento': 4.0,
-                't_ges_promedio': 38.0,
-                'tasa_mortalidad_fetal': mort_fetal,
-                'tasa_mortalidad_neonatal': mort_neonatal,
-                'total_nacimientos': nac,
-                'urgencias_per_nacimiento': 2.0
-            }
-            
-            X = pd.DataFrame([features])
-            
-            # ========================================================================
-            # MODELO HÍBRIDO: EPIDEMIOLOGÍA + MACHINE LEARNING
-            # ========================================================================
-            # 
-            # INNOVACIÓN: Combinamos conocimiento médico establecido con ML para
-            # crear predicciones que son tanto científicamente válidas como
-            # sensibles a los indicadores del municipio.
-            #
-            # COMPONENTE 1: Fórmula Epidemiológica Base (WHO/DANE)
-            # --------------------------------------------------------
-            # La mortalidad neonatal representa ~60-70% de la mortalidad infantil
-            # en países en desarrollo (Lawn et al., Lancet 2005).
-            # 
-            # MI_base = Mortalidad Neonatal / 0.6 (factor WHO)
-            #
-            # COMPONENTE 2: Ajustes por Factores de Riesgo (ML-calibrado)
-            # --------------------------------------------------------
-            # Cada factor de riesgo adicional incrementa la mortalidad esperada
-            # según coeficientes estimados por el modelo XGBoost y validados
-            # con literatura médica.
-            #
-            # Referencias:
-            # - WHO (2020). Trends in maternal mortality 2000 to 2017
-            # - Lawn et al. (2005). "4 million neonatal deaths: when? where? why?"
-            # - DANE (2023). Estadísticas Vitales Colombia
-            # - PAHO (2019). Regional Health Report Latin America
-            # ========================================================================
-            
-            # COMPONENTE 1: Base epidemiológica
-            # MI ≈ MN / 0.6 (la mortalidad neonatal es ~60% de la infantil)
-            factor_neonatal = 0.60  # WHO/Lawn et al.
-            mi_base = mort_neonatal / factor_neonatal if mort_neonatal > 0 else 2.5
-            
-            # COMPONENTE 2: Ajustes por factores de riesgo
-            # (Coeficientes basados en literatura y calibrados con datos Orinoquía)
-            ajuste_total = 0.0
-            factores_detectados = []
-            
-            # 2.1 Mortalidad Fetal (correlación fuerte con MI)
-            # Lawn et al.: Sistemas con alta MF tienen alta MI
-            if mort_fetal > 50:
-                ajuste_fetal = 8.0
-                factores_detectados.append(('Mortalidad Fetal Crítica', mort_fetal, ajuste_fetal))
-            elif mort_fetal > 30:
-                ajuste_fetal = 4.0
-                factores_detectados.append(('Mortalidad Fetal Alta', mort_fetal, ajuste_fetal))
-            elif mort_fetal > 15:
-                ajuste_fetal = 2.0
-                factores_detectados.append(('Mortalidad Fetal Moderada', mort_fetal, ajuste_fetal))
-            else:
-                ajuste_fetal = 0.0
-            ajuste_total += ajuste_fetal
-            
-            # 2.2 Falta de Control Prenatal
-            # WHO (2016): <8 consultas aumenta riesgo de mortalidad
-            if sin_prenatal > 40:
-                ajuste_prenatal = 5.0
-                factores_detectados.append(('Sin Control Prenatal Crítico', sin_prenatal, ajuste_prenatal))
-            elif sin_prenatal > 25:
-                ajuste_prenatal = 3.0
-                factores_detectados.append(('Sin Control Prenatal Alto', sin_prenatal, ajuste_prenatal))
-            elif sin_prenatal > 15:
-                ajuste_prenatal = 1.5
-                factores_detectados.append(('Sin Control Prenatal Moderado', sin_prenatal, ajuste_prenatal))
-            else:
-                ajuste_prenatal = 0.0
-            ajuste_total += ajuste_prenatal
-            
-            # 2.3 Bajo Peso al Nacer
-            # PAHO (2019): Bajo peso es el predictor más fuerte de mortalidad neonatal
-            if bajo_peso > 15:
-                ajuste_peso = 4.0
-                factores_detectados.append(('Bajo Peso Crítico', bajo_peso, ajuste_peso))
-            elif bajo_peso > 10:
-                ajuste_peso = 2.0
-                factores_detectados.append(('Bajo Peso Alto', bajo_peso, ajuste_peso))
-            else:
-                ajuste_peso = 0.0
-            ajuste_total += ajuste_peso
-            
-            # 2.4 Prematuridad
-            # March of Dimes (2019): Prematuridad es causa principal de muerte neonatal
-            if prematuro > 15:
-                ajuste_prematuro = 3.0
-                factores_detectados.append(('Prematuridad Alta', prematuro, ajuste_prematuro))
-            elif prematuro > 10:
-                ajuste_prematuro = 1.5
-                factores_detectados.append(('Prematuridad Moderada', prematuro, ajuste_prematuro))
-            else:
-                ajuste_prematuro = 0.0
-            ajuste_total += ajuste_prematuro
-            
-            # 2.5 Infraestructura de Salud
-            # OMS: Cobertura de servicios es determinante de mortalidad evitable
-            if num_inst < 3:
-                ajuste_infra = 4.0
-                factores_detectados.append(('Infraestructura Crítica', num_inst, ajuste_infra))
-            elif num_inst < 5:
-                ajuste_infra = 2.0
-                factores_detectados.append(('Infraestructura Limitada', num_inst, ajuste_infra))
-            else:
-                ajuste_infra = 0.0
-            ajuste_total += ajuste_infra
-            
-            # 2.6 Factores Demográficos
-            # UNFPA (2013): Embarazo adolescente aumenta riesgo
-            if adolesc > 25:
-                ajuste_demo = 2.0
-                factores_detectados.append(('Alto % Madres Adolescentes', adolesc, ajuste_demo))
-            elif adolesc > 15:
-                ajuste_demo = 1.0
-            else:
-                ajuste_demo = 0.0
-            ajuste_total += ajuste_demo
-            
-            # PREDICCIÓN FINAL: Base + Ajustes
-            tasa_pred = mi_base + ajuste_total
-            
-            # LÍMITES DE COHERENCIA (validación final)
-            # Piso: No puede ser menor que la neonatal + margen post-neonatal
-            limite_inferior = max(mort_neonatal + 0.5, 2.5)
-            tasa_pred = max(tasa_pred, limite_inferior)
-            
-            # Techo: Limitar a valores plausibles (máximo observado en datos: ~180‰)
-            tasa_pred = min(tasa_pred, 150.0)
-            
-            # Para referencia, también calculamos la predicción del modelo ML puro
-            try:
-                scaler_cols = list(scaler.feature_names_in_)
-                for col in scaler_cols:
-                    if col not in X.columns:
-                        X[col] = 0.0
-                X_aligned = X[scaler_cols]
-                X_scaled = scaler.transform(X_aligned)
-                tasa_pred_ml = model.predict(X_scaled)[0]
-            except:
-                tasa_pred_ml = tasa_pred  # Fallback
-
-            # ========================================================================
-            # INTERVALOS DE CONFIANZA CON REGRESIÓN POR CUANTILES (P10/P50/P90)
-            # ========================================================================
-            # Proporcionan un rango epidemiológico profesional, no solo un punto
-            p10_pred, p50_pred, p90_pred = None, None, None
-            
-            if modelos_quantile[0] is not None:  # Si hay modelos de cuantiles disponibles
-                try:
-                    modelo_p10, modelo_p50, modelo_p90, scaler_q, feature_names_q = modelos_quantile
-                    
-                    # Preparar features para los modelos de cuantiles
-                    X_q = pd.DataFrame([{
-                        'tasa_mortalidad_neonatal': mort_neonatal,
-                        'tasa_mortalidad_fetal': mort_fetal,
-                        'pct_bajo_peso': bajo_peso,
-                        'pct_prematuros': prematuro,
-                        'pct_apgar_bajo': apgar_bajo,
-                        'pct_mortalidad_evitable': pct_evit,
-                        'pct_sin_control_prenatal': sin_prenatal,
-                        'num_instituciones': num_inst,
-                        'consultas_promedio': consultas,
-                        'presion_obstetrica': presion_obs,
-                        'pct_madres_adolescentes': adolesc,
-                        'pct_educacion_baja': bajo_educ,
-                        'total_nacimientos': nac,
-                        'pct_cesareas': cesareas,
-                        'pct_embarazos_alto_riesgo': pct_alto_r,
-                    }])
-                    
-                    # Alinear con features esperadas por el modelo
-                    for col in feature_names_q:
-                        if col not in X_q.columns:
-                            X_q[col] = 0.0
-                    X_q_aligned = X_q[feature_names_q]
-                    X_q_scaled = scaler_q.transform(X_q_aligned)
-                    
-                    # Predicciones de cuantiles
-                    p10_raw = modelo_p10.predict(X_q_scaled)[0]
-                    p50_raw = modelo_p50.predict(X_q_scaled)[0]
-                    p90_raw = modelo_p90.predict(X_q_scaled)[0]
-                    
-                    # Clip a valores no negativos y ordenar
-                    preds = sorted([max(0, p10_raw), max(0, p50_raw), max(0, p90_raw)])
-                    p10_pred, p50_pred, p90_pred = preds[0], preds[1], preds[2]
-                    
-                    # ================================================================
-                    # REGLAS DE COHERENCIA EPIDEMIOLÓGICA
-                    # ================================================================
-                    # Solo aplicamos restricciones con sustento científico demostrable
-                    
-                    # REGLA 1: RESTRICCIÓN MATEMÁTICA (Definición OMS)
-                    # ------------------------------------------------
-                    # Mortalidad Infantil = Neonatal + Post-neonatal
-                    # Por lo tanto: MI >= MN (siempre)
-                    # Fuente: WHO ICD-10, definiciones de mortalidad
-                    #
-                    # P10 (mejor caso) no puede ser menor que la mortalidad neonatal
-                    # porque eso implicaría mortalidad post-neonatal negativa (imposible)
-                    piso_neonatal = mort_neonatal
-                    
-                    # REGLA 2: PISO MÍNIMO OBSERVABLE
-                    # ------------------------------------------------
-                    # Los países con mejores indicadores (Japón, Finlandia) tienen
-                    # tasas de ~1.5-2.0‰. No existe lugar con 0‰.
-                    # Fuente: UNICEF State of World's Children 2023
-                    piso_minimo_mundial = 1.5
-                    
-                    # REGLA 3: TECHO MÁXIMO OBSERVABLE
-                    # ------------------------------------------------
-                    # Las tasas más altas registradas en zonas de crisis son ~100-120‰
-                    # En Colombia/Orinoquía histórico máximo ~180‰ (casos extremos)
-                    # Fuente: DANE Estadísticas Vitales 2020-2024
-                    techo_maximo = 150.0
-                    
-                    # APLICAR RESTRICCIONES
-                    # P10: el mejor caso realista
-                    p10_pred = max(p10_pred, piso_neonatal, piso_minimo_mundial)
-                    
-                    # P50: mediana, debe estar entre P10 y P90
-                    p50_pred = max(p50_pred, p10_pred + 0.1)
-                    
-                    # P90: el peor caso, limitado por observaciones históricas
-                    p90_pred = max(p90_pred, p50_pred + 0.1)
-                    p90_pred = min(p90_pred, techo_maximo)
-                    
-                    # REGLA 4: ANCHO MÍNIMO DE INTERVALO
-                    # ------------------------------------------------
-                    # Un intervalo de confianza con ancho 0 no tiene sentido estadístico
-                    # Mínimo práctico: diferencia observable entre cuantiles
-                    if (p90_pred - p10_pred) < 2.0:
-                        # Expandir simétricamente
-                        centro = (p10_pred + p90_pred) / 2
-                        p10_pred = max(centro - 1.0, piso_minimo_mundial)
-                        p90_pred = min(centro + 1.0, techo_maximo)
-                        p50_pred = centro
-                    
-                except Exception as e:
-                    # Fallback si falla predicción de cuantiles
-                    # Usamos heurística basada en coeficiente de variación observado
-                    cv = 0.35  # CV típico en datos de mortalidad infantil
-                    p10_pred = max(tasa_pred * (1 - cv), mort_neonatal, 1.5)
-                    p50_pred = tasa_pred
-                    p90_pred = min(tasa_pred * (1 + cv), 150.0)
-            else:
-                # Sin modelos de cuantiles: estimación por CV
-                # Fuente: Variabilidad observada en datos DANE Orinoquía
-                cv = 0.35
-                p10_pred = max(tasa_pred * (1 - cv), mort_neonatal, 1.5)
-                p50_pred = tasa_pred
-                p90_pred = min(tasa_pred * (1 + cv), 150.0)
-
-            st.session_state.resultado_prediccion = {
-                'tasa_pred': tasa_pred,
-                'tasa_pred_raw': tasa_pred_ml,  # Predicción ML pura para referencia
-                'mi_base': mi_base,
-                'ajuste_total': ajuste_total,
-                'factores_detectados': factores_detectados,
-                'features': features,
-                'X_columns': list(X.columns),
-                'restricciones_aplicadas': {
-                    'limite_inferior': limite_inferior,
-                    'formula_base': f"MN({mort_neonatal:.1f}) / 0.6 = {mi_base:.2f}‰"
-                },
-                # Nuevos: Intervalos de confianza
-                'p10': p10_pred,
-                'p50': p50_pred,
-                'p90': p90_pred
-            }
+        # Métricas de la caché de escenarios (todas las sesiones de este proceso)
+        cache = cache_predicciones()
+        if cache['consultas']:
+            respaldos = st.session_state.get('resultado_prediccion', {}).get('respaldos')
+            st.caption(f"Caché de escenarios: {cache['aciertos']}/{cache['consultas']} aciertos "
+                       f"({cache['aciertos'] / cache['consultas']:.0%}), {len(cache['escenarios'])} escenarios en memoria · "
+                       f"última predicción en {st.session_state.get('ms_prediccion', 0):.2f} ms"
+                       + (f" (sin cachear: respaldo en {', '.join(respaldos)})" if respaldos else ""))
 
         if 'resultado_prediccion' in st.session_state:
             res = st.session_state.resultado_prediccion
@@ -1354,6 +1558,7 @@ def main():
             mi_base = res.get('mi_base', tasa_pred)
             ajuste_total = res.get('ajuste_total', 0)
             factores_detectados = res.get('factores_detectados', [])
+            factores_modelo = res.get('factores_modelo')
             
             # Intervalos de confianza
             p10 = res.get('p10', tasa_pred * 0.65)
@@ -1441,6 +1646,18 @@ def main():
                         st.markdown(f"🔸 **{nombre}** ({valor_str}) → +{ajuste:.1f}‰")
                 else:
                     st.success("✅ No se detectaron factores de riesgo adicionales. La predicción se basa solo en la mortalidad neonatal.")
+
+                # FACTORES DEL MODELO ML (TreeSHAP sobre el escenario)
+                if factores_modelo is not None:
+                    st.markdown("#### 🤖 Factores del Modelo ML (TreeSHAP)")
+                    st.caption(f"Predicción ML pura: {res['tasa_pred_raw']:.2f}‰ "
+                               f"(valor base {factores_modelo['valor_base'].iloc[0]:.2f}‰)")
+                    if res.get('fuera_de_rango'):
+                        st.warning("Entradas fuera del rango de entrenamiento (la predicción ML extrapola): "
+                                   + ", ".join(f"{c} ({z:+.1f} escalas)" for c, z in res['fuera_de_rango'].items()))
+                    for fila in factores_modelo.itertuples():
+                        signo = '🔺' if fila.contribucion > 0 else '🔻'
+                        st.markdown(f"{signo} **{fila.feature}** → {fila.contribucion:+.2f}‰")
                     
             st.markdown("---")
             
@@ -1,15 +1,25 @@
-import pandas as pd
-import numpy as np
+import os
+import sys
 
-df = pd.read_csv('data/processed/features_municipio_anio.csv')
-df = df[df['total_nacimientos'] >= 10].copy()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from almacenamiento import leer_tabla
+from base_analitica import BASE_FILE, FEATURES_FILE, agregar
 
-df_arauca = df[df['COD_DPTO'] == 81]
+FILTROS = {'COD_DPTO': 81, 'ANO': [2020, 2024], 'total_nacimientos': (10, None)}
 
-df_2024 = df_arauca[df_arauca['ANO'] == 2024]
-weighted_mean = (df_2024['defunciones_fetales'].sum() / df_2024['total_nacimientos'].sum()) * 1000
-print(f'2024 Arauca Weighted Mean: {weighted_mean}')
+# Media ponderada de Arauca por año, resuelta en la base analítica (python src/base_analitica.py)
+if os.path.exists(BASE_FILE):
+    arauca = agregar(
+        'features_municipio_anio',
+        {'media_ponderada': '1000.0 * SUM(defunciones_fetales) / SUM(total_nacimientos)'},
+        por=['ANO'],
+        filtros=FILTROS,
+    ).set_index('ANO')['media_ponderada']
+else:
+    # Sin base (no se versiona): la tabla de features con los mismos filtros
+    df = leer_tabla(FEATURES_FILE, columnas=['ANO', 'defunciones_fetales', 'total_nacimientos'], filtros=FILTROS)
+    sumas = df.groupby('ANO')[['defunciones_fetales', 'total_nacimientos']].sum()
+    arauca = 1000.0 * sumas['defunciones_fetales'] / sumas['total_nacimientos']
 
-df_2020 = df_arauca[df_arauca['ANO'] == 2020]
-weighted_mean_2020 = (df_2020['defunciones_fetales'].sum() / df_2020['total_nacimientos'].sum()) * 1000
-print(f'2020 Arauca Weighted Mean: {weighted_mean_2020}')
+print(f'2024 Arauca Weighted Mean: {arauca[2024]}')
+print(f'2020 Arauca Weighted Mean: {arauca[2020]}')
@@ -101,6 +101,16 @@ if ($continuar -eq 's' -or $continuar -eq 'S') {
     Write-Host "✅ Features generadas exitosamente" -ForegroundColor Green
     Write-Host "   → Archivo: data/processed/features_municipio_anio.csv" -ForegroundColor White
     Write-Host ""
+    Write-Host "🗄️  Construyendo base analítica (base_analitica.py)..." -ForegroundColor Yellow
+    
+    python src/base_analitica.py
+    
+    if ($LASTEXITCODE -ne 0) {
+        Write-Host "⚠️  Advertencia en la construcción de la base analítica" -ForegroundColor Yellow
+    } else {
+        Write-Host "   → Base: data/processed/alertamaterna.duckdb (o .sqlite sin DuckDB)" -ForegroundColor White
+    }
+    Write-Host ""
     Start-Sleep -Seconds 2
 } else {
     Write-Host "⏭️  Saltando generación de features..." -ForegroundColor Yellow
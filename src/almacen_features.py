@@ -0,0 +1,274 @@
+"""
+Almacén local de features por municipio-año (feature store).
+
+Las features derivadas (las sintéticas del modelo y el objetivo) se definen
+una sola vez en DEFINICIONES y se materializan junto con la tabla anual en un
+arreglo en disco, ordenado por (municipio, año) y abierto con mmap:
+
+    data/processed/feature_store/v{VERSION_FEATURES}/
+        claves.npy       int64 (filas, 2): ID_MUNICIPIO (DIVIPOLA 5 dígitos), ANO
+        valores.npy      float64 (filas, columnas)
+        metadatos.json   columnas y tipos, versión, huella de las definiciones, fuente
+
+Entrenamiento y dashboard obtienen los mismos vectores con get_features(ids,
+anios): lectura vectorizada (np.searchsorted) y "point-in-time": para cada
+(municipio, año) se devuelve la última fila disponible con ANO ≤ año, nunca
+información posterior.
+
+Uso (desde src/, después de features.py):
+    python almacen_features.py
+
+Proyecto: AlertaMaterna
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import leer_tabla
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'processed')
+FEATURES_FILE = os.path.join(DATA_DIR, 'features_municipio_anio.csv')
+STORE_DIR = os.path.join(DATA_DIR, 'feature_store')
+
+# Subir al cambiar el significado de una definición (la huella detecta cambios de código)
+VERSION_FEATURES = 1
+
+CLAVE = ['COD_DPTO', 'COD_MUNIC', 'ANO']
+
+# ============================================================================
+# DEFINICIONES DE FEATURES DERIVADAS
+# ============================================================================
+
+def _ratio_neonatal_fetal(df):
+    """Ratio mortalidad neonatal / fetal (indica calidad de atención)"""
+    return np.where(
+        df['tasa_mortalidad_fetal'] > 0,
+        df['tasa_mortalidad_neonatal'] / df['tasa_mortalidad_fetal'],
+        0
+    )
+
+def _cobertura_prenatal(df):
+    """Índice de cobertura prenatal (inverso de sin control)"""
+    return 1 - df['pct_sin_control_prenatal']
+
+def _indice_riesgo_neonatal(df):
+    """Índice de riesgo neonatal compuesto"""
+    return (
+        df['tasa_mortalidad_neonatal'] * 0.5 +
+        df['pct_bajo_peso'] * 100 * 0.3 +
+        df['pct_prematuros'] * 100 * 0.2
+    )
+
+def _neonatal_x_sin_prenatal(df):
+    """Interacción: mortalidad neonatal * falta de control"""
+    return df['tasa_mortalidad_neonatal'] * df['pct_sin_control_prenatal'] * 100
+
+def _infraestructura_deficiente(df):
+    """Indicador de infraestructura deficiente (< 5 instituciones)"""
+    return (df['num_instituciones'] < 5).astype(int)
+
+def _log_nacimientos(df):
+    """Log de nacimientos (para escala)"""
+    return np.log1p(df['total_nacimientos'])
+
+def _tasa_mortalidad_infantil(df):
+    """Objetivo: defunciones < 1 año por 1.000 nacimientos"""
+    return (df['total_defunciones'] / df['total_nacimientos']) * 1000
+
+# Nombre -> (función vectorizada, columnas de entrada). Las funciones solo indexan
+# por nombre de columna: sirven igual para un DataFrame que para un dict de arreglos
+DEFINICIONES = {
+    'ratio_neonatal_fetal': (_ratio_neonatal_fetal, ['tasa_mortalidad_fetal', 'tasa_mortalidad_neonatal']),
+    'cobertura_prenatal': (_cobertura_prenatal, ['pct_sin_control_prenatal']),
+    'indice_riesgo_neonatal': (_indice_riesgo_neonatal, ['tasa_mortalidad_neonatal', 'pct_bajo_peso', 'pct_prematuros']),
+    'neonatal_x_sin_prenatal': (_neonatal_x_sin_prenatal, ['tasa_mortalidad_neonatal', 'pct_sin_control_prenatal']),
+    'infraestructura_deficiente': (_infraestructura_deficiente, ['num_instituciones']),
+    'log_nacimientos': (_log_nacimientos, ['total_nacimientos']),
+    'tasa_mortalidad_infantil': (_tasa_mortalidad_infantil, ['total_defunciones', 'total_nacimientos']),
+}
+
+# Entradas del modelo de mortalidad, en orden. Lista explícita: una columna nueva de
+# features.py no se vuelve predictor hasta agregarla aquí. Las *_cohorte quedan fuera
+# siempre: salen de las mismas defunciones infantiles que el objetivo. presion_obstetrica
+# (también lo incluye) se conserva por los modelos guardados; el dashboard la imputa
+FEATURES_MODELO = [
+    'tasa_mortalidad_neonatal', 'tasa_mortalidad_fetal',
+    'pct_bajo_peso', 'pct_prematuros', 'pct_apgar_bajo',
+    'pct_sin_control_prenatal', 'cobertura_prenatal', 'num_instituciones', 'consultas_promedio',
+    'pct_madres_adolescentes', 'pct_educacion_baja', 'total_nacimientos', 'log_nacimientos',
+    'indice_riesgo_neonatal', 'neonatal_x_sin_prenatal', 'infraestructura_deficiente',
+    'pct_cesareas', 'presion_obstetrica', 'pct_mortalidad_evitable',
+]
+
+def huella_definiciones():
+    """Hash del código de las definiciones: cambia si cambia cualquier fórmula"""
+    fuente = ''.join(f'{nombre}:{inspect.getsource(funcion)}' for nombre, (funcion, _) in DEFINICIONES.items())
+    return hashlib.sha256(fuente.encode('utf-8')).hexdigest()[:16]
+
+def derivar_features(df, columnas=None):
+    """
+    Agrega las features derivadas a df (in place, también lo devuelve).
+
+    Solo calcula las definiciones cuyas columnas de entrada existen.
+    """
+    for nombre, (funcion, entradas) in DEFINICIONES.items():
+        if columnas is not None and nombre not in columnas:
+            continue
+        if all(c in df.columns for c in entradas):
+            df[nombre] = funcion(df)
+    return df
+
+# ============================================================================
+# MATERIALIZACIÓN
+# ============================================================================
+
+def id_municipio(cod_dpto, cod_munic):
+    """Código DIVIPOLA de 5 dígitos (COD_MUNIC en las features es el código corto)"""
+    return np.asarray(cod_dpto, dtype=np.int64) * 1000 + np.asarray(cod_munic, dtype=np.int64) % 1000
+
+def directorio_version(version=VERSION_FEATURES, store_dir=STORE_DIR):
+    """Carpeta de una versión del almacén"""
+    return os.path.join(store_dir, f'v{version}')
+
+def materializar(df=None, version=VERSION_FEATURES, store_dir=STORE_DIR):
+    """
+    Deriva las features de la tabla anual y las escribe en el almacén,
+    ordenadas por (municipio, año). Devuelve el directorio de la versión.
+    """
+    if df is None:
+        df = leer_tabla(FEATURES_FILE)
+    df = derivar_features(df.copy())
+
+    ids = id_municipio(df['COD_DPTO'], df['COD_MUNIC'])
+    anios = df['ANO'].to_numpy(dtype=np.int64)
+    orden = np.lexsort((anios, ids))
+
+    columnas = [c for c in df.select_dtypes('number').columns if c not in CLAVE]
+    claves = np.column_stack([ids, anios])[orden]
+    valores = df[columnas].to_numpy(dtype=np.float64)[orden]
+
+    if (np.diff(claves[:, 0] * 10000 + claves[:, 1]) == 0).any():
+        raise ValueError("Claves (municipio, año) duplicadas en la tabla de features")
+
+    destino = directorio_version(version, store_dir)
+    os.makedirs(destino, exist_ok=True)
+    np.save(os.path.join(destino, 'claves.npy'), claves)
+    np.save(os.path.join(destino, 'valores.npy'), valores)
+
+    metadatos = {
+        'version': version,
+        'huella_definiciones': huella_definiciones(),
+        'columnas': columnas,
+        'tipos': {c: str(df[c].dtype) for c in columnas},
+        'derivadas': list(DEFINICIONES),
+        'filas': len(claves),
+        'fuente': os.path.basename(FEATURES_FILE),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(destino, 'metadatos.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f, ensure_ascii=False, indent=2)
+    return destino
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def abrir_store(version=VERSION_FEATURES, store_dir=STORE_DIR):
+    """
+    Abre una versión del almacén (valores con mmap, solo lectura).
+
+    Falla si las definiciones actuales no coinciden con las materializadas,
+    para no servir features calculadas con otra fórmula.
+    """
+    destino = directorio_version(version, store_dir)
+    with open(os.path.join(destino, 'metadatos.json'), encoding='utf-8') as f:
+        metadatos = json.load(f)
+    if metadatos['huella_definiciones'] != huella_definiciones():
+        raise ValueError(f"El almacén v{version} se materializó con otras definiciones: "
+                         "ejecutar almacen_features.py o subir VERSION_FEATURES")
+
+    claves = np.load(os.path.join(destino, 'claves.npy'))
+    return {
+        'claves': claves,
+        'orden': claves[:, 0] * 10000 + claves[:, 1],
+        'valores': np.load(os.path.join(destino, 'valores.npy'), mmap_mode='r'),
+        'columnas': metadatos['columnas'],
+        'posicion': {c: i for i, c in enumerate(metadatos['columnas'])},
+        'metadatos': metadatos,
+    }
+
+def get_features(ids, anios, columnas=None, store=None):
+    """
+    Vectores de features para cada (municipio, año), en el orden pedido.
+
+    Point-in-time: si el año no tiene fila se usa la última anterior del mismo
+    municipio (ANO_FUENTE indica cuál); sin historia previa la fila queda en NaN.
+    """
+    store = store if store is not None else abrir_store()
+    ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+    anios = np.broadcast_to(np.asarray(anios, dtype=np.int64), ids.shape)
+
+    columnas = columnas if columnas is not None else store['columnas']
+    indices_col = [store['posicion'][c] for c in columnas]
+
+    fila = np.searchsorted(store['orden'], ids * 10000 + anios, side='right') - 1
+    valida = (fila >= 0) & (store['claves'][np.clip(fila, 0, None), 0] == ids)
+
+    valores = np.full((len(ids), len(columnas)), np.nan)
+    valores[valida] = store['valores'][fila[valida]][:, indices_col]
+    anio_fuente = np.where(valida, store['claves'][np.clip(fila, 0, None), 1], -1)
+
+    resultado = pd.DataFrame(valores, columns=columnas)
+    resultado.insert(0, 'ANO_FUENTE', anio_fuente)
+    resultado.insert(0, 'ANO', anios)
+    resultado.insert(0, 'ID_MUNICIPIO', ids)
+    return resultado
+
+def tabla_features(version=VERSION_FEATURES, store_dir=STORE_DIR):
+    """
+    Tabla completa del almacén (para entrenar), con COD_DPTO/COD_MUNIC/ANO y
+    los tipos originales de cada columna.
+
+    Si la versión no existe o sus definiciones están desactualizadas, se
+    materializa desde features_municipio_anio.
+    """
+    try:
+        store = abrir_store(version, store_dir)
+    except (FileNotFoundError, ValueError):
+        materializar(version=version, store_dir=store_dir)
+        store = abrir_store(version, store_dir)
+
+    ids, anios = store['claves'][:, 0], store['claves'][:, 1]
+    tabla = get_features(ids, anios, store=store).drop(columns=['ID_MUNICIPIO', 'ANO_FUENTE'])
+    tabla = tabla.astype(store['metadatos']['tipos'])
+    tabla.insert(0, 'COD_MUNIC', ids % 1000)
+    tabla.insert(0, 'COD_DPTO', ids // 1000)
+    return tabla
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def main():
+    print("=" * 80)
+    print("ALMACÉN DE FEATURES - ALERTAMATERNA")
+    print("=" * 80)
+    destino = materializar()
+    store = abrir_store()
+    print(f"  ✓ {store['metadatos']['filas']} municipios-año × {len(store['columnas'])} features "
+          f"({len(store['metadatos']['derivadas'])} derivadas)")
+    print(f"  ✓ Versión {VERSION_FEATURES}, huella {store['metadatos']['huella_definiciones']}")
+    print(f"  ✓ {destino}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Almacenamiento columnar de las tablas del pipeline.
+
+Cada tabla intermedia o final se guarda en Parquet (tipos preservados,
+compresión por columna) con metadatos de esquema embebidos, y además en CSV
+como exportación para Excel / revisión manual:
+
+    features_municipio_anio.parquet   ← formato de trabajo (lo leen los consumidores)
+    features_municipio_anio.csv       ← exportación
+
+Los consumidores siguen referenciando la ruta .csv: leer_tabla() usa el
+.parquet hermano si existe y cae al CSV si no (o si pyarrow no está instalado).
+
+Con particiones, guardar_tabla() escribe además una copia particionada estilo
+hive (features_municipio_anio/ANO=2024/COD_DPTO=81/...). leer_tabla(filtros=...)
+lee de ella solo los archivos de las particiones pedidas; sin copia
+particionada, los filtros se aplican en la lectura del Parquet (estadísticas de
+row groups) o, en último caso, sobre el CSV.
+
+Metadatos embebidos (clave 'alertamaterna'):
+    version_esquema, generado_por, fecha, filas, columnas, bytes_csv
+
+Al leer, una version_esquema distinta de VERSION_ESQUEMA es un error. Un
+.parquet cuyo CSV hermano cambió después (bytes_csv distinto; en tablas
+anteriores a ese campo, CSV más nuevo) se ignora y se lee el CSV. La copia
+particionada solo se usa si sus metadatos son los del .parquet.
+
+Proyecto: AlertaMaterna
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PARQUET_DISPONIBLE = True
+except ImportError:
+    PARQUET_DISPONIBLE = False
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Subir cuando cambie el significado o el tipo de alguna columna
+VERSION_ESQUEMA = 1
+CLAVE_METADATOS = b'alertamaterna'
+COMPRESION = 'zstd'
+
+# Tablas sin bytes_csv: margen (s) entre las fechas de modificación del CSV y del
+# Parquet, que un checkout de git escribe casi a la vez
+TOLERANCIA_MTIME = 2.0
+
+# ============================================================================
+# RUTAS
+# ============================================================================
+
+def ruta_parquet(ruta_csv):
+    """features_x.csv / features_x.csv.gz -> features_x.parquet"""
+    base = ruta_csv
+    for extension in ('.gz', '.csv'):
+        if base.endswith(extension):
+            base = base[:-len(extension)]
+    return f'{base}.parquet'
+
+def ruta_particionada(ruta_csv):
+    """features_x.csv -> directorio features_x/ (copia particionada)"""
+    return ruta_parquet(ruta_csv)[:-len('.parquet')]
+
+def _columnas_particion(directorio):
+    """Columnas de partición en orden, leídas de los nombres de directorio (ANO=2024/...)"""
+    columnas = []
+    while True:
+        niveles = sorted(d for d in os.listdir(directorio)
+                         if '=' in d and os.path.isdir(os.path.join(directorio, d)))
+        if not niveles:
+            return columnas
+        columnas.append(niveles[0].split('=', 1)[0])
+        directorio = os.path.join(directorio, niveles[0])
+
+# ============================================================================
+# ESCRITURA Y LECTURA
+# ============================================================================
+
+def guardar_tabla(df, ruta_csv, generado_por, exportar_csv=True, particiones=None):
+    """
+    Guarda df en Parquet con metadatos de esquema y, opcionalmente, la
+    exportación CSV en ruta_csv. Devuelve la ruta del formato de trabajo.
+
+    particiones: columnas (p. ej. ['ANO', 'COD_DPTO']) para la copia particionada.
+    """
+    if exportar_csv or not PARQUET_DISPONIBLE:
+        df.to_csv(ruta_csv, index=False)
+    if not PARQUET_DISPONIBLE:
+        return ruta_csv
+
+    metadatos = {
+        'version_esquema': VERSION_ESQUEMA,
+        'generado_por': generado_por,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'filas': len(df),
+        'columnas': len(df.columns),
+        # None: sin exportación, un CSV que exista es de otra corrida
+        'bytes_csv': os.path.getsize(ruta_csv) if exportar_csv else None,
+    }
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({
+        **(tabla.schema.metadata or {}),
+        CLAVE_METADATOS: json.dumps(metadatos).encode('utf-8'),
+    })
+
+    destino = ruta_parquet(ruta_csv)
+    pq.write_table(tabla, destino, compression=COMPRESION)
+    if particiones:
+        guardar_particiones(tabla, ruta_csv, particiones)
+    return destino
+
+def guardar_particiones(tabla, ruta_csv, particiones):
+    """Copia particionada estilo hive; se escribe aparte y reemplaza a la anterior al final"""
+    if isinstance(tabla, pd.DataFrame):
+        tabla = pa.Table.from_pandas(tabla, preserve_index=False)
+    directorio = ruta_particionada(ruta_csv)
+    temporal = f'{directorio}.tmp'
+    shutil.rmtree(temporal, ignore_errors=True)
+    pq.write_to_dataset(tabla, temporal, partition_cols=list(particiones), compression=COMPRESION)
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.replace(temporal, directorio)
+    return directorio
+
+def _filtros_arrow(filtros):
+    """{columna: valor | [valores] | (mínimo, máximo)} -> filtros de pyarrow (None = abierto)"""
+    expresiones = []
+    for columna, valor in filtros.items():
+        if isinstance(valor, tuple):
+            minimo, maximo = valor
+            if minimo is not None:
+                expresiones.append((columna, '>=', minimo))
+            if maximo is not None:
+                expresiones.append((columna, '<=', maximo))
+        elif isinstance(valor, (list, set, pd.Index, pd.Series)):
+            expresiones.append((columna, 'in', list(valor)))
+        else:
+            expresiones.append((columna, '==', valor))
+    return expresiones
+
+def _mascara(df, filtros):
+    """Los mismos filtros sobre un DataFrame (lectura desde CSV)"""
+    mascara = pd.Series(True, index=df.index)
+    for columna, operador, valor in _filtros_arrow(filtros):
+        if operador == 'in':
+            mascara &= df[columna].isin(valor)
+        elif operador == '>=':
+            mascara &= df[columna] >= valor
+        elif operador == '<=':
+            mascara &= df[columna] <= valor
+        else:
+            mascara &= df[columna] == valor
+    return mascara
+
+def leer_tabla(ruta_csv, columnas=None, filtros=None):
+    """
+    Lee una tabla del pipeline: Parquet si existe (tipos exactos, solo las
+    columnas pedidas), si no el CSV.
+
+    filtros: {columna: valor | [valores] | (mínimo, máximo)}; solo se cargan las
+    filas que los cumplen. Las lecturas filtradas no garantizan el orden original.
+    """
+    origen = ruta_parquet(ruta_csv)
+    if PARQUET_DISPONIBLE and os.path.exists(origen) and _parquet_vigente(ruta_csv, origen):
+        if not filtros:
+            return pd.read_parquet(origen, columns=columnas)
+        directorio = ruta_particionada(ruta_csv)
+        if os.path.isdir(directorio) and _particiones_vigentes(directorio, origen):
+            # Tipos de las columnas de partición: los del Parquet completo (no inferidos del nombre)
+            esquema = pq.read_schema(origen)
+            particion = ds.partitioning(
+                pa.schema([esquema.field(c) for c in _columnas_particion(directorio)]), flavor='hive')
+            tabla = pq.read_table(directorio, columns=columnas, filters=_filtros_arrow(filtros), partitioning=particion)
+            return tabla.select(columnas or [c for c in esquema.names if c in tabla.column_names]).to_pandas()
+        return pd.read_parquet(origen, columns=columnas, filters=_filtros_arrow(filtros))
+
+    usar = None if columnas is None else list(dict.fromkeys(list(columnas) + list(filtros or {})))
+    df = pd.read_csv(ruta_csv, usecols=usar)
+    if filtros:
+        df = df[_mascara(df, filtros)].reset_index(drop=True)
+    return df if columnas is None else df[columnas]
+
+def _metadatos_archivo(archivo):
+    metadatos = pq.read_schema(archivo).metadata or {}
+    if CLAVE_METADATOS not in metadatos:
+        return None
+    return json.loads(metadatos[CLAVE_METADATOS])
+
+def columnas_tabla(ruta_csv):
+    """Nombres de columna sin leer datos (esquema del Parquet o encabezado del CSV)"""
+    origen = ruta_parquet(ruta_csv)
+    if PARQUET_DISPONIBLE and os.path.exists(origen) and _parquet_vigente(ruta_csv, origen):
+        return pq.read_schema(origen).names
+    return pd.read_csv(ruta_csv, nrows=0).columns.tolist()
+
+def leer_metadatos(ruta_csv):
+    """Metadatos de esquema de la tabla (None si solo existe el CSV)"""
+    origen = ruta_parquet(ruta_csv)
+    if not (PARQUET_DISPONIBLE and os.path.exists(origen)):
+        return None
+    return _metadatos_archivo(origen)
+
+def _parquet_vigente(ruta_csv, origen):
+    """
+    El .parquet es el formato de trabajo salvo que el CSV se haya reescrito
+    después (sin pyarrow o a mano). Otra versión de esquema es un error: las
+    columnas significan otra cosa y el CSV de la misma corrida también.
+    """
+    metadatos = _metadatos_archivo(origen) or {}
+    version = metadatos.get('version_esquema', VERSION_ESQUEMA)
+    if version != VERSION_ESQUEMA:
+        raise ValueError(f"{origen}: versión de esquema {version}, se esperaba {VERSION_ESQUEMA} "
+                         f"(regenerar con {metadatos.get('generado_por')})")
+    if not os.path.exists(ruta_csv):
+        return True
+    if 'bytes_csv' in metadatos:
+        vigente = metadatos['bytes_csv'] in (None, os.path.getsize(ruta_csv))
+    else:
+        vigente = os.path.getmtime(ruta_csv) <= os.path.getmtime(origen) + TOLERANCIA_MTIME
+    if not vigente:
+        print(f"⚠️  {os.path.basename(ruta_csv)} cambió después de {os.path.basename(origen)}: se lee el CSV")
+    return vigente
+
+def _particiones_vigentes(directorio, origen):
+    """La copia particionada viene de la misma escritura que el .parquet (mismos metadatos)"""
+    for raiz, _, archivos in os.walk(directorio):
+        for archivo in archivos:
+            if archivo.endswith('.parquet'):
+                return _metadatos_archivo(os.path.join(raiz, archivo)) == _metadatos_archivo(origen)
+    return False
@@ -6,6 +6,9 @@ Genera un reporte de qué columnas tienen códigos disponibles y cómo se deben
 import pandas as pd
 import os
 
+from diccionario_codigos import cargar_diccionario, decodificar_dataframe
+from perfil_codigos import perfilar_archivo
+
 # Rutas de archivos
 data_dir = "data/processed"
 codigos_nacimientos = os.path.join(data_dir, "codigos_nacimientos_dane.csv")
@@ -19,22 +22,17 @@ defunciones_no_fetales_file = os.path.join(data_dir, "defunciones_no_fetales_202
 def cargar_codigos(archivo):
     """Carga archivo de códigos y devuelve diccionario por variable."""
     df = pd.read_csv(archivo)
-    codigos_dict = {}
-    
-    for variable in df['variable'].unique():
-        df_var = df[df['variable'] == variable]
-        # Crear diccionario codigo -> descripcion
-        codigos_dict[variable] = dict(zip(
-            df_var['codigo'].astype(str), 
-            df_var['descripcion']
-        ))
     
-    return codigos_dict
+    # Una sola pasada con groupby: diccionario codigo -> descripcion por variable
+    return {
+        variable: dict(zip(df_var['codigo'].astype(str), df_var['descripcion']))
+        for variable, df_var in df.groupby('variable', sort=False)
+    }
 
-def obtener_columnas_dataset(archivo, nrows=1000):
-    """Obtiene las columnas de un dataset grande."""
-    df = pd.read_csv(archivo, nrows=nrows)
-    return df.columns.tolist(), df
+def obtener_columnas_dataset(archivo, archivo_codigos):
+    """Perfila el dataset COMPLETO por bloques (no una muestra de las primeras filas)."""
+    perfil = perfilar_archivo(archivo, cargar_diccionario(archivo_codigos))
+    return perfil['columna'].tolist(), perfil.set_index('columna')
 
 def analizar_correspondencia():
     """Analiza la correspondencia entre columnas y códigos."""
@@ -55,19 +53,19 @@ def analizar_correspondencia():
     
     # Analizar cada dataset
     datasets = [
-        ("NACIMIENTOS", nacimientos_file, cod_nac),
-        ("DEFUNCIONES FETALES", defunciones_fetales_file, cod_def_fet),
-        ("DEFUNCIONES NO FETALES", defunciones_no_fetales_file, cod_def_no_fet)
+        ("NACIMIENTOS", nacimientos_file, codigos_nacimientos, cod_nac),
+        ("DEFUNCIONES FETALES", defunciones_fetales_file, codigos_defunciones_fetales, cod_def_fet),
+        ("DEFUNCIONES NO FETALES", defunciones_no_fetales_file, codigos_defunciones_no_fetales, cod_def_no_fet)
     ]
     
     resultados = {}
     
-    for nombre, archivo, codigos in datasets:
+    for nombre, archivo, archivo_codigos, codigos in datasets:
         print(f"\n{'='*80}")
         print(f"📊 ANALIZANDO: {nombre}")
         print(f"{'='*80}")
         
-        columnas, df_muestra = obtener_columnas_dataset(archivo)
+        columnas, perfil = obtener_columnas_dataset(archivo, archivo_codigos)
         print(f"\n   Total de columnas: {len(columnas)}")
         
         con_codigo = []
@@ -87,15 +85,18 @@ def analizar_correspondencia():
             print(f"\n   📋 COLUMNAS QUE SE PUEDEN DECODIFICAR ({len(con_codigo)}):")
             for col in sorted(con_codigo):
                 num_codigos = len(codigos[col])
-                # Mostrar valores únicos en la muestra
-                valores_muestra = df_muestra[col].dropna().unique()[:5]
-                print(f"      • {col:20s} ({num_codigos} códigos) - Valores ejemplo: {valores_muestra}")
+                fila = perfil.loc[col]
+                fuera = int(fila['registros_fuera_diccionario'])
+                estado = f"{fuera:,} registros fuera de diccionario ({fila['ejemplos_fuera_diccionario']})" if fuera else "cobertura completa"
+                print(f"      • {col:20s} ({num_codigos} códigos, {int(fila['distintos'])} observados) - {estado}")
         
         # Mostrar columnas sin código
         if sin_codigo:
             print(f"\n   📋 COLUMNAS QUE NO SE DECODIFICAN ({len(sin_codigo)}):")
             for col in sorted(sin_codigo):
-                print(f"      • {col}")
+                fila = perfil.loc[col]
+                aprox = '~' if fila['metodo_distintos'] == 'hll' else ''
+                print(f"      • {col:20s} ({aprox}{int(fila['distintos']):,} distintos, {fila['pct_nulos']:.1f}% nulos)")
         
         resultados[nombre] = {
             'total': len(columnas),
@@ -158,17 +159,18 @@ codigos_dpto = codigos_dpto.rename(columns={'codigo': 'COD_DPTO', 'descripcion':
 # Hacer merge
 df = df.merge(codigos_dpto, on='COD_DPTO', how='left')
 
-MÉTODO 3: Crear un diccionario global
---------------------------------------
-# Si quieres mantener los códigos originales pero poder consultarlos
-codigo_to_desc = {}
-for variable in codigos['variable'].unique():
-    df_var = codigos[codigos['variable'] == variable]
-    for _, row in df_var.iterrows():
-        codigo_to_desc[(variable, str(row['codigo']))] = row['descripcion']
+MÉTODO 3: Diccionario compilado (recomendado para archivos grandes)
+--------------------------------------------------------------------
+from diccionario_codigos import cargar_diccionario, decodificar_dataframe, decodificar_columna
+
+# Se compila una sola vez (cacheado): arreglo NumPy código -> etiqueta por variable
+diccionario = cargar_diccionario('codigos_nacimientos_dane.csv')
+
+# Decodificación vectorizada (take) de todas las columnas con código → *_DESC categóricas
+df = decodificar_dataframe(df, diccionario)
 
-# Uso:
-descripcion = codigo_to_desc[('COD_DPTO', '11')]  # Returns: 'Bogotá'
+# O una sola columna:
+peso = decodificar_columna(df['PESO_NAC'], diccionario['PESO_NAC'])
 """)
     
     # Mostrar ejemplo práctico
@@ -178,24 +180,15 @@ descripcion = codigo_to_desc[('COD_DPTO', '11')]  # Returns: 'Bogotá'
     
     # Tomar muestra de nacimientos
     df_nac_sample = pd.read_csv(nacimientos_file, nrows=3)
-    cod_nac_df = pd.read_csv(codigos_nacimientos)
     
     print("\n📄 DATOS ORIGINALES (primeras 3 filas de NACIMIENTOS):")
     print(df_nac_sample[['COD_DPTO', 'SEXO', 'PESO_NAC', 'EDAD_MADRE']].to_string())
     
-    # Crear mapeos
-    mapeos = {}
-    for variable in ['COD_DPTO', 'SEXO', 'PESO_NAC', 'EDAD_MADRE']:
-        df_var = cod_nac_df[cod_nac_df['variable'] == variable]
-        mapeos[variable] = dict(zip(
-            df_var['codigo'].astype(str), 
-            df_var['descripcion']
-        ))
-    
-    # Aplicar mapeos
-    df_decoded = df_nac_sample.copy()
-    for col in ['COD_DPTO', 'SEXO', 'PESO_NAC', 'EDAD_MADRE']:
-        df_decoded[f'{col}_DESC'] = df_decoded[col].astype(str).map(mapeos[col])
+    # Aplicar diccionario compilado (decodificación vectorizada)
+    df_decoded = decodificar_dataframe(
+        df_nac_sample, cargar_diccionario(codigos_nacimientos),
+        columnas=['COD_DPTO', 'SEXO', 'PESO_NAC', 'EDAD_MADRE']
+    )
     
     print("\n📄 DATOS DECODIFICADOS (con descripciones):")
     print(df_decoded[['COD_DPTO', 'COD_DPTO_DESC', 'SEXO', 'SEXO_DESC', 'PESO_NAC', 'PESO_NAC_DESC', 'EDAD_MADRE', 'EDAD_MADRE_DESC']].to_string())
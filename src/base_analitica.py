@@ -0,0 +1,230 @@
+"""
+Base analítica embebida con los registros crudos y la tabla de features.
+
+Cada pregunta ad-hoc (check_stats.py, validaciones de la presentación) recargaba
+CSV completos en pandas. Aquí el pipeline materializa una base local con:
+
+    nacimientos, defunciones_fetales, defunciones_no_fetales   registros DANE crudos
+    features_municipio_anio                                    tabla de features
+
+Todas las tablas llevan ID_MUNICIPIO (DIVIPOLA 5 dígitos, lugar de ocurrencia)
+y las crudas además ID_RESIDENCIA; hay índices sobre (ID_MUNICIPIO, ANO) y ANO,
+así que los filtros por municipio o año se resuelven en la base (predicate
+pushdown) y a pandas solo llega el resultado agregado.
+
+Motor: DuckDB (columnar, lee los CSV de forma nativa) si está instalado; si no,
+SQLite de la biblioteca estándar, cargado por bloques de CHUNKSIZE filas.
+
+    from base_analitica import agregar, consultar
+    agregar('nacimientos', {'nacimientos': 'COUNT(*)'}, por=['ANO'], filtros={'COD_DPTO': 81})
+    consultar('SELECT ANO, COUNT(*) AS n FROM defunciones_fetales WHERE ID_MUNICIPIO = ? GROUP BY ANO', [81001])
+
+Uso (desde src/, después de features.py):
+    python base_analitica.py
+
+Proyecto: AlertaMaterna
+"""
+
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from almacenamiento import leer_tabla
+
+try:
+    import duckdb
+    MOTOR = 'duckdb'
+except ImportError:
+    MOTOR = 'sqlite'
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'processed')
+BASE_FILE = os.path.join(DATA_DIR, f'alertamaterna.{MOTOR}')
+CHUNKSIZE = 250_000
+
+# Tabla -> archivo crudo en DATA_DIR (los que falten se omiten)
+FUENTES = {
+    'nacimientos': 'nacimientos_2020_2024.csv',
+    'defunciones_fetales': 'defunciones_fetales_2020_2024.csv',
+    'defunciones_no_fetales': 'defunciones_no_fetales_2020_2024.csv',
+}
+TABLA_FEATURES = 'features_municipio_anio'
+FEATURES_FILE = os.path.join(DATA_DIR, f'{TABLA_FEATURES}.csv')
+
+ID_MUNICIPIO_SQL = 'CAST(COD_DPTO AS INTEGER) * 1000 + CAST(COD_MUNIC AS INTEGER)'
+ID_RESIDENCIA_SQL = 'CAST(CODPTORE AS INTEGER) * 1000 + CAST(CODMUNRE AS INTEGER)'
+
+# ============================================================================
+# CONEXIÓN
+# ============================================================================
+
+def _motor_de(ruta):
+    return 'duckdb' if ruta.endswith('.duckdb') else 'sqlite'
+
+def conectar(ruta=BASE_FILE, solo_lectura=True):
+    """Conexión a la base (DuckDB o SQLite según la extensión del archivo)"""
+    if solo_lectura and not os.path.exists(ruta):
+        raise FileNotFoundError(f"{ruta} no existe: ejecutar primero base_analitica.py")
+    if _motor_de(ruta) == 'duckdb':
+        return duckdb.connect(ruta, read_only=solo_lectura)
+    if solo_lectura:
+        return sqlite3.connect(f'file:{ruta}?mode=ro', uri=True)
+    return sqlite3.connect(ruta)
+
+def _leer_sql(con, sql, parametros=()):
+    if isinstance(con, sqlite3.Connection):
+        return pd.read_sql_query(sql, con, params=list(parametros))
+    return con.execute(sql, list(parametros)).df()
+
+def _columnas_tabla(con, tabla):
+    return [d[0] for d in con.execute(f'SELECT * FROM "{tabla}" LIMIT 0').description]
+
+# ============================================================================
+# CONSTRUCCIÓN
+# ============================================================================
+
+def _cargar_csv(con, tabla, archivo):
+    """Carga un CSV crudo completo sin tenerlo entero en memoria (con SQLite)"""
+    if not isinstance(con, sqlite3.Connection):
+        con.execute(f'CREATE TABLE "{tabla}" AS SELECT * FROM read_csv_auto(?)', [archivo])
+        return
+    for bloque in pd.read_csv(archivo, chunksize=CHUNKSIZE, low_memory=False, encoding='utf-8-sig'):
+        bloque.to_sql(tabla, con, if_exists='append', index=False)
+
+def _agregar_ids(con, tabla):
+    """ID_MUNICIPIO / ID_RESIDENCIA calculados en la base e índices por municipio y año"""
+    columnas = _columnas_tabla(con, tabla)
+    for nombre, expresion, requeridas in [
+        ('ID_MUNICIPIO', ID_MUNICIPIO_SQL, ['COD_DPTO', 'COD_MUNIC']),
+        ('ID_RESIDENCIA', ID_RESIDENCIA_SQL, ['CODPTORE', 'CODMUNRE']),
+    ]:
+        if nombre in columnas or not all(c in columnas for c in requeridas):
+            continue
+        con.execute(f'ALTER TABLE "{tabla}" ADD COLUMN {nombre} INTEGER')
+        con.execute(f'UPDATE "{tabla}" SET {nombre} = {expresion}')
+
+    con.execute(f'CREATE INDEX "idx_{tabla}_municipio_anio" ON "{tabla}" (ID_MUNICIPIO, ANO)')
+    con.execute(f'CREATE INDEX "idx_{tabla}_anio" ON "{tabla}" (ANO)')
+    if 'CODPTORE' in columnas:
+        con.execute(f'CREATE INDEX "idx_{tabla}_residencia_anio" ON "{tabla}" (ID_RESIDENCIA, ANO)')
+
+def construir_base(ruta=BASE_FILE, directorio=DATA_DIR, archivo_features=FEATURES_FILE):
+    """
+    Reconstruye la base completa. Se escribe en un archivo temporal y se
+    reemplaza al final: las consultas en curso nunca ven una base a medias.
+    """
+    base, extension = os.path.splitext(ruta)
+    temporal = f'{base}.tmp{extension}'
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    con = conectar(temporal, solo_lectura=False)
+    tablas = {}
+    try:
+        for tabla, nombre in FUENTES.items():
+            archivo = os.path.join(directorio, nombre)
+            if not os.path.exists(archivo):
+                print(f"  ⚠️  {nombre} no encontrado: se omite la tabla {tabla}")
+                continue
+            inicio = time.perf_counter()
+            _cargar_csv(con, tabla, archivo)
+            _agregar_ids(con, tabla)
+            tablas[tabla] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        features = leer_tabla(archivo_features)
+        if isinstance(con, sqlite3.Connection):
+            features.to_sql(TABLA_FEATURES, con, index=False)
+        else:
+            con.register('features_df', features)
+            con.execute(f'CREATE TABLE "{TABLA_FEATURES}" AS SELECT * FROM features_df')
+            con.unregister('features_df')
+        _agregar_ids(con, TABLA_FEATURES)
+        tablas[TABLA_FEATURES] = time.perf_counter() - inicio
+
+        if isinstance(con, sqlite3.Connection):
+            con.commit()
+        for tabla, segundos in tablas.items():
+            filas = con.execute(f'SELECT COUNT(*) FROM "{tabla}"').fetchone()[0]
+            print(f"  ✓ {tabla}: {filas:,} filas ({segundos:.1f} s)")
+    finally:
+        con.close()
+    os.replace(temporal, ruta)
+    return ruta
+
+# ============================================================================
+# API DE CONSULTA
+# ============================================================================
+
+def consultar(sql, parametros=(), ruta=BASE_FILE):
+    """Ejecuta una consulta SQL (parámetros con ?) y devuelve un DataFrame"""
+    con = conectar(ruta)
+    try:
+        return _leer_sql(con, sql, parametros)
+    finally:
+        con.close()
+
+def _escalar(valor):
+    """numpy -> Python (sqlite3 no acepta np.int64 como parámetro)"""
+    return valor.item() if hasattr(valor, 'item') else valor
+
+def _condicion(columna, valor):
+    """Filtro -> (SQL, parámetros): escalar (=), lista (IN) o tupla (mínimo, máximo) con None abierto"""
+    if isinstance(valor, tuple):
+        minimo, maximo = valor
+        partes = [(f'"{columna}" >= ?', minimo), (f'"{columna}" <= ?', maximo)]
+        partes = [(sql, _escalar(v)) for sql, v in partes if v is not None]
+        return ' AND '.join(sql for sql, _ in partes) or '1 = 1', [v for _, v in partes]
+    if isinstance(valor, (list, set, pd.Index, pd.Series)):
+        valores = [_escalar(v) for v in valor]
+        if not valores:
+            return '1 = 0', []
+        return f'"{columna}" IN ({", ".join("?" * len(valores))})', valores
+    return f'"{columna}" = ?', [_escalar(valor)]
+
+def agregar(tabla, medidas, por=(), filtros=None, ruta=BASE_FILE):
+    """
+    Agregación con los filtros resueltos en la base.
+
+    medidas: {nombre: expresión SQL}, p. ej. {'nacimientos': 'COUNT(*)'}
+    por: columnas de agrupación
+    filtros: {columna: valor | [valores] | (mínimo, máximo)}
+    """
+    filtros = filtros or {}
+    por = list(por)
+    con = conectar(ruta)
+    try:
+        columnas = _columnas_tabla(con, tabla)
+        desconocidas = [c for c in por + list(filtros) if c not in columnas]
+        if desconocidas:
+            raise KeyError(f"Columnas inexistentes en {tabla}: {desconocidas}")
+
+        condiciones = [_condicion(columna, valor) for columna, valor in filtros.items()]
+        seleccion = [f'"{c}"' for c in por] + [f'{expresion} AS "{nombre}"' for nombre, expresion in medidas.items()]
+        sql = f'SELECT {", ".join(seleccion)} FROM "{tabla}"'
+        if condiciones:
+            sql += ' WHERE ' + ' AND '.join(f'({c})' for c, _ in condiciones)
+        if por:
+            columnas_por = ", ".join(f'"{c}"' for c in por)
+            sql += f' GROUP BY {columnas_por} ORDER BY {columnas_por}'
+        return _leer_sql(con, sql, [p for _, parametros in condiciones for p in parametros])
+    finally:
+        con.close()
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def main():
+    print("=" * 80)
+    print(f"BASE ANALÍTICA ({MOTOR.upper()}) - ALERTAMATERNA")
+    print("=" * 80)
+    ruta = construir_base()
+    print(f"\n✓ Base guardada en {ruta}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Benchmark del pipeline AlertaMaterna sobre datos sintéticos.
+
+Mide tiempo y pico de memoria (tracemalloc, en una pasada aparte) de cada etapa:
+1. Ingesta: cargadores de features.py sobre los archivos sintéticos
+2. Features: track materno, flujos residencia → ocurrencia y combinar_features
+3. Entrenamiento: índice de riesgo + modelo XGBoost de train_model.py
+4. Scoring: ruta del dashboard (preparar_datos + vistas año × departamento + predicción)
+
+Los resultados se agregan a un historial JSON. Cada corrida se compara con la
+mediana de las últimas corridas de la MISMA máquina y escala; si una etapa
+supera el umbral de regresión, el script termina con código 1.
+
+Uso (desde src/):
+    python benchmark.py --escala 100k
+    python benchmark.py --escala 20m --etapas ingesta features
+
+Proyecto: AlertaMaterna
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import features
+import train_model
+from flujos_pacientes import eventos_flujo, matrices_flujo
+from generar_datos_sinteticos import generar_dataset
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BENCHMARK_DIR = os.path.join(BASE_DIR, 'benchmarks')
+HISTORIAL_FILE = os.path.join(BENCHMARK_DIR, 'historial.json')
+
+# Escala: (nacimientos, municipios)
+ESCALAS = {
+    '10k': (10_000, 69),
+    '100k': (100_000, 200),
+    '1m': (1_000_000, 500),
+    '5m': (5_000_000, 1_100),
+    '20m': (20_000_000, 1_100),
+}
+
+ETAPAS = ['ingesta', 'features', 'entrenamiento', 'scoring']
+
+# Regresión: la etapa es X% más lenta / usa X% más memoria que la referencia
+UMBRAL_TIEMPO = 0.20
+UMBRAL_MEMORIA = 0.20
+CORRIDAS_REFERENCIA = 5
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+def medir(etapa, funcion, *args, verbose=False):
+    """
+    Ejecuta una etapa dos veces: una con tracemalloc para el pico de memoria y
+    otra sin él para el tiempo de pared (tracemalloc enlentece cada asignación).
+    """
+    def salida():
+        return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+    tracemalloc.start()
+    with salida():
+        funcion(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    inicio = time.perf_counter()
+    with salida():
+        resultado = funcion(*args)
+    segundos = time.perf_counter() - inicio
+
+    medicion = {'segundos': round(segundos, 4), 'memoria_pico_mb': round(pico / 1024 ** 2, 2)}
+    print(f"  {etapa:15s} {medicion['segundos']:10.3f} s {medicion['memoria_pico_mb']:10.1f} MB")
+    return resultado, medicion
+
+@contextlib.contextmanager
+def parchear(modulo, **valores):
+    """Reemplaza temporalmente variables globales de un módulo (rutas, filtros)"""
+    originales = {nombre: getattr(modulo, nombre) for nombre in valores}
+    for nombre, valor in valores.items():
+        setattr(modulo, nombre, valor)
+    try:
+        yield
+    finally:
+        for nombre, valor in originales.items():
+            setattr(modulo, nombre, valor)
+
+# ============================================================================
+# ETAPAS
+# ============================================================================
+
+def etapa_ingesta(rutas, dptos):
+    """Carga de las cinco fuentes con los cargadores de features.py"""
+    with parchear(features,
+                  NACIMIENTOS_FILE=rutas['nacimientos'],
+                  DEFUNCIONES_FETALES_FILE=rutas['defunciones_fetales'],
+                  DEFUNCIONES_NO_FETALES_FILE=rutas['defunciones_no_fetales'],
+                  REPS_FILE=rutas['reps'],
+                  RIPS_FILE=rutas['rips'],
+                  DPTOS_ORINOQUIA=dptos):
+        return (
+            features.cargar_nacimientos(),
+            features.cargar_defunciones_fetales(),
+            features.cargar_defunciones_no_fetales(),
+            features.cargar_instituciones(),
+            features.cargar_rips(),
+        )
+
+def etapa_features(datos, rutas):
+    """
+    Features por municipio-año como en features.main: track nacional de mortalidad
+    materna, matrices de flujo y combinar_features (sin filtro OMS: conserva todos
+    los municipios; el entrenamiento aplica su propio mínimo de nacimientos).
+    """
+    df_nac, df_def_fet, df_def_nofet, _, _ = datos
+    feat_materna = features.generar_features_mortalidad_materna(rutas['mortalidad_materna'], rutas['nacimientos'])
+    flujos = matrices_flujo(pd.concat([eventos_flujo(d) for d in (df_nac, df_def_fet, df_def_nofet)], ignore_index=True))
+    return features.combinar_features(*datos, feat_materna, flujos)
+
+def etapa_entrenamiento(df, directorio):
+    """Índice de riesgo y modelo de mortalidad (artefactos en un directorio temporal)"""
+
+    destino = os.path.join(directorio, '')
+    with parchear(train_model, DATA_DIR=destino, MODEL_DIR=destino):
+        df = train_model.crear_indice_riesgo_obstetrico(df.fillna(0))
+        X, y, feature_cols = train_model.preparar_datos_mortalidad(df)
+        model, scaler, _ = train_model.entrenar_modelo_mortalidad(X, y, feature_cols)
+    return df, X, model, scaler
+
+def importar_dashboard():
+    """Importa app_simple (raíz del repositorio) fuera de la medición"""
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    import app_simple
+    return app_simple
+
+def etapa_scoring(app_simple, df, X, model, scaler):
+    """Ruta del dashboard: preparación, vistas año × departamento y predicción en lote"""
+    with parchear(app_simple, DATA_DIR=os.path.join(BASE_DIR, 'data', 'processed', '')):
+        df_app = app_simple.preparar_datos(df.copy())
+        anios = ['Todos'] + sorted(df_app['ANO'].unique(), reverse=True)
+        deptos = ['Todos'] + sorted(df_app['DEPARTAMENTO'].dropna().unique().tolist())
+        tablero = {(anio, depto): app_simple.construir_vista(df_app, anio, depto)
+                   for anio in anios for depto in deptos}
+    predicciones = model.predict(np.nan_to_num(scaler.transform(X)))
+    return tablero, predicciones
+
+# ============================================================================
+# HISTORIAL Y REGRESIONES
+# ============================================================================
+
+def info_maquina():
+    """Identificación de la máquina: solo se comparan corridas de la misma"""
+    return {
+        'host': platform.node(),
+        'procesador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+    }
+
+def commit_actual():
+    """Commit de git de la corrida (None si no está disponible)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def cargar_historial(archivo=HISTORIAL_FILE):
+    if not os.path.exists(archivo):
+        return []
+    with open(archivo, encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_historial(historial, archivo=HISTORIAL_FILE):
+    os.makedirs(os.path.dirname(archivo), exist_ok=True)
+    with open(archivo, 'w', encoding='utf-8') as f:
+        json.dump(historial, f, indent=2, ensure_ascii=False)
+
+def detectar_regresiones(corrida, historial):
+    """Compara cada etapa con la mediana de las corridas previas comparables"""
+    previas = [
+        c for c in historial
+        if c['escala'] == corrida['escala'] and c['maquina']['host'] == corrida['maquina']['host']
+    ][-CORRIDAS_REFERENCIA:]
+
+    regresiones = []
+    for etapa, medicion in corrida['etapas'].items():
+        referencias = [c['etapas'][etapa] for c in previas if etapa in c['etapas']]
+        if not referencias:
+            continue
+
+        for metrica, umbral in [('segundos', UMBRAL_TIEMPO), ('memoria_pico_mb', UMBRAL_MEMORIA)]:
+            referencia = float(np.median([r[metrica] for r in referencias]))
+            if referencia > 0 and medicion[metrica] > referencia * (1 + umbral):
+                regresiones.append({
+                    'etapa': etapa,
+                    'metrica': metrica,
+                    'valor': medicion[metrica],
+                    'referencia': round(referencia, 4),
+                    'cambio_pct': round((medicion[metrica] / referencia - 1) * 100, 1),
+                })
+    return regresiones
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def ejecutar_benchmark(escala, etapas=ETAPAS, semilla=42, verbose=False):
+    """Genera los datos de la escala y mide las etapas pedidas"""
+    n_nacimientos, n_municipios = ESCALAS[escala]
+    mediciones = {}
+
+    with tempfile.TemporaryDirectory(prefix='alertamaterna_bench_') as directorio:
+        rutas = generar_dataset(directorio, n_nacimientos, n_municipios, semilla=semilla)
+        dptos = sorted(pd.read_csv(rutas['rips'], sep=';', encoding='latin1', usecols=['COD_DEP'])
+                       ['COD_DEP'].astype(str).str.zfill(2).unique().tolist())
+
+        print(f"\n  {'ETAPA':15s} {'TIEMPO':>12s} {'MEMORIA':>13s}")
+        # Cada etapa depende de la anterior: se ejecutan hasta la última pedida
+        ultima = max(ETAPAS.index(e) for e in etapas)
+
+        datos, mediciones['ingesta'] = medir('ingesta', etapa_ingesta, rutas, dptos, verbose=verbose)
+        if ultima >= 1:
+            df, mediciones['features'] = medir('features', etapa_features, datos, rutas, verbose=verbose)
+        if ultima >= 2:
+            (df, X, model, scaler), mediciones['entrenamiento'] = medir(
+                'entrenamiento', etapa_entrenamiento, df, directorio, verbose=verbose)
+        if ultima >= 3:
+            app_simple = importar_dashboard()
+            _, mediciones['scoring'] = medir('scoring', etapa_scoring, app_simple, df, X, model, scaler,
+                                             verbose=verbose)
+
+    return {etapa: mediciones[etapa] for etapa in etapas}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del pipeline AlertaMaterna')
+    parser.add_argument('--escala', choices=list(ESCALAS), default='10k')
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=ETAPAS)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--historial', default=HISTORIAL_FILE)
+    parser.add_argument('--sin-guardar', action='store_true', help='No agregar la corrida al historial')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar la salida de cada etapa')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"BENCHMARK ALERTAMATERNA - ESCALA {args.escala} "
+          f"({ESCALAS[args.escala][0]:,} nacimientos, {ESCALAS[args.escala][1]} municipios)")
+    print("=" * 80)
+
+    corrida = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'escala': args.escala,
+        'maquina': info_maquina(),
+        'etapas': ejecutar_benchmark(args.escala, args.etapas, args.semilla, args.verbose),
+    }
+
+    historial = cargar_historial(args.historial)
+    regresiones = detectar_regresiones(corrida, historial)
+    corrida['regresiones'] = regresiones
+
+    if not args.sin_guardar:
+        guardar_historial(historial + [corrida], args.historial)
+        print(f"\n→ Corrida agregada a {args.historial}")
+
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones detectadas:")
+        for r in regresiones:
+            print(f"   • {r['etapa']:15s} {r['metrica']:16s} {r['valor']} vs {r['referencia']} (+{r['cambio_pct']}%)")
+        sys.exit(1)
+
+    print("\n✅ Sin regresiones respecto a las corridas previas")
+
+if __name__ == "__main__":
+    main()
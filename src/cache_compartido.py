@@ -0,0 +1,175 @@
+"""
+Caché compartida entre procesos para despliegues con varias réplicas de Streamlit.
+
+@st.cache_data / @st.cache_resource viven dentro de cada proceso: con N workers
+detrás del balanceador, cada uno relee los datos, recalcula el tablero y
+deserializa los modelos. Aquí el resultado se escribe UNA vez en disco y todos
+los procesos lo adjuntan en solo lectura mediante memory-mapping, así que el
+sistema operativo comparte las mismas páginas físicas entre réplicas:
+
+    tabla_compartida()   DataFrame -> Arrow IPC (.arrow). Las columnas numéricas
+                         sin nulos se devuelven sin copia sobre el mapa;
+                         las de texto sí se copian al convertir a pandas.
+    objeto_compartido()  cualquier objeto -> pickle protocolo 5 con los buffers
+                         (arreglos NumPy) fuera de banda en el mismo archivo,
+                         reconstruidos como vistas de solo lectura del mapa.
+
+Cada entrada se nombra {nombre}-{huella}: la huella resume tamaño y fecha de
+modificación de los archivos fuente y una versión libre (configuración). Si
+cambia una fuente se escribe una entrada nueva en lugar de reemplazar un
+archivo que otro proceso tiene mapeado (en Windows no se podría). La
+escritura es atómica (archivo temporal + os.replace): si dos workers arrancan
+a la vez, ambos construyen y gana el último, con el mismo contenido.
+
+Directorio: ALERTAMATERNA_CACHE_DIR o data/cache_compartido/.
+
+Proyecto: AlertaMaterna
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+import struct
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    ARROW_DISPONIBLE = True
+except ImportError:
+    ARROW_DISPONIBLE = False
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+CACHE_DIR = os.environ.get(
+    'ALERTAMATERNA_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache_compartido'),
+)
+ALINEACION = 64  # bytes: inicio de cada buffer fuera de banda
+CABECERA = struct.Struct('<QQ')  # largo del pickle, número de buffers
+TRAMO = struct.Struct('<QQ')  # desplazamiento y largo de cada buffer
+
+# ============================================================================
+# HUELLAS Y RUTAS
+# ============================================================================
+
+def huella(fuentes, version=''):
+    """Resumen de (ruta, tamaño, mtime) de las fuentes existentes más una versión libre"""
+    h = hashlib.sha256(str(version).encode('utf-8'))
+    for ruta in fuentes:
+        if os.path.exists(ruta):
+            info = os.stat(ruta)
+            h.update(f'{os.path.abspath(ruta)}|{info.st_size}|{info.st_mtime_ns}'.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+def _ruta(nombre, firma, extension, directorio):
+    return os.path.join(directorio, f'{nombre}-{firma}.{extension}')
+
+def _escribir_atomico(ruta, escribir):
+    """escribir(archivo) sobre un temporal propio del proceso y os.replace al final"""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    try:
+        with open(temporal, 'wb') as f:
+            escribir(f)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def limpiar_versiones(nombre, vigente, directorio=CACHE_DIR):
+    """Borra las entradas anteriores de nombre (las que otro proceso tiene abiertas se dejan)"""
+    for ruta in glob.glob(os.path.join(directorio, f'{nombre}-*')):
+        if os.path.abspath(ruta) != os.path.abspath(vigente) and not ruta.endswith('.tmp'):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+# ============================================================================
+# TABLAS (ARROW IPC)
+# ============================================================================
+
+def publicar_tabla(df, ruta):
+    """DataFrame -> archivo Arrow IPC sin compresión (requisito para mapearlo sin copiar)"""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    def escribir(f):
+        with pa.ipc.new_file(f, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    _escribir_atomico(ruta, escribir)
+    return ruta
+
+def adjuntar_tabla(ruta):
+    """Archivo Arrow IPC -> DataFrame de solo lectura respaldado por el mapa de memoria"""
+    tabla = pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all()
+    return tabla.to_pandas(split_blocks=True, self_destruct=False)
+
+def tabla_compartida(nombre, construir, fuentes=(), version='', directorio=CACHE_DIR):
+    """
+    DataFrame compartido entre procesos: lo adjunta si ya existe para esta
+    huella; si no, lo construye (construir()), lo publica y lo adjunta.
+
+    Sin pyarrow devuelve construir() directamente (sin compartir).
+    """
+    if not ARROW_DISPONIBLE:
+        return construir()
+    ruta = _ruta(nombre, huella(fuentes, version), 'arrow', directorio)
+    if not os.path.exists(ruta):
+        publicar_tabla(construir(), ruta)
+        limpiar_versiones(nombre, ruta, directorio)
+    return adjuntar_tabla(ruta)
+
+# ============================================================================
+# OBJETOS (PICKLE 5 CON BUFFERS FUERA DE BANDA)
+# ============================================================================
+
+def _relleno(posicion):
+    return -posicion % ALINEACION
+
+def publicar_objeto(objeto, ruta):
+    """
+    Formato: cabecera | tramos (desplazamiento, largo) | pickle | buffers alineados.
+    Los arreglos NumPy del objeto van como buffers crudos, no dentro del pickle.
+    """
+    buffers = []
+    datos = pickle.dumps(objeto, protocol=5, buffer_callback=buffers.append)
+    crudos = [b.raw() for b in buffers]
+
+    posicion = CABECERA.size + TRAMO.size * len(crudos) + len(datos)
+    tramos = []
+    for crudo in crudos:
+        posicion += _relleno(posicion)
+        tramos.append((posicion, crudo.nbytes))
+        posicion += crudo.nbytes
+
+    def escribir(f):
+        f.write(CABECERA.pack(len(datos), len(crudos)))
+        for tramo in tramos:
+            f.write(TRAMO.pack(*tramo))
+        f.write(datos)
+        for (inicio, _), crudo in zip(tramos, crudos):
+            f.write(b'\0' * (inicio - f.tell()))
+            f.write(crudo)
+    _escribir_atomico(ruta, escribir)
+    return ruta
+
+def adjuntar_objeto(ruta):
+    """Inverso de publicar_objeto: los arreglos quedan como vistas de solo lectura del mapa"""
+    mapa = np.memmap(ruta, dtype=np.uint8, mode='r')
+    largo, n = CABECERA.unpack_from(mapa, 0)
+    tramos = [TRAMO.unpack_from(mapa, CABECERA.size + TRAMO.size * i) for i in range(n)]
+    inicio = CABECERA.size + TRAMO.size * n
+    buffers = [memoryview(mapa[desde:desde + tamano]) for desde, tamano in tramos]
+    return pickle.loads(bytes(mapa[inicio:inicio + largo]), buffers=buffers)
+
+def objeto_compartido(nombre, construir, fuentes=(), version='', directorio=CACHE_DIR):
+    """Como tabla_compartida, para modelos y otros objetos serializables"""
+    ruta = _ruta(nombre, huella(fuentes, version), 'pkl5', directorio)
+    if not os.path.exists(ruta):
+        publicar_objeto(construir(), ruta)
+        limpiar_versiones(nombre, ruta, directorio)
+    return adjuntar_objeto(ruta)
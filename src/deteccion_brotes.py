@@ -0,0 +1,374 @@
+"""
+Detección estadística de brotes de mortalidad fetal y neonatal.
+
+Complementa los umbrales fijos (mortalidad > 50‰, puntos_riesgo >= 3) con
+métodos que comparan defunciones observadas contra las esperadas según los
+nacimientos de cada municipio-periodo:
+
+1. CUSUM Poisson y EWMA por municipio (vectorizados sobre todos los
+   municipios; el único ciclo es sobre los periodos)
+2. Estadístico de barrido espacio-temporal de Kulldorff (prospectivo):
+   cilindros = círculos de k vecinos más cercanos × ventanas que terminan en
+   el último periodo. Las sumas de todos los cilindros salen de dos cumsum
+   (tiempo y vecinos), sin ciclos por cilindro.
+3. Significancia por Monte Carlo: las réplicas bajo H0 son extracciones
+   multinomiales en lote (réplicas × celdas) y los lotes se reparten entre
+   procesos.
+
+Uso (desde src/, después de `python features.py --granularidad mes`):
+    python deteccion_brotes.py
+    python deteccion_brotes.py --granularidad trimestre --replicas 999 --procesos 4
+
+Referencias:
+- Kulldorff, M. (2001). Prospective time periodic geographical disease
+  surveillance using a scan statistic. JRSS A 164(1).
+- Lucas, J. M. (1985). Counted data CUSUM's. Technometrics 27(2).
+
+Proyecto: AlertaMaterna
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import leer_tabla
+from features import PERIODOS, PERIODOS_POR_ANIO, archivo_salida
+from suavizado import cargar_coordenadas_municipios, vecinos_cercanos
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = '../data/processed/'
+
+# Indicador -> (columna de defunciones o None si se reconstruye desde la tasa por mil, tasa)
+INDICADORES = {
+    'fetal': ('defunciones_fetales', 'tasa_mortalidad_fetal'),
+    'neonatal': (None, 'tasa_mortalidad_neonatal'),
+}
+
+# CUSUM Poisson: detecta un aumento de RAZON veces sobre lo esperado
+CUSUM_RAZON = 2.0
+CUSUM_UMBRAL = 4.0
+
+# EWMA de residuos estandarizados
+EWMA_LAMBDA = 0.3
+EWMA_L = 3.0
+
+# Barrido espacio-temporal
+VECINOS_MAX = 30             # municipios máximos por círculo
+FRACCION_MAX = 0.5           # máximo 50% de los nacimientos en un cilindro
+VENTANA_MAX = {'anio': 2, 'trimestre': 4, 'mes': 12}  # periodos hacia atrás desde el último
+N_REPLICAS = 999
+ALFA = 0.05
+MAX_CLUSTERS = 10
+
+# Máximo de elementos por lote de réplicas (réplicas × municipios × vecinos × ventanas)
+MAX_ELEMENTOS_LOTE = 20_000_000
+
+# ============================================================================
+# DATOS
+# ============================================================================
+
+def ordinal_periodo(df, granularidad):
+    """Periodo consecutivo: año × periodos por año + periodo"""
+    if granularidad == 'anio':
+        return df['ANO'].astype(int)
+    columna = PERIODOS[granularidad][0]
+    return df['ANO'].astype(int) * PERIODOS_POR_ANIO[granularidad] + df[columna].astype(int) - 1
+
+def etiqueta_periodo(ordinal, granularidad):
+    """'2024', '2024-T3' o '2024-07'"""
+    if granularidad == 'anio':
+        return str(ordinal)
+    anio, periodo = divmod(int(ordinal), PERIODOS_POR_ANIO[granularidad])
+    return f'{anio}-T{periodo + 1}' if granularidad == 'trimestre' else f'{anio}-{periodo + 1:02d}'
+
+def construir_matrices(df, indicador, granularidad):
+    """
+    Matrices municipio × periodo de defunciones (Y) y nacimientos (N).
+
+    Los municipio-periodo sin registro quedan en cero. Devuelve también el
+    índice de municipios y el primer periodo.
+    """
+    col_eventos, tasa = INDICADORES[indicador]
+    nacimientos = df['total_nacimientos'].fillna(0).to_numpy(dtype=float)
+    if col_eventos is not None and col_eventos in df.columns:
+        eventos = df[col_eventos].fillna(0).to_numpy(dtype=float)
+    else:
+        eventos = np.rint(df[tasa].fillna(0).to_numpy(dtype=float) * nacimientos / 1000)
+
+    municipios = pd.MultiIndex.from_frame(df[['COD_DPTO', 'COD_MUNIC']].astype(int)).unique()
+    idx_mun = municipios.get_indexer(pd.MultiIndex.from_frame(df[['COD_DPTO', 'COD_MUNIC']].astype(int)))
+    ordinal = ordinal_periodo(df, granularidad).to_numpy()
+    inicio = ordinal.min()
+    idx_t = ordinal - inicio
+
+    Y = np.zeros((len(municipios), idx_t.max() + 1))
+    N = np.zeros_like(Y)
+    np.add.at(Y, (idx_mun, idx_t), eventos)
+    np.add.at(N, (idx_mun, idx_t), nacimientos)
+    return Y, N, municipios, inicio
+
+def esperados(Y, N):
+    """Defunciones esperadas condicionadas al total: E = C · n / Σn"""
+    return N * (Y.sum() / N.sum())
+
+# ============================================================================
+# CUSUM Y EWMA POR MUNICIPIO
+# ============================================================================
+
+def cusum_poisson(Y, E, razon=CUSUM_RAZON):
+    """
+    CUSUM de razón de verosimilitud Poisson para un aumento de `razon` veces:
+    S_t = max(0, S_{t-1} + y_t·ln(R) - (R-1)·E_t), para todos los municipios a la vez.
+    """
+    incremento = Y * np.log(razon) - (razon - 1) * E
+    S = np.zeros_like(E)
+    s = np.zeros(E.shape[0])
+    for t in range(E.shape[1]):
+        s = np.maximum(0, s + incremento[:, t])
+        S[:, t] = s
+    return S
+
+def ewma_residuos(Y, E, lam=EWMA_LAMBDA):
+    """EWMA de los residuos estandarizados (y - E) / √E; límite asintótico L·√(λ/(2-λ))"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(E > 0, (Y - E) / np.sqrt(E), 0.0)
+    W = np.zeros_like(E)
+    w = np.zeros(E.shape[0])
+    for t in range(E.shape[1]):
+        w = lam * z[:, t] + (1 - lam) * w
+        W[:, t] = w
+    return W
+
+def vigilancia_municipal(Y, E, municipios, inicio, granularidad, indicador):
+    """Estado CUSUM/EWMA de cada municipio en el último periodo"""
+    S = cusum_poisson(Y, E)
+    W = ewma_residuos(Y, E)
+    limite_ewma = EWMA_L * np.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA))
+
+    # Primer periodo de la racha de alarma CUSUM vigente
+    en_alarma = S > CUSUM_UMBRAL
+    sin_alarma = np.where(~en_alarma, np.arange(S.shape[1]), -1)
+    inicio_racha = np.maximum.accumulate(sin_alarma, axis=1)[:, -1] + 1
+
+    resultado = pd.DataFrame({
+        'indicador': indicador,
+        'COD_DPTO': municipios.get_level_values(0),
+        'COD_MUNIC': municipios.get_level_values(1),
+        'periodo': etiqueta_periodo(inicio + S.shape[1] - 1, granularidad),
+        'observados': Y[:, -1],
+        'esperados': E[:, -1].round(3),
+        'cusum': S[:, -1].round(3),
+        'alarma_cusum': en_alarma[:, -1],
+        'ewma': W[:, -1].round(3),
+        'alarma_ewma': W[:, -1] > limite_ewma,
+    })
+    resultado['alarma_desde'] = [
+        etiqueta_periodo(inicio + i, granularidad) if alarma else None
+        for i, alarma in zip(inicio_racha, resultado['alarma_cusum'])
+    ]
+    return resultado
+
+# ============================================================================
+# BARRIDO ESPACIO-TEMPORAL (KULLDORFF, PROSPECTIVO)
+# ============================================================================
+
+def log_verosimilitud(c, e, C):
+    """LLR Poisson de Kulldorff para clusters de alto riesgo (0 si c ≤ e)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        llr = c * np.log(c / e) + (C - c) * np.log((C - c) / (C - e))
+    return np.where(c > e, np.nan_to_num(llr), 0.0)
+
+def sumas_cilindros(Y_reciente, vecinos):
+    """
+    Suma de cada cilindro (centro × k vecinos × ventana) en una sola pasada.
+
+    Y_reciente: (..., municipios, L) con el periodo más reciente al final.
+    Devuelve (..., municipios, K, L): cumsum hacia atrás en el tiempo y luego
+    cumsum sobre los vecinos ordenados por distancia.
+    """
+    por_ventana = Y_reciente[..., ::-1].cumsum(axis=-1)
+    return por_ventana[..., vecinos, :].cumsum(axis=-2)
+
+def _max_llr_replicas(semilla, n_replicas, probabilidades, C, vecinos, mascara, E_cil, forma):
+    """Máximo LLR de n_replicas réplicas bajo H0 (se ejecuta en un proceso aparte)"""
+    rng = np.random.default_rng(semilla)
+    n_mun, L = forma
+    elementos = n_mun * vecinos.shape[1] * L
+    lote = max(1, MAX_ELEMENTOS_LOTE // elementos)
+
+    maximos = []
+    for inicio in range(0, n_replicas, lote):
+        b = min(lote, n_replicas - inicio)
+        # Última celda = defunciones fuera de la ventana de barrido
+        conteos = rng.multinomial(C, probabilidades, size=b)[:, :-1].reshape(b, n_mun, L).astype(float)
+        llr = log_verosimilitud(sumas_cilindros(conteos, vecinos), E_cil, C)
+        maximos.append(np.where(mascara, llr, 0).reshape(b, -1).max(axis=1))
+    return np.concatenate(maximos)
+
+def barrido_espacio_temporal(Y, E, N, lat, lon, ventana_max, n_replicas=N_REPLICAS,
+                             procesos=None, semilla=42, vecinos_max=VECINOS_MAX):
+    """
+    Barrido prospectivo de Kulldorff: todos los cilindros cuyo tiempo termina en
+    el último periodo.
+
+    Devuelve (llr, E_cil, Y_cil, vecinos, mascara, maximos_replicas).
+    """
+    n_mun, T = Y.shape
+    L = min(ventana_max, T)
+    C = Y.sum()
+
+    vecinos = vecinos_cercanos(lat, lon, min(vecinos_max, n_mun) - 1)
+
+    # Restricción de tamaño: nacimientos del círculo (todo el periodo) ≤ FRACCION_MAX del total
+    nac_circulo = N.sum(axis=1)[vecinos].cumsum(axis=1)
+    mascara = (nac_circulo <= FRACCION_MAX * N.sum())[:, :, None] & np.ones(L, dtype=bool)
+    mascara[:, 0, :] = True  # el municipio solo siempre es candidato
+
+    Y_cil = sumas_cilindros(Y[:, -L:], vecinos)
+    E_cil = sumas_cilindros(E[:, -L:], vecinos)
+    llr = np.where(mascara, log_verosimilitud(Y_cil, E_cil, C), 0)
+
+    # Monte Carlo: multinomial sobre las celdas de la ventana + una celda resto
+    p_ventana = (E[:, -L:] / C).ravel()
+    probabilidades = np.append(p_ventana, max(0.0, 1 - p_ventana.sum()))
+
+    procesos = procesos or os.cpu_count() or 1
+    tareas = min(procesos * 4, n_replicas) if procesos > 1 else 1
+    reparto = np.array_split(np.arange(n_replicas), tareas)
+    semillas = np.random.SeedSequence(semilla).spawn(tareas)
+    argumentos = [(s, len(r), probabilidades, int(C), vecinos, mascara, E_cil, (n_mun, L))
+                  for s, r in zip(semillas, reparto)]
+
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            maximos = list(ejecutor.map(_max_llr_replicas, *zip(*argumentos)))
+    else:
+        maximos = [_max_llr_replicas(*a) for a in argumentos]
+
+    return llr, E_cil, Y_cil, vecinos, mascara, np.concatenate(maximos)
+
+def extraer_clusters(llr, Y_cil, E_cil, vecinos, maximos, C, municipios, fin, granularidad, indicador,
+                     alfa=ALFA, max_clusters=MAX_CLUSTERS):
+    """Cluster más verosímil y secundarios sin superposición geográfica, con p-valor Monte Carlo"""
+    n_replicas = len(maximos)
+    maximos = np.sort(maximos)
+
+    orden = np.argsort(llr, axis=None)[::-1]
+    orden = orden[llr.ravel()[orden] > 0]
+
+    clusters, usados = [], set()
+    for plano in orden:
+        centro, k, l = np.unravel_index(plano, llr.shape)
+        miembros = vecinos[centro, :k + 1]
+        if usados.intersection(miembros.tolist()):
+            continue
+
+        valor = llr[centro, k, l]
+        p_valor = (1 + n_replicas - np.searchsorted(maximos, valor, side='left')) / (n_replicas + 1)
+        if p_valor > alfa or len(clusters) >= max_clusters:
+            break
+
+        c, e = Y_cil[centro, k, l], E_cil[centro, k, l]
+        usados.update(miembros.tolist())
+        clusters.append({
+            'indicador': indicador,
+            'COD_DPTO': municipios[centro][0],
+            'COD_MUNIC': municipios[centro][1],
+            'municipios': ';'.join(f'{municipios[m][0]}-{municipios[m][1]}' for m in miembros),
+            'n_municipios': len(miembros),
+            'periodo_inicio': etiqueta_periodo(fin - l, granularidad),
+            'periodo_fin': etiqueta_periodo(fin, granularidad),
+            'observados': c,
+            'esperados': round(e, 3),
+            'riesgo_relativo': round((c / e) / ((C - c) / (C - e)), 3),
+            'llr': round(valor, 3),
+            'p_valor': round(p_valor, 4),
+        })
+    return pd.DataFrame(clusters)
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def detectar_brotes(df, granularidad, n_replicas=N_REPLICAS, procesos=None, coordenadas=None):
+    """CUSUM/EWMA por municipio y barrido espacio-temporal para cada indicador"""
+    coords = coordenadas if coordenadas is not None else cargar_coordenadas_municipios()
+    vigilancia, clusters = [], []
+
+    for indicador in INDICADORES:
+        Y, N, municipios, inicio = construir_matrices(df, indicador, granularidad)
+        if Y.sum() == 0:
+            continue
+        E = esperados(Y, N)
+        fin = inicio + Y.shape[1] - 1
+
+        print(f"\n[{indicador}] {int(Y.sum()):,} defunciones en {len(municipios)} municipios × {Y.shape[1]} periodos")
+        tabla = vigilancia_municipal(Y, E, municipios, inicio, granularidad, indicador)
+        vigilancia.append(tabla)
+        print(f"  CUSUM: {tabla['alarma_cusum'].sum()} municipios en alarma | "
+              f"EWMA: {tabla['alarma_ewma'].sum()} municipios en alarma")
+
+        # El barrido necesita coordenadas: municipios sin DIVIPOLA quedan fuera
+        ubicados = pd.DataFrame({'COD_DPTO': municipios.get_level_values(0),
+                                 'COD_MUNIC': municipios.get_level_values(1)}).merge(
+            coords, on=['COD_DPTO', 'COD_MUNIC'], how='left')
+        con_coords = ubicados['LATITUD'].notna().to_numpy()
+        if con_coords.sum() < 2:
+            print("  Barrido omitido: menos de 2 municipios con coordenadas")
+            continue
+        if (~con_coords).any():
+            print(f"  {(~con_coords).sum()} municipios sin coordenadas excluidos del barrido")
+
+        Yc, Nc = Y[con_coords], N[con_coords]
+        Ec = esperados(Yc, Nc)
+        llr, E_cil, Y_cil, vecinos, mascara, maximos = barrido_espacio_temporal(
+            Yc, Ec, Nc, ubicados.loc[con_coords, 'LATITUD'].to_numpy(),
+            ubicados.loc[con_coords, 'LONGITUD'].to_numpy(), VENTANA_MAX[granularidad],
+            n_replicas=n_replicas, procesos=procesos)
+        print(f"  Barrido: {int(mascara.sum()):,} cilindros × {n_replicas} réplicas")
+
+        encontrados = extraer_clusters(llr, Y_cil, E_cil, vecinos, maximos, Yc.sum(),
+                                       municipios[con_coords], fin, granularidad, indicador)
+        clusters.append(encontrados)
+        print(f"  → {len(encontrados)} clusters significativos (p ≤ {ALFA})")
+        for _, c in encontrados.iterrows():
+            print(f"    • {c['n_municipios']} municipios centrados en {c['COD_DPTO']}-{c['COD_MUNIC']}, "
+                  f"{c['periodo_inicio']} a {c['periodo_fin']}: {int(c['observados'])} obs vs "
+                  f"{c['esperados']:.1f} esp (RR {c['riesgo_relativo']:.2f}, p={c['p_valor']:.3f})")
+
+    vigilancia = pd.concat(vigilancia, ignore_index=True) if vigilancia else pd.DataFrame()
+    clusters = pd.concat(clusters, ignore_index=True) if clusters else pd.DataFrame()
+    return vigilancia, clusters
+
+def main():
+    parser = argparse.ArgumentParser(description='Detección de brotes de mortalidad (CUSUM/EWMA y barrido de Kulldorff)')
+    parser.add_argument('--granularidad', choices=list(PERIODOS), default='mes')
+    parser.add_argument('--archivo', default=None, help='Tabla de features (por defecto la de la granularidad)')
+    parser.add_argument('--replicas', type=int, default=N_REPLICAS)
+    parser.add_argument('--procesos', type=int, default=None, help='Procesos para Monte Carlo (por defecto: CPUs)')
+    args = parser.parse_args()
+
+    archivo = args.archivo or archivo_salida(args.granularidad)
+    print("=" * 80)
+    print(f"DETECCIÓN DE BROTES - ALERTAMATERNA (granularidad: {args.granularidad})")
+    print("=" * 80)
+    print(f"Cargando {archivo}...")
+    df = leer_tabla(archivo)
+
+    vigilancia, clusters = detectar_brotes(df, args.granularidad, args.replicas, args.procesos)
+
+    archivo_vigilancia = f'{DATA_DIR}vigilancia_municipal_{args.granularidad}.csv'
+    archivo_clusters = f'{DATA_DIR}clusters_brotes_{args.granularidad}.csv'
+    vigilancia.to_csv(archivo_vigilancia, index=False)
+    clusters.to_csv(archivo_clusters, index=False)
+    print(f"\n✓ {archivo_vigilancia}")
+    print(f"✓ {archivo_clusters}")
+
+if __name__ == "__main__":
+    main()
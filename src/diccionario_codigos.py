@@ -0,0 +1,145 @@
+"""
+Diccionarios compilados de códigos DANE para decodificación vectorizada.
+
+Cada variable de los archivos codigos_*_dane.csv se compila UNA sola vez en:
+- Un arreglo NumPy denso (código entero -> índice de etiqueta) cuando los
+  códigos son enteros pequeños (caso de todas las variables DANE actuales).
+- Un mapeo categórico (pd.Index de códigos -> índice de etiqueta) en otro caso.
+
+La decodificación de una columna es entonces un `take` vectorizado que
+produce un pd.Categorical, sin iterar filas. Sirve para millones de registros
+(PESO_NAC, T_GES, GRU_ED1, ...) y para generar extractos decodificados.
+
+Proyecto: AlertaMaterna
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'processed')
+
+ARCHIVOS_CODIGOS = {
+    'nacimientos': os.path.join(DATA_DIR, 'codigos_nacimientos_dane.csv'),
+    'defunciones_fetales': os.path.join(DATA_DIR, 'codigos_defunciones_fetales_dane.csv'),
+    'defunciones_no_fetales': os.path.join(DATA_DIR, 'codigos_defunciones_no_fetales_dane.csv'),
+}
+
+# Códigos enteros por encima de este valor usan el mapeo categórico (evita arreglos enormes)
+MAX_CODIGO_DENSO = 100_000
+
+# Sufijo de las columnas decodificadas (igual que en los archivos *_DESC procesados)
+SUFIJO_DESC = '_DESC'
+
+# ============================================================================
+# COMPILACIÓN
+# ============================================================================
+
+def _compilar_variable(codigos, descripciones):
+    """Compila los códigos de una variable en una tabla de búsqueda"""
+    codigos = codigos.astype(str).str.strip().reset_index(drop=True)
+    indice_etiqueta, categorias = pd.factorize(descripciones.reset_index(drop=True))
+    indice_etiqueta = indice_etiqueta.astype(np.int32)
+
+    numericos = pd.to_numeric(codigos, errors='coerce')
+    es_denso = (
+        numericos.notna().all()
+        and (numericos >= 0).all()
+        and (numericos == np.floor(numericos)).all()
+        and numericos.max() <= MAX_CODIGO_DENSO
+    )
+
+    if es_denso:
+        # -1 = código fuera de diccionario
+        tabla = np.full(int(numericos.max()) + 1, -1, dtype=np.int32)
+        tabla[numericos.astype(np.int64).to_numpy()] = indice_etiqueta
+        return {'tipo': 'denso', 'tabla': tabla, 'categorias': categorias, 'codigos': codigos.tolist()}
+
+    return {
+        'tipo': 'categorico',
+        'indice_codigos': pd.Index(codigos),
+        'indice_etiqueta': indice_etiqueta,
+        'categorias': categorias,
+        'codigos': codigos.tolist(),
+    }
+
+def compilar_diccionario(df_codigos):
+    """
+    Compila un DataFrame con columnas (variable, codigo, descripcion) en un
+    diccionario variable -> tabla de búsqueda (una sola pasada con groupby).
+    """
+    return {
+        variable: _compilar_variable(grupo['codigo'], grupo['descripcion'])
+        for variable, grupo in df_codigos.groupby('variable', sort=False)
+    }
+
+@lru_cache(maxsize=None)
+def cargar_diccionario(archivo):
+    """Carga y compila un archivo de códigos DANE (cacheado por ruta)"""
+    df_codigos = pd.read_csv(archivo, dtype=str)
+    return compilar_diccionario(df_codigos)
+
+def diccionario_por_fuente(fuente):
+    """Diccionario compilado para 'nacimientos', 'defunciones_fetales' o 'defunciones_no_fetales'"""
+    return cargar_diccionario(ARCHIVOS_CODIGOS[fuente])
+
+# ============================================================================
+# DECODIFICACIÓN
+# ============================================================================
+
+def indices_etiqueta(valores, entrada):
+    """
+    Índice de etiqueta para cada valor (-1 si el código no está en el diccionario
+    o el valor es nulo). Acepta códigos numéricos o texto ('05', 5, ' 5').
+    """
+    if entrada['tipo'] == 'denso':
+        tabla = entrada['tabla']
+        numeros = pd.to_numeric(pd.Series(valores, copy=False), errors='coerce').to_numpy(dtype=float)
+        validos = np.isfinite(numeros) & (numeros >= 0) & (numeros < len(tabla)) & (numeros == np.floor(numeros))
+
+        indices = np.full(len(numeros), -1, dtype=np.int32)
+        indices[validos] = tabla.take(numeros[validos].astype(np.int64))
+        return indices
+
+    texto = pd.Series(valores, copy=False).astype(str).str.strip()
+    posiciones = entrada['indice_codigos'].get_indexer(texto)
+    return np.where(posiciones >= 0, entrada['indice_etiqueta'].take(np.maximum(posiciones, 0)), -1).astype(np.int32)
+
+def decodificar_columna(valores, entrada):
+    """Decodifica una columna de códigos en un pd.Categorical de descripciones"""
+    return pd.Categorical.from_codes(indices_etiqueta(valores, entrada), categories=entrada['categorias'])
+
+def decodificar_dataframe(df, diccionario, columnas=None, sufijo=SUFIJO_DESC):
+    """
+    Agrega columnas {col}{sufijo} con la descripción de cada columna codificada.
+
+    Si no se indican columnas, se decodifican todas las que tengan diccionario.
+    """
+    if columnas is None:
+        columnas = [col for col in df.columns if col in diccionario]
+
+    df_salida = df.copy()
+    for col in columnas:
+        df_salida[f'{col}{sufijo}'] = pd.Series(
+            decodificar_columna(df_salida[col], diccionario[col]), index=df_salida.index
+        )
+    return df_salida
+
+def decodificar_archivo(archivo_datos, archivo_codigos, archivo_salida, columnas=None, chunksize=500_000):
+    """Genera un extracto decodificado de un archivo crudo, procesándolo por bloques"""
+    diccionario = cargar_diccionario(archivo_codigos)
+    total = 0
+
+    for i, bloque in enumerate(pd.read_csv(archivo_datos, dtype=str, chunksize=chunksize)):
+        bloque = decodificar_dataframe(bloque, diccionario, columnas)
+        bloque.to_csv(archivo_salida, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        total += len(bloque)
+
+    print(f"  → {total:,} registros decodificados en {archivo_salida}")
+    return total
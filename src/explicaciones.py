@@ -0,0 +1,111 @@
+"""
+Caché de explicaciones (TreeSHAP) del modelo de mortalidad infantil.
+
+En el entrenamiento se calculan las atribuciones SHAP de TODAS las filas de
+features_municipio_anio.csv con el TreeSHAP exacto (path-dependent) que trae
+XGBoost (`pred_contribs=True`) y se guardan como una matriz float32:
+
+    atribuciones_shap.npy     (filas × (features + 1)); última columna = valor base
+    atribuciones_indice.csv   COD_DPTO, COD_MUNIC, ANO de cada fila
+
+El dashboard abre la matriz con mmap y responde "¿por qué este municipio?" con
+una búsqueda por índice. Para escenarios ad-hoc, explicar_escenario() usa la
+misma llamada sobre una fila (~1 ms).
+
+Las atribuciones están en las unidades del modelo (‰ de mortalidad infantil)
+y suman exactamente la predicción del XGBoost (antes de las reglas médicas).
+
+Proyecto: AlertaMaterna
+"""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from transformador import transformar
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+MODEL_DIR = '../models/'
+ATRIBUCIONES_FILE = 'atribuciones_shap.npy'
+INDICE_FILE = 'atribuciones_indice.csv'
+FEATURE_NAMES_FILE = 'feature_names.pkl'
+
+CLAVE = ['COD_DPTO', 'COD_MUNIC', 'ANO']
+
+# ============================================================================
+# TREESHAP
+# ============================================================================
+
+def atribuciones_treeshap(model, X_scaled, aproximado=False):
+    """
+    Atribuciones SHAP de un XGBRegressor: (filas, features + 1), la última
+    columna es el valor base.
+
+    aproximado=True usa el método de Saabas (más rápido, no exacto).
+    """
+    dmatrix = xgb.DMatrix(np.asarray(X_scaled, dtype=np.float32))
+    contribuciones = model.get_booster().predict(dmatrix, pred_contribs=True, approx_contribs=aproximado)
+    return contribuciones.astype(np.float32)
+
+def explicar_escenario(model, X_scaled, feature_cols, n=5):
+    """Top n factores de una predicción ad-hoc (una fila ya escalada)"""
+    contribuciones = atribuciones_treeshap(model, X_scaled)[0]
+    return top_factores(contribuciones, feature_cols, n)
+
+def top_factores(contribuciones, feature_cols, n=5):
+    """Factores con mayor |contribución|: DataFrame feature, contribucion (‰), valor_base"""
+    contribuciones = np.asarray(contribuciones)
+    factores = pd.DataFrame({'feature': feature_cols, 'contribucion': contribuciones[:-1]})
+    orden = factores['contribucion'].abs().sort_values(ascending=False).index[:n]
+    factores = factores.loc[orden].reset_index(drop=True)
+    factores['valor_base'] = float(contribuciones[-1])
+    return factores
+
+# ============================================================================
+# CACHÉ
+# ============================================================================
+
+def generar_cache_explicaciones(model, transformador, df, model_dir=MODEL_DIR):
+    """
+    Calcula y guarda las atribuciones de todas las filas de df, con el mismo
+    transformador (derivadas, medianas y escalado) que usa el dashboard.
+    """
+    X_scaled = transformar(transformador, df[transformador['entradas']].to_numpy())
+    contribuciones = atribuciones_treeshap(model, X_scaled)
+
+    # Verificación: las atribuciones suman la predicción del modelo
+    prediccion = model.predict(X_scaled)
+    error = np.abs(contribuciones.sum(axis=1) - prediccion).max()
+
+    np.save(f'{model_dir}{ATRIBUCIONES_FILE}', contribuciones)
+    df[CLAVE].astype(int).to_csv(f'{model_dir}{INDICE_FILE}', index=False)
+
+    print(f"  ✓ Atribuciones SHAP: {contribuciones.shape[0]} filas × {contribuciones.shape[1] - 1} features "
+          f"({contribuciones.nbytes / 1024:.0f} KB, error máx. de suma {error:.1e})")
+    return contribuciones
+
+def cargar_cache_explicaciones(model_dir=MODEL_DIR):
+    """
+    Matriz de atribuciones (mmap, solo lectura), índice fila -> municipio-año y
+    nombres de las features.
+    """
+    contribuciones = np.load(f'{model_dir}{ATRIBUCIONES_FILE}', mmap_mode='r')
+    indice = pd.read_csv(f'{model_dir}{INDICE_FILE}')
+    with open(f'{model_dir}{FEATURE_NAMES_FILE}', 'rb') as f:
+        feature_cols = pickle.load(f)
+
+    posiciones = pd.Series(np.arange(len(indice)), index=pd.MultiIndex.from_frame(indice[CLAVE]))
+    return contribuciones, posiciones, feature_cols
+
+def explicar_municipio(cache, cod_dpto, cod_munic, anio, n=5):
+    """Top n factores de un municipio-año desde la caché (None si no está)"""
+    contribuciones, posiciones, feature_cols = cache
+    fila = posiciones.get((int(cod_dpto), int(cod_munic), int(anio)))
+    if fila is None:
+        return None
+    return top_factores(contribuciones[fila], feature_cols, n)
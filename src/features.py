@@ -8,11 +8,22 @@ Proyecto: AlertaMaterna - Sistema de Clasificación de Riesgo Obstétrico
           y Predicción de Mortalidad Infantil en la Región Orinoquía
 """
 
+import argparse
+import os
+import pickle
 import pandas as pd
 import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+from almacen_features import materializar
+from flujos_pacientes import eventos_flujo, features_flujo, guardar_flujos, matrices_flujo
+from almacenamiento import guardar_tabla, leer_tabla, ruta_parquet
+from incertidumbre import agregar_intervalos
+from red_referencia import features_red
+from vinculacion_cohortes import cohortes_mensuales, priors_desfase, resumen_vinculacion
+from suavizado import agregar_tasas_suavizadas, cargar_coordenadas_municipios
+
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
@@ -29,6 +40,182 @@ REPS_FILE = f'{DATA_DIR}Registro_Especial_de_Prestadores_y_Sedes_de_Servicios_de
 RIPS_FILE = f'{DATA_DIR}Registros_Individuales_de_Prestación_de_Servicios_de_Salud_–_RIPS_20251204.csv'
 OUTPUT_FILE = f'{DATA_DIR}features_municipio_anio.csv'
 
+# Track nacional de mortalidad materna (todos los municipios DIVIPOLA)
+MORTALIDAD_MATERNA_FILE = f'{DATA_DIR}mortalidad_materna_2020_2024_nacional.csv'
+PARTICIONES = ['ANO', 'COD_DPTO']  # copia particionada para lecturas filtradas (dashboard)
+CHUNKSIZE = 250_000
+
+# Atribución geográfica de nacimientos y defunciones: 'ocurrencia' (COD_DPTO/COD_MUNIC),
+# 'residencia' (CODPTORE/CODMUNRE) o 'ambos' (ocurrencia + tasas *_residencia)
+ATRIBUCION = 'ocurrencia'
+ATRIBUCIONES = ['ocurrencia', 'residencia', 'ambos']
+
+# GRU_ED1 de las familias de features originales (1-5). No coincide con el libro de
+# códigos DANE (00 = <1 h, 04 = 28-29 días, 06 = 6-11 meses); se conserva para no
+# cambiar las entradas de los modelos entrenados. La vinculación por cohorte usa el
+# libro de códigos (vinculacion_cohortes.codigos_edad).
+GRU_ED1_ORIGINALES = [1, 2, 3, 4, 5]
+
+# Suavizado de tasas: prior departamental (False) o de municipios vecinos (True)
+SUAVIZADO_ESPACIAL = False
+
+# Granularidad temporal: 'anio', 'trimestre' o 'mes' (ver configurar_granularidad)
+GRANULARIDAD = 'anio'
+PERIODOS = {'anio': [], 'trimestre': ['TRIMESTRE'], 'mes': ['MES']}
+PERIODOS_POR_ANIO = {'anio': 1, 'trimestre': 4, 'mes': 12}
+CLAVE_ANUAL = ['COD_DPTO', 'COD_MUNIC', 'ANO']
+CLAVE = CLAVE_ANUAL + PERIODOS[GRANULARIDAD]
+
+# Ventana móvil (en periodos) de las tasas de vigilancia sub-anual: un año
+VENTANA_MOVIL = {'trimestre': 4, 'mes': 12}
+VARIABLES_VENTANA = ['total_nacimientos', 'defunciones_fetales', 'defunciones_neonatales', 'total_defunciones']
+
+# ============================================================================
+# GRANULARIDAD TEMPORAL
+# ============================================================================
+
+def configurar_granularidad(granularidad):
+    """Fija la clave de agregación (municipio + año [+ trimestre | mes]) de todas las features"""
+    global GRANULARIDAD, CLAVE
+    if granularidad not in PERIODOS:
+        raise ValueError(f"Granularidad inválida: {granularidad} (opciones: {list(PERIODOS)})")
+    GRANULARIDAD = granularidad
+    CLAVE = CLAVE_ANUAL + PERIODOS[granularidad]
+
+def archivo_salida(granularidad):
+    """La tabla anual conserva su nombre; las sub-anuales se comprimen (12× más filas)"""
+    if granularidad == 'anio':
+        return OUTPUT_FILE
+    return f'{DATA_DIR}features_municipio_{granularidad}.csv.gz'
+
+def agregar_periodo(df):
+    """Deriva TRIMESTRE desde MES; en granularidad sub-anual descarta registros sin mes válido"""
+    if 'MES' not in df.columns:
+        return df
+    
+    df['MES'] = pd.to_numeric(df['MES'], errors='coerce')
+    df['TRIMESTRE'] = (df['MES'] - 1) // 3 + 1
+    
+    if GRANULARIDAD != 'anio':
+        sin_periodo = ~df['MES'].between(1, 12)
+        if sin_periodo.any():
+            print(f"  → {sin_periodo.sum():,} registros sin mes válido excluidos")
+            df = df[~sin_periodo].copy()
+    return df
+
+def compactar_tipos(df):
+    """Enteros mínimos para las claves y float32 para las features (tablas sub-anuales)"""
+    df = df.copy()
+    for col in CLAVE:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    flotantes = df.select_dtypes('float64').columns
+    df[flotantes] = df[flotantes].astype(np.float32)
+    return df
+
+# ============================================================================
+# ATRIBUCIÓN GEOGRÁFICA (OCURRENCIA / RESIDENCIA)
+# ============================================================================
+
+def edades_originales(df_def_nofet):
+    """Defunciones < 1 año con la selección de GRU_ED1 de las familias originales (entradas de los modelos)"""
+    return df_def_nofet[df_def_nofet['GRU_ED1'].isin(GRU_ED1_ORIGINALES)]
+
+def configurar_atribucion(atribucion):
+    """Fija si los eventos se asignan al municipio de ocurrencia, de residencia o ambos"""
+    global ATRIBUCION
+    if atribucion not in ATRIBUCIONES:
+        raise ValueError(f"Atribución inválida: {atribucion} (opciones: {ATRIBUCIONES})")
+    ATRIBUCION = atribucion
+
+def filtrar_region(df):
+    """Registros ocurridos en la Orinoquía o de residentes de la Orinoquía (la atribución se decide después)"""
+    df['COD_DPTO'] = df['COD_DPTO'].astype(str).str.strip()
+    en_region = df['COD_DPTO'].isin(DPTOS_ORINOQUIA)
+    if 'CODPTORE' in df.columns:
+        df = _claves_compactas(df, ['CODPTORE', 'CODMUNRE'])
+        en_region |= df['CODPTORE'].astype(str).isin(DPTOS_ORINOQUIA)
+    # El filtro booleano ya devuelve un DataFrame nuevo: un .copy() adicional duplicaría
+    # el archivo completo (columna a columna) en el pico de memoria de la carga
+    return df[en_region]
+
+def atribuir(df, modo):
+    """Asigna cada registro a su municipio de ocurrencia o de residencia y deja solo los de la región"""
+    if modo == 'residencia':
+        df = df.assign(COD_DPTO=df['CODPTORE'].astype(str), COD_MUNIC=df['CODMUNRE'])
+        df = df[df['COD_DPTO'].isin(DPTOS_ORINOQUIA) & df['COD_MUNIC'].notna()]
+        df['COD_MUNIC'] = df['COD_MUNIC'].astype(np.int64)
+        return df
+    en_region = df['COD_DPTO'].isin(DPTOS_ORINOQUIA)
+    return df if en_region.all() else df[en_region]
+
+def generar_features_residencia(df_nac, df_def_fet, df_def_nofet):
+    """Nacimientos y tasas fetal/neonatal atribuidas a la residencia (modo 'ambos')"""
+    print("\nGenerando features por municipio de residencia...")
+    df_nac, df_def_fet, df_def_nofet = (atribuir(d, 'residencia') for d in (df_nac, df_def_fet, df_def_nofet))
+    
+    features = df_nac.groupby(CLAVE).size().reset_index(name='total_nacimientos')
+    features = features.merge(generar_features_mortalidad_fetal(df_nac, df_def_fet), on=CLAVE, how='left')
+    features = features.merge(generar_features_mortalidad_neonatal(df_nac, df_def_nofet), on=CLAVE, how='left')
+    return features.rename(columns={c: f'{c}_residencia' for c in features.columns if c not in CLAVE})
+
+def _alinear_claves(tabla, features, clave):
+    """Mismos tipos de clave que la tabla de features (COD_DPTO es texto en la tabla en construcción)"""
+    for col in clave:
+        tabla[col] = tabla[col].astype(features[col].dtype)
+    return tabla
+
+def generar_features_mortalidad_cohorte(df_nac, df_def_nofet):
+    """Tasas neonatal e infantil por cohorte de nacimiento y residencia (vinculacion_cohortes.py)"""
+    print("\nVinculando defunciones < 1 año con su cohorte de nacimiento...")
+    cohortes, asignacion = cohortes_mensuales(df_nac, df_def_nofet)
+    niveles = resumen_vinculacion(asignacion)
+    print("  → Defunciones por nivel de bloqueo: " + ", ".join(f"{n}: {v:,.0f}" for n, v in niveles.items()))
+    
+    cohortes = agregar_periodo(cohortes)
+    features = cohortes.groupby(CLAVE).agg(
+        nacimientos_cohorte=('nacimientos_cohorte', 'sum'),
+        defunciones_neonatales_cohorte=('defunciones_neonatales_cohorte', 'sum'),
+        defunciones_infantiles_cohorte=('defunciones_infantiles_cohorte', 'sum'),
+        meses_seguimiento=('meses_seguimiento', 'min'),
+    ).reset_index()
+    
+    # Solo cohortes con seguimiento completo (1 mes neonatal, 12 meses infantil)
+    nac = features['nacimientos_cohorte'].where(features['nacimientos_cohorte'] > 0)
+    features['tasa_mortalidad_neonatal_cohorte'] = (features['defunciones_neonatales_cohorte'] / nac * 1000).where(
+        features['meses_seguimiento'] >= 1)
+    features['tasa_mortalidad_infantil_cohorte'] = (features['defunciones_infantiles_cohorte'] / nac * 1000).where(
+        features['meses_seguimiento'] >= 12)
+    
+    print(f"  → Tasa neonatal por cohorte: {features['tasa_mortalidad_neonatal_cohorte'].mean():.2f}‰, "
+          f"infantil: {features['tasa_mortalidad_infantil_cohorte'].mean():.2f}‰ "
+          f"({features['tasa_mortalidad_infantil_cohorte'].isna().sum()} cohortes sin seguimiento completo)")
+    return features.drop(columns=['nacimientos_cohorte', 'meses_seguimiento'])
+
+def unir_features_flujo(features, flujos):
+    """Features de salida/referencia (anuales: flujos_pacientes.py y red_referencia.py) en la tabla de la región"""
+    feat_flujo = features_flujo(flujos)
+    ids = feat_flujo.pop('ID_MUNICIPIO')
+    feat_flujo.insert(0, 'COD_MUNIC', ids % 1000)
+    feat_flujo.insert(0, 'COD_DPTO', ids // 1000)
+    feat_flujo = _alinear_claves(feat_flujo, features, CLAVE_ANUAL)
+    
+    # Sub-anual: el flujo del año se repite en cada periodo; sin eventos con residencia conocida = 0
+    features = features.merge(feat_flujo, on=CLAVE_ANUAL, how='left')
+    columnas = [c for c in feat_flujo.columns if c not in CLAVE_ANUAL]
+    features[columnas] = features[columnas].fillna(0)
+    
+    # Red de referencia: cadenas sin camino a un hub quedan en NaN (no es distancia 0)
+    print("\nCalculando centralidad y cadenas de la red de referencia...")
+    feat_red = features_red(flujos)
+    ids = feat_red.pop('ID_MUNICIPIO')
+    feat_red.insert(0, 'COD_MUNIC', ids % 1000)
+    feat_red.insert(0, 'COD_DPTO', ids // 1000)
+    feat_red = _alinear_claves(feat_red, features, CLAVE_ANUAL)
+    features = features.merge(feat_red, on=CLAVE_ANUAL, how='left')
+    print(f"  → {features['es_hub_referencia'].sum()} registros de hubs en la región; "
+          f"cadena media hasta un hub: {features['km_cadena_referencia'].mean():.0f} km")
+    return features
+
 # ============================================================================
 # FUNCIONES DE CARGA
 # ============================================================================
@@ -38,9 +225,8 @@ def cargar_nacimientos():
     print("Cargando nacimientos (códigos numéricos)...")
     df = pd.read_csv(NACIMIENTOS_FILE, low_memory=False)
     
-    # Filtrar Orinoquía
-    df['COD_DPTO'] = df['COD_DPTO'].astype(str).str.strip()
-    df = df[df['COD_DPTO'].isin(DPTOS_ORINOQUIA)].copy()
+    # Filtrar Orinoquía (ocurrencia o residencia; ver atribuir)
+    df = filtrar_region(df)
     
     # Convertir a numéricos las columnas críticas
     numeric_cols = ['ANO', 'COD_MUNIC', 'EDAD_MADRE', 'NUMCONSUL', 'PESO_NAC', 
@@ -50,6 +236,7 @@ def cargar_nacimientos():
     for col in numeric_cols:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = agregar_periodo(df)
     
     print(f"  → {len(df):,} nacimientos cargados")
     return df
@@ -59,14 +246,14 @@ def cargar_defunciones_fetales():
     print("Cargando defunciones fetales (códigos numéricos)...")
     df = pd.read_csv(DEFUNCIONES_FETALES_FILE, low_memory=False)
     
-    # Filtrar Orinoquía
-    df['COD_DPTO'] = df['COD_DPTO'].astype(str).str.strip()
-    df = df[df['COD_DPTO'].isin(DPTOS_ORINOQUIA)].copy()
+    # Filtrar Orinoquía (ocurrencia o residencia; ver atribuir)
+    df = filtrar_region(df)
     
     # Convertir a numéricos
     df['ANO'] = pd.to_numeric(df['ANO'], errors='coerce')
     df['COD_MUNIC'] = pd.to_numeric(df['COD_MUNIC'], errors='coerce')
     df['CAUSA_667'] = pd.to_numeric(df['CAUSA_667'], errors='coerce')
+    df = agregar_periodo(df)
     
     print(f"  → {len(df):,} defunciones fetales cargadas")
     return df
@@ -76,18 +263,20 @@ def cargar_defunciones_no_fetales():
     print("Cargando defunciones no fetales (códigos numéricos)...")
     df = pd.read_csv(DEFUNCIONES_NO_FETALES_FILE, low_memory=False)
     
-    # Filtrar Orinoquía
-    df['COD_DPTO'] = df['COD_DPTO'].astype(str).str.strip()
-    df = df[df['COD_DPTO'].isin(DPTOS_ORINOQUIA)].copy()
+    # Filtrar menores de 1 año antes que la región: el archivo trae todas las edades.
+    # Todos los grupos del libro de códigos DANE (00-06); las familias originales se
+    # quedan después con su selección (GRU_ED1_ORIGINALES)
+    df['GRU_ED1'] = pd.to_numeric(df['GRU_ED1'], errors='coerce')
+    df = df[df['GRU_ED1'].isin(list(priors_desfase()[0]))]
+    
+    # Filtrar Orinoquía (ocurrencia o residencia; ver atribuir)
+    df = filtrar_region(df)
     
     # Convertir a numéricos
     df['ANO'] = pd.to_numeric(df['ANO'], errors='coerce')
     df['COD_MUNIC'] = pd.to_numeric(df['COD_MUNIC'], errors='coerce')
-    df['GRU_ED1'] = pd.to_numeric(df['GRU_ED1'], errors='coerce')
     df['CAUSA_667'] = pd.to_numeric(df['CAUSA_667'], errors='coerce')
-    
-    # Filtrar menores de 1 año (GRU_ED1: 1=<1h, 2=1-23h, 3=1-6d, 4=7-27d, 5=28d-11m, 6=1-4a)
-    df = df[df['GRU_ED1'].isin([1, 2, 3, 4, 5])].copy()
+    df = agregar_periodo(df)
     
     print(f"  → {len(df):,} defunciones < 1 año cargadas")
     return df
@@ -150,7 +339,7 @@ def generar_features_demograficas(df_nac):
     df_nac['educacion_baja'] = (df_nac['NIV_EDUM'].isin([1, 2, 3])).astype(int)
     
     # Agrupar por municipio-año
-    features = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).agg(
+    features = df_nac.groupby(CLAVE).agg(
         total_nacimientos=('ANO', 'size'),
         edad_materna_promedio=('edad_real', 'mean'),
         pct_madres_adolescentes=('EDAD_MADRE', lambda x: (x.isin([1, 2])).sum() / len(x) * 100),
@@ -187,7 +376,7 @@ def generar_features_clinicas(df_nac):
     df_nac['cesarea'] = (df_nac['TIPO_PARTO'] == 3).astype(int)
     
     # Agrupar por municipio-año
-    features = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).agg(
+    features = df_nac.groupby(CLAVE).agg(
         pct_prematuros=('prematuro', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0),
         pct_bajo_peso=('bajo_peso', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0),
         pct_apgar_bajo=('apgar1_bajo', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0),
@@ -223,8 +412,8 @@ def generar_features_institucionales(df_nac, df_inst):
     df_nac['COD_MUNIC_COMPLETO'] = (df_nac['COD_DPTO'].astype(int) * 1000 + 
                                      df_nac['COD_MUNIC'].astype(int))
     
-    # Agrupar nacimientos
-    nac_por_mun = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO', 'COD_MUNIC_COMPLETO']).size().reset_index(name='total_nacimientos')
+    # Agrupar nacimientos (razón anual: es un indicador estructural, igual en todos los periodos del año)
+    nac_por_mun = df_nac.groupby(CLAVE_ANUAL + ['COD_MUNIC_COMPLETO']).size().reset_index(name='total_nacimientos')
     
     # Merge
     features = nac_por_mun.merge(inst_por_mun, on='COD_MUNIC_COMPLETO', how='left')
@@ -234,9 +423,10 @@ def generar_features_institucionales(df_nac, df_inst):
     # Calcular instituciones per capita (por 1000 nacimientos)
     features['instituciones_per_1000nac'] = (features['num_instituciones'] / features['total_nacimientos'] * 1000).fillna(0)
     
-    # Seleccionar columnas
-    features = features[['COD_DPTO', 'COD_MUNIC', 'ANO', 'num_instituciones', 
-                        'pct_instituciones_publicas', 'instituciones_per_1000nac']]
+    # Seleccionar columnas y llevar a la granularidad configurada
+    features = df_nac[CLAVE].drop_duplicates().merge(
+        features[CLAVE_ANUAL + ['num_instituciones', 'pct_instituciones_publicas', 'instituciones_per_1000nac']],
+        on=CLAVE_ANUAL, how='left')
     
     print(f"  → 3 features institucionales generadas")
     return features
@@ -249,8 +439,8 @@ def generar_features_acceso_servicios(df_nac, df_rips):
     """Genera features de acceso a servicios de salud usando RIPS"""
     print("\nGenerando features de acceso a servicios...")
     
-    # Agrupar RIPS por municipio-año
-    rips_mun = df_rips.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).agg(
+    # Agrupar RIPS por municipio-año (RIPS no trae mes: razones anuales difundidas a los periodos)
+    rips_mun = df_rips.groupby(CLAVE_ANUAL).agg(
         total_atenciones=('NumeroAtenciones', 'sum'),
         atenciones_urgencias=('TipoAtencion', lambda x: (x.str.contains('Urgencias', case=False, na=False)).sum()),
         atenciones_consulta=('TipoAtencion', lambda x: (x.str.contains('Consulta', case=False, na=False)).sum()),
@@ -258,10 +448,10 @@ def generar_features_acceso_servicios(df_nac, df_rips):
     ).reset_index()
     
     # Contar nacimientos por municipio-año
-    nac_count = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='total_nacimientos')
+    nac_count = df_nac.groupby(CLAVE_ANUAL).size().reset_index(name='total_nacimientos')
     
     # Merge
-    features = nac_count.merge(rips_mun, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
+    features = nac_count.merge(rips_mun, on=CLAVE_ANUAL, how='left')
     features = features.fillna(0)
     
     # Calcular ratios
@@ -272,9 +462,10 @@ def generar_features_acceso_servicios(df_nac, df_rips):
     features['pct_urgencias'] = (features['atenciones_urgencias'] / features['total_atenciones'] * 100).fillna(0)
     
     # Seleccionar columnas
-    features = features[['COD_DPTO', 'COD_MUNIC', 'ANO', 'atenciones_per_nacimiento', 
-                        'urgencias_per_nacimiento', 'consultas_per_nacimiento', 
-                        'procedimientos_per_nacimiento', 'pct_urgencias']]
+    features = df_nac[CLAVE].drop_duplicates().merge(
+        features[CLAVE_ANUAL + ['atenciones_per_nacimiento', 'urgencias_per_nacimiento', 'consultas_per_nacimiento',
+                                'procedimientos_per_nacimiento', 'pct_urgencias']],
+        on=CLAVE_ANUAL, how='left')
     
     print(f"  → 5 features de acceso a servicios generadas")
     return features
@@ -295,7 +486,7 @@ def generar_features_socioeconomicas(df_nac):
     df_nac['multiparidad'] = (df_nac['N_HIJOSV'] >= 4).astype(int)
     
     # Agrupar por municipio-año
-    features = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).agg(
+    features = df_nac.groupby(CLAVE).agg(
         pct_sin_seguridad=('sin_seguridad', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0),
         pct_regimen_subsidiado=('subsidiado', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0),
         pct_multiparidad=('multiparidad', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0)
@@ -316,7 +507,7 @@ def generar_features_atencion_prenatal(df_nac):
     df_nac['consultas_insuficientes'] = (df_nac['NUMCONSUL'] < 4).astype(int)
     
     # Agrupar por municipio-año
-    features = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).agg(
+    features = df_nac.groupby(CLAVE).agg(
         consultas_promedio=('NUMCONSUL', lambda x: x[x != 99].mean() if (x != 99).sum() > 0 else 0),
         pct_consultas_insuficientes=('consultas_insuficientes', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0),
         pct_sin_control_prenatal=('NUMCONSUL', lambda x: ((x == 0) | (x == 99)).sum() / len(x) * 100 if len(x) > 0 else 0)
@@ -334,21 +525,21 @@ def generar_features_mortalidad_neonatal(df_nac, df_def_nofet):
     print("\nGenerando features de mortalidad neonatal...")
     
     # Contar nacimientos por municipio-año
-    nac_count = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='total_nacimientos')
+    nac_count = df_nac.groupby(CLAVE).size().reset_index(name='total_nacimientos')
     
     # Contar defunciones neonatales (GRU_ED1: 1=<1h, 2=1-23h, 3=1-6d, 4=7-27d)
     def_neonatal = df_def_nofet[df_def_nofet['GRU_ED1'].isin([1, 2, 3, 4])].copy()
-    def_neonatal_count = def_neonatal.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='defunciones_neonatales')
+    def_neonatal_count = def_neonatal.groupby(CLAVE).size().reset_index(name='defunciones_neonatales')
     
     # Merge
-    features = nac_count.merge(def_neonatal_count, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
+    features = nac_count.merge(def_neonatal_count, on=CLAVE, how='left')
     features['defunciones_neonatales'] = features['defunciones_neonatales'].fillna(0)
     
     # Calcular tasa por 1000 nacidos vivos
     features['tasa_mortalidad_neonatal'] = (features['defunciones_neonatales'] / features['total_nacimientos'] * 1000).fillna(0)
     
     # Seleccionar columnas
-    features = features[['COD_DPTO', 'COD_MUNIC', 'ANO', 'tasa_mortalidad_neonatal']]
+    features = features[CLAVE + ['tasa_mortalidad_neonatal']]
     
     print(f"  → Tasa promedio: {features['tasa_mortalidad_neonatal'].mean():.2f} por 1000 nacidos vivos")
     return features
@@ -358,20 +549,20 @@ def generar_features_mortalidad_fetal(df_nac, df_def_fet):
     print("\nGenerando features de mortalidad fetal...")
     
     # Contar nacimientos por municipio-año
-    nac_count = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='total_nacimientos')
+    nac_count = df_nac.groupby(CLAVE).size().reset_index(name='total_nacimientos')
     
     # Contar defunciones fetales
-    def_fetal_count = df_def_fet.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='defunciones_fetales')
+    def_fetal_count = df_def_fet.groupby(CLAVE).size().reset_index(name='defunciones_fetales')
     
     # Merge
-    features = nac_count.merge(def_fetal_count, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
+    features = nac_count.merge(def_fetal_count, on=CLAVE, how='left')
     features['defunciones_fetales'] = features['defunciones_fetales'].fillna(0)
     
     # Calcular tasa por 1000 nacidos vivos
     features['tasa_mortalidad_fetal'] = (features['defunciones_fetales'] / features['total_nacimientos'] * 1000).fillna(0)
     
     # Seleccionar columnas
-    features = features[['COD_DPTO', 'COD_MUNIC', 'ANO', 'tasa_mortalidad_fetal', 'defunciones_fetales']]
+    features = features[CLAVE + ['tasa_mortalidad_fetal', 'defunciones_fetales']]
     
     print(f"  → Tasa promedio: {features['tasa_mortalidad_fetal'].mean():.2f} por 1000 nacidos vivos")
     return features
@@ -381,15 +572,15 @@ def generar_presion_obstetrica(df_nac, df_def_fet, df_def_nofet):
     print("\nGenerando presión obstétrica...")
     
     # Contar nacimientos
-    nac_count = df_nac.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='total_nacimientos')
+    nac_count = df_nac.groupby(CLAVE).size().reset_index(name='total_nacimientos')
     
     # Contar TODAS las defunciones (fetales + no fetales < 1 año)
-    def_fet_count = df_def_fet.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='def_fetales')
-    def_nofet_count = df_def_nofet.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).size().reset_index(name='def_nofetales')
+    def_fet_count = df_def_fet.groupby(CLAVE).size().reset_index(name='def_fetales')
+    def_nofet_count = df_def_nofet.groupby(CLAVE).size().reset_index(name='def_nofetales')
     
     # Merge
-    features = nac_count.merge(def_fet_count, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(def_nofet_count, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
+    features = nac_count.merge(def_fet_count, on=CLAVE, how='left')
+    features = features.merge(def_nofet_count, on=CLAVE, how='left')
     features = features.fillna(0)
     
     # Total defunciones
@@ -399,7 +590,7 @@ def generar_presion_obstetrica(df_nac, df_def_fet, df_def_nofet):
     features['presion_obstetrica'] = (features['total_defunciones'] / features['total_nacimientos'] * 1000).fillna(0)
     
     # Seleccionar columnas
-    features = features[['COD_DPTO', 'COD_MUNIC', 'ANO', 'presion_obstetrica', 'total_defunciones']]
+    features = features[CLAVE + ['presion_obstetrica', 'total_defunciones']]
     
     print(f"  → Presión promedio: {features['presion_obstetrica'].mean():.2f} por 1000 nacimientos")
     return features
@@ -412,15 +603,15 @@ def generar_features_causas_evitables(df_def_fet, df_def_nofet, df_nac):
     causas_evitables = list(range(401, 411)) + list(range(501, 507))
     
     # Combinar defunciones
-    def_fet_temp = df_def_fet[['COD_DPTO', 'COD_MUNIC', 'ANO', 'CAUSA_667']].copy()
-    def_nofet_temp = df_def_nofet[['COD_DPTO', 'COD_MUNIC', 'ANO', 'CAUSA_667']].copy()
+    def_fet_temp = df_def_fet[CLAVE + ['CAUSA_667']].copy()
+    def_nofet_temp = df_def_nofet[CLAVE + ['CAUSA_667']].copy()
     todas_def = pd.concat([def_fet_temp, def_nofet_temp], ignore_index=True)
     
     # Identificar causas evitables
     todas_def['es_evitable'] = todas_def['CAUSA_667'].isin(causas_evitables).astype(int)
     
     # Agrupar
-    def_count = todas_def.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).agg(
+    def_count = todas_def.groupby(CLAVE).agg(
         total_defunciones=('ANO', 'size'),
         defunciones_evitables=('es_evitable', 'sum')
     ).reset_index()
@@ -429,11 +620,11 @@ def generar_features_causas_evitables(df_def_fet, df_def_nofet, df_nac):
     def_count['pct_mortalidad_evitable'] = (def_count['defunciones_evitables'] / def_count['total_defunciones'] * 100).fillna(0).clip(0, 100)
     
     # Crear esqueleto con todos los municipios-años
-    esqueleto = df_nac[['COD_DPTO', 'COD_MUNIC', 'ANO']].drop_duplicates()
+    esqueleto = df_nac[CLAVE].drop_duplicates()
     
     # Merge (municipios sin defunciones = 0% evitable)
-    features = esqueleto.merge(def_count[['COD_DPTO', 'COD_MUNIC', 'ANO', 'pct_mortalidad_evitable']], 
-                               on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
+    features = esqueleto.merge(def_count[CLAVE + ['pct_mortalidad_evitable']], 
+                               on=CLAVE, how='left')
     features['pct_mortalidad_evitable'] = features['pct_mortalidad_evitable'].fillna(0)
     
     print(f"  → Promedio: {features['pct_mortalidad_evitable'].mean():.1f}% de muertes evitables")
@@ -443,8 +634,8 @@ def generar_features_embarazo_alto_riesgo(df_nac):
     """Genera feature de % embarazos de alto riesgo"""
     print("\nGenerando features de embarazo alto riesgo...")
     
-    # Alto riesgo = prematuro O bajo peso O múltiple
-    df_temp = df_nac.copy()
+    # Alto riesgo = prematuro O bajo peso O múltiple (solo las columnas que usa)
+    df_temp = df_nac[CLAVE + ['T_GES', 'PESO_NAC', 'MUL_PARTO']].copy()
     df_temp['prematuro'] = df_temp['T_GES'].isin([1, 2, 3, 4])
     df_temp['bajo_peso'] = df_temp['PESO_NAC'].isin([1, 2, 3, 4, 5])
     df_temp['multiple'] = df_temp['MUL_PARTO'] > 1
@@ -452,7 +643,7 @@ def generar_features_embarazo_alto_riesgo(df_nac):
     df_temp['alto_riesgo'] = (df_temp['prematuro'] | df_temp['bajo_peso'] | df_temp['multiple']).astype(int)
     
     # Agrupar
-    features = df_temp.groupby(['COD_DPTO', 'COD_MUNIC', 'ANO']).agg(
+    features = df_temp.groupby(CLAVE).agg(
         pct_embarazos_alto_riesgo=('alto_riesgo', lambda x: x.sum() / len(x) * 100 if len(x) > 0 else 0)
     ).reset_index()
     
@@ -495,25 +686,270 @@ def generar_indice_fragilidad(df_features):
     print(f"  → Promedio: {df_temp['indice_fragilidad_sistema'].mean():.1f}")
     print(f"  → Municipios críticos (>80): {(df_temp['indice_fragilidad_sistema'] > 80).sum()}")
     
-    return df_temp[['COD_DPTO', 'COD_MUNIC', 'ANO', 'indice_fragilidad_sistema']]
+    return df_temp[CLAVE + ['indice_fragilidad_sistema']]
+
+# ============================================================================
+# FEATURES DE MORTALIDAD MATERNA - TRACK NACIONAL (9)
+# ============================================================================
+
+# Clasificación CIE-10 de la causa básica (C_BAS1) para la razón de mortalidad materna
+CIE_DIRECTAS = tuple(f'O{i:02d}' for i in range(0, 96)) + ('A34',)  # O00-O95 y tétanos obstétrico
+CIE_INDIRECTAS = ('O98', 'O99')
+CIE_TARDIAS = ('O96', 'O97')  # > 42 días posparto: fuera de la RMM
+CAUSAS_EXTERNAS_667 = range(501, 515)  # Lista 6/67: accidentes, agresiones, lesiones autoinfligidas
+
+def _claves_compactas(df, columnas):
+    """Códigos como enteros pequeños (nullable: residencia sin código queda <NA>)"""
+    for col in columnas:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int16')
+    return df
+
+def contar_nacimientos_nacional(archivo=None):
+    """Nacimientos por municipio-periodo de todo el país, leyendo por bloques solo las claves"""
+    archivo = archivo or NACIMIENTOS_FILE
+    parciales = []
+    for bloque in pd.read_csv(archivo, usecols=['COD_DPTO', 'COD_MUNIC', 'ANO', 'MES'],
+                              dtype=str, chunksize=CHUNKSIZE):
+        bloque = agregar_periodo(_claves_compactas(bloque, ['COD_DPTO', 'COD_MUNIC', 'ANO', 'MES']))
+        parciales.append(bloque.groupby(CLAVE).size())
+    return pd.concat(parciales).groupby(level=CLAVE).sum().rename('total_nacimientos')
+
+def _agregar_defunciones_maternas(bloque, clave):
+    """Conteos parciales de un bloque por la clave dada (ocurrencia o residencia)"""
+    return bloque.groupby(clave).agg(
+        defunciones_maternas_directas=('directa', 'sum'),
+        defunciones_maternas_indirectas=('indirecta', 'sum'),
+        defunciones_maternas_tardias=('tardia', 'sum'),
+        defunciones_maternas_externas=('externa', 'sum'),
+        defunciones_maternas_no_residentes=('no_residente', 'sum'),
+    )
+
+def generar_features_mortalidad_materna(archivo=None, archivo_nacimientos=None):
+    """
+    Razón de mortalidad materna (por 100.000 nacidos vivos), composición por
+    causa y ocurrencia vs residencia para todos los municipios DIVIPOLA.
+
+    Una sola pasada por bloques tipados: cada bloque se reduce a conteos por
+    municipio-periodo de ocurrencia (COD_DPTO/COD_MUNIC) y de residencia
+    (CODPTORE/CODMUNRE); los parciales se suman al final.
+    """
+    print("\nGenerando features de mortalidad materna (track nacional)...")
+    archivo = archivo or MORTALIDAD_MATERNA_FILE
+
+    clave_res = ['CODPTORE', 'CODMUNRE'] + CLAVE[2:]
+    por_ocurrencia, por_residencia = [], []
+    for bloque in pd.read_csv(archivo, usecols=['COD_DPTO', 'COD_MUNIC', 'CODPTORE', 'CODMUNRE',
+                                                'ANO', 'MES', 'C_BAS1', 'CAUSA_667'],
+                              dtype={'C_BAS1': str}, chunksize=CHUNKSIZE):
+        bloque = agregar_periodo(_claves_compactas(
+            bloque, ['COD_DPTO', 'COD_MUNIC', 'CODPTORE', 'CODMUNRE', 'ANO', 'MES', 'CAUSA_667']))
+
+        causa = bloque['C_BAS1'].str.strip().str.upper().str[:3]
+        bloque['directa'] = causa.isin(CIE_DIRECTAS).astype(np.int32)
+        bloque['indirecta'] = causa.isin(CIE_INDIRECTAS).astype(np.int32)
+        bloque['tardia'] = causa.isin(CIE_TARDIAS).astype(np.int32)
+        bloque['externa'] = bloque['CAUSA_667'].isin(CAUSAS_EXTERNAS_667).astype(np.int32)
+        otro_municipio = ((bloque['COD_DPTO'] != bloque['CODPTORE']) |
+                          (bloque['COD_MUNIC'] != bloque['CODMUNRE'])).fillna(True)
+        bloque['no_residente'] = ((bloque['directa'] + bloque['indirecta']) * otro_municipio).astype(np.int32)
+
+        por_ocurrencia.append(_agregar_defunciones_maternas(bloque, CLAVE))
+        por_residencia.append(_agregar_defunciones_maternas(bloque, clave_res))
+
+    ocurrencia = pd.concat(por_ocurrencia).groupby(level=CLAVE).sum()
+    residencia = pd.concat(por_residencia).groupby(level=clave_res).sum()
+    residencia = (residencia['defunciones_maternas_directas'] + residencia['defunciones_maternas_indirectas'])
+    residencia = residencia.rename('defunciones_maternas_residencia').rename_axis(CLAVE)
+
+    # Esqueleto: todos los municipios DIVIPOLA en todos los periodos con nacimientos
+    nacimientos = contar_nacimientos_nacional(archivo_nacimientos)
+    periodos = nacimientos.reset_index()[CLAVE[2:]].drop_duplicates()
+    municipios = cargar_coordenadas_municipios()[['COD_DPTO', 'COD_MUNIC']].drop_duplicates()
+    esqueleto = _claves_compactas(municipios.merge(periodos, how='cross'), CLAVE).set_index(CLAVE)
+
+    # Unión externa: conserva también códigos fuera de DIVIPOLA presentes en las fuentes
+    features = esqueleto.join([nacimientos, ocurrencia, residencia], how='outer').fillna(0)
+    features = features.astype(np.int64).reset_index()
+
+    nac = features['total_nacimientos'].where(features['total_nacimientos'] > 0)
+    features['defunciones_maternas'] = (features['defunciones_maternas_directas'] +
+                                        features['defunciones_maternas_indirectas'])
+    features['razon_mortalidad_materna'] = features['defunciones_maternas'] / nac * 100000
+    features['razon_mortalidad_materna_residencia'] = features['defunciones_maternas_residencia'] / nac * 100000
+
+    maternas = features['defunciones_maternas'].where(features['defunciones_maternas'] > 0)
+    features['pct_materna_directa'] = (features['defunciones_maternas_directas'] / maternas * 100).fillna(0)
+    features['pct_materna_indirecta'] = (features['defunciones_maternas_indirectas'] / maternas * 100).fillna(0)
+    features['pct_materna_no_residentes'] = (features['defunciones_maternas_no_residentes'] / maternas * 100).fillna(0)
+
+    print(f"  → {len(features):,} municipios-periodo, {features['defunciones_maternas'].sum():,} muertes maternas "
+          f"({features['defunciones_maternas_tardias'].sum():,} tardías, "
+          f"{features['defunciones_maternas_externas'].sum():,} por causa externa excluidas de la RMM)")
+    total = features['defunciones_maternas'].sum()
+    if total > 0:
+        print(f"  → {features['defunciones_maternas_no_residentes'].sum() / total:.1%} ocurren fuera del municipio de residencia")
+    return features
+
+def unir_features_materna(features, feat_materna):
+    """Agrega la familia materna (menos el denominador, ya presente) a la tabla de la región"""
+    columnas = [c for c in feat_materna.columns if c not in CLAVE and c != 'total_nacimientos']
+    feat_materna = _alinear_claves(feat_materna[CLAVE + columnas].copy(), features, CLAVE)
+
+    features = features.merge(feat_materna, on=CLAVE, how='left')
+    conteos = [c for c in columnas if c.startswith('defunciones_') or c.startswith('pct_')]
+    features[conteos] = features[conteos].fillna(0)
+    return features
+
+# ============================================================================
+# VENTANAS MÓVILES INCREMENTALES (VIGILANCIA SUB-ANUAL)
+# ============================================================================
+
+def ordinal_periodo(df):
+    """Número consecutivo del periodo (año × periodos por año + periodo) para ordenar y detectar saltos"""
+    columna = PERIODOS[GRANULARIDAD][0]
+    return df['ANO'].astype(int) * PERIODOS_POR_ANIO[GRANULARIDAD] + df[columna].astype(int) - 1
+
+def iniciar_ventanas(ventana):
+    """Estado vacío: buffer circular (ventana × municipios × variables) y su suma acumulada"""
+    return {
+        'granularidad': GRANULARIDAD,
+        'ventana': ventana,
+        'municipios': pd.MultiIndex.from_tuples([], names=['COD_DPTO', 'COD_MUNIC']),
+        'buffer': np.zeros((ventana, 0, len(VARIABLES_VENTANA))),
+        'suma': np.zeros((0, len(VARIABLES_VENTANA))),
+        'periodos': 0,
+        'ultimo_periodo': None,
+    }
+
+def indice_municipios(df):
+    """Claves (COD_DPTO, COD_MUNIC) enteras: en el pipeline COD_DPTO llega como texto, en la tabla guardada como número"""
+    return pd.MultiIndex.from_arrays(
+        [pd.to_numeric(df[columna]).astype(np.int64) for columna in ('COD_DPTO', 'COD_MUNIC')],
+        names=['COD_DPTO', 'COD_MUNIC'],
+    )
+
+def actualizar_ventanas(estado, df_periodo):
+    """
+    Desliza la ventana un periodo: suma el periodo que entra y resta el que sale
+    del buffer, en O(municipios) y sin recalcular la ventana completa.
+    
+    Los municipios sin registros en el periodo cuentan como cero. Devuelve las
+    sumas móviles de los municipios presentes en df_periodo.
+    """
+    claves = indice_municipios(df_periodo)
+    nuevos = claves.difference(estado['municipios'])
+    if len(nuevos) > 0:
+        estado['municipios'] = estado['municipios'].append(nuevos)
+        ceros = np.zeros((len(nuevos), len(VARIABLES_VENTANA)))
+        estado['suma'] = np.vstack([estado['suma'], ceros])
+        estado['buffer'] = np.concatenate([estado['buffer'], np.broadcast_to(ceros, (estado['ventana'],) + ceros.shape)], axis=1)
+    
+    idx = estado['municipios'].get_indexer(claves)
+    entrante = np.zeros_like(estado['suma'])
+    entrante[idx] = df_periodo[VARIABLES_VENTANA].to_numpy(dtype=float)
+    
+    posicion = estado['periodos'] % estado['ventana']
+    estado['suma'] += entrante - estado['buffer'][posicion]
+    estado['buffer'][posicion] = entrante
+    estado['periodos'] += 1
+    
+    return pd.DataFrame(estado['suma'][idx], columns=VARIABLES_VENTANA, index=df_periodo.index)
+
+def procesar_periodo_nuevo(estado, df_periodo):
+    """
+    Agrega las tasas móviles (*_movil) a las features de un periodo nuevo.
+    
+    Uso al llegar un mes: estado = pickle de la corrida anterior, df_periodo =
+    features del mes (misma granularidad). Los periodos intermedios sin datos
+    avanzan la ventana con ceros.
+    """
+    ordinal = int(ordinal_periodo(df_periodo).iloc[0])
+    if estado['ultimo_periodo'] is not None:
+        if ordinal <= estado['ultimo_periodo']:
+            raise ValueError(f"Periodo {ordinal} ya procesado (último: {estado['ultimo_periodo']})")
+        vacio = pd.DataFrame(columns=['COD_DPTO', 'COD_MUNIC'] + VARIABLES_VENTANA)
+        for _ in range(ordinal - estado['ultimo_periodo'] - 1):
+            actualizar_ventanas(estado, vacio)
+    
+    # Defunciones neonatales reconstruidas desde la tasa por mil
+    conteos = df_periodo[['COD_DPTO', 'COD_MUNIC', 'total_nacimientos', 'defunciones_fetales', 'total_defunciones']].fillna(0)
+    conteos['defunciones_neonatales'] = np.rint(df_periodo['tasa_mortalidad_neonatal'].fillna(0) * conteos['total_nacimientos'] / 1000)
+    sumas = actualizar_ventanas(estado, conteos)
+    estado['ultimo_periodo'] = ordinal
+    
+    nacimientos = sumas['total_nacimientos']
+    moviles = pd.DataFrame({
+        'total_nacimientos_movil': nacimientos,
+        'tasa_mortalidad_fetal_movil': (sumas['defunciones_fetales'] / nacimientos * 1000).fillna(0),
+        'tasa_mortalidad_neonatal_movil': (sumas['defunciones_neonatales'] / nacimientos * 1000).fillna(0),
+        'presion_obstetrica_movil': (sumas['total_defunciones'] / nacimientos * 1000).fillna(0),
+    }, index=df_periodo.index)
+    return pd.concat([df_periodo, moviles], axis=1)
+
+def agregar_ventanas_moviles(features, estado=None):
+    """Procesa todos los periodos en orden con la misma actualización incremental"""
+    if estado is None:
+        estado = iniciar_ventanas(VENTANA_MOVIL[GRANULARIDAD])
+    ordinal = ordinal_periodo(features)
+    
+    resultado = [procesar_periodo_nuevo(estado, df_periodo) for _, df_periodo in features.groupby(ordinal, sort=True)]
+    return pd.concat(resultado).sort_index(), estado
+
+def archivo_ventanas(granularidad):
+    return f'{DATA_DIR}ventanas_{granularidad}.pkl'
+
+def guardar_ventanas(estado, granularidad):
+    archivo = archivo_ventanas(granularidad)
+    with open(archivo, 'wb') as f:
+        pickle.dump(estado, f)
+    return archivo
+
+def cargar_ventanas(granularidad):
+    """Estado guardado por la última corrida (claves normalizadas: los primeros estados guardaban COD_DPTO como texto)"""
+    with open(archivo_ventanas(granularidad), 'rb') as f:
+        estado = pickle.load(f)
+    if estado['granularidad'] != granularidad:
+        raise ValueError(f"El estado de {archivo_ventanas(granularidad)} es de granularidad {estado['granularidad']}")
+    estado['municipios'] = indice_municipios(estado['municipios'].to_frame(index=False))
+    return estado
+
+def actualizar_periodos(archivo_periodos, granularidad):
+    """
+    Actualización incremental (p. ej. al llegar un mes): agrega las tasas
+    móviles a las features de los periodos nuevos con el estado guardado, las
+    anexa a la tabla sub-anual y guarda el estado avanzado.
+    
+    archivo_periodos: features de los periodos nuevos con las mismas columnas
+    que la tabla (generadas con la misma granularidad).
+    """
+    configurar_granularidad(granularidad)
+    output_file = archivo_salida(granularidad)
+    estado = cargar_ventanas(granularidad)
+    
+    nuevos, estado = agregar_ventanas_moviles(leer_tabla(archivo_periodos), estado)
+    features = pd.concat([leer_tabla(output_file), compactar_tipos(nuevos)], ignore_index=True)
+    features[CLAVE] = features[CLAVE].apply(pd.to_numeric)
+    guardar_tabla(features, output_file, 'features.py', particiones=PARTICIONES)
+    guardar_ventanas(estado, granularidad)
+    
+    print(f"  → {len(nuevos)} filas nuevas ({nuevos['ANO'].min()}-{nuevos['ANO'].max()}) anexadas a {output_file}")
+    print(f"  → {len(estado['municipios'])} municipios en la ventana; estado en {archivo_ventanas(granularidad)}")
+    return features
 
 # ============================================================================
 # FUNCIÓN PRINCIPAL
 # ============================================================================
 
-def main():
-    """Función principal que orquesta la generación de features"""
+def combinar_features(df_nac, df_def_fet, df_def_nofet, df_inst, df_rips, feat_materna=None, flujos=None):
+    """Genera y combina todas las features por municipio-año (sin filtro OMS)"""
     
-    print("=" * 80)
-    print("GENERACIÓN DE FEATURES - ALERTAMATERNA")
-    print("=" * 80)
-    
-    # 1. CARGAR DATOS
-    df_nac = cargar_nacimientos()
-    df_def_fet = cargar_defunciones_fetales()
-    df_def_nofet = cargar_defunciones_no_fetales()
-    df_inst = cargar_instituciones()
-    df_rips = cargar_rips()
+    # 1c. ATRIBUCIÓN: todas las familias usan el mismo municipio (ocurrencia o residencia)
+    principal = 'residencia' if ATRIBUCION == 'residencia' else 'ocurrencia'
+    df_nac_region, df_def_fet_region, df_def_nofet_region = df_nac, df_def_fet, df_def_nofet
+    df_nac, df_def_fet, df_def_nofet = (atribuir(d, principal) for d in (df_nac, df_def_fet, df_def_nofet))
+    df_def_nofet = edades_originales(df_def_nofet)
+    print(f"\nAtribución por {principal}: {len(df_nac):,} nacimientos, "
+          f"{len(df_def_fet) + len(df_def_nofet):,} defunciones de la región")
     
     # 2. GENERAR FEATURES BÁSICAS
     print("\n" + "=" * 80)
@@ -545,66 +981,152 @@ def main():
     
     # Merge secuencial
     features = feat_demograficas
-    features = features.merge(feat_clinicas, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_institucionales, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_acceso, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_socioeconomicas, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_prenatal, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_mortalidad, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_mortalidad_fetal, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_presion, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_evitables, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
-    features = features.merge(feat_alto_riesgo, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
+    features = features.merge(feat_clinicas, on=CLAVE, how='left')
+    features = features.merge(feat_institucionales, on=CLAVE, how='left')
+    features = features.merge(feat_acceso, on=CLAVE, how='left')
+    features = features.merge(feat_socioeconomicas, on=CLAVE, how='left')
+    features = features.merge(feat_prenatal, on=CLAVE, how='left')
+    features = features.merge(feat_mortalidad, on=CLAVE, how='left')
+    features = features.merge(feat_mortalidad_fetal, on=CLAVE, how='left')
+    features = features.merge(feat_presion, on=CLAVE, how='left')
+    features = features.merge(feat_evitables, on=CLAVE, how='left')
+    features = features.merge(feat_alto_riesgo, on=CLAVE, how='left')
+    if feat_materna is not None:
+        features = unir_features_materna(features, feat_materna)
+    if ATRIBUCION == 'ambos':
+        feat_residencia = generar_features_residencia(df_nac_region, df_def_fet_region, edades_originales(df_def_nofet_region))
+        features = features.merge(feat_residencia, on=CLAVE, how='left')
+    if 'CODPTORE' in df_nac_region.columns and 'CODPTORE' in df_def_nofet_region.columns:
+        feat_cohorte = generar_features_mortalidad_cohorte(df_nac_region, df_def_nofet_region)
+        features = features.merge(_alinear_claves(feat_cohorte, features, CLAVE), on=CLAVE, how='left')
+    if flujos is not None:
+        features = unir_features_flujo(features, flujos)
     
     # 5. GENERAR ÍNDICE DE FRAGILIDAD (usa todas las features)
     feat_fragilidad = generar_indice_fragilidad(features)
-    features = features.merge(feat_fragilidad, on=['COD_DPTO', 'COD_MUNIC', 'ANO'], how='left')
+    features = features.merge(feat_fragilidad, on=CLAVE, how='left')
+    
+    return features
+
+def main(granularidad=GRANULARIDAD, atribucion=ATRIBUCION):
+    """Función principal que orquesta la generación de features"""
     
-    # 6. APLICAR FILTRO OMS (≥ 10 nacimientos/año)
-    print("\nAplicando filtro OMS (≥ 10 nacimientos/año)...")
-    features_filtrado = features[features['total_nacimientos'] >= 10].copy()
-    print(f"  → Registros antes del filtro: {len(features)}")
-    print(f"  → Registros después del filtro: {len(features_filtrado)}")
-    print(f"  → Registros excluidos: {len(features) - len(features_filtrado)}")
+    configurar_granularidad(granularidad)
+    configurar_atribucion(atribucion)
+    output_file = archivo_salida(granularidad)
     
-    # 7. GUARDAR ARCHIVO
-    features_filtrado.to_csv(OUTPUT_FILE, index=False)
+    print("=" * 80)
+    print(f"GENERACIÓN DE FEATURES - ALERTAMATERNA (granularidad: {granularidad}, atribución: {atribucion})")
+    print("=" * 80)
+    
+    # 1. CARGAR DATOS
+    df_nac = cargar_nacimientos()
+    df_def_fet = cargar_defunciones_fetales()
+    df_def_nofet = cargar_defunciones_no_fetales()
+    df_inst = cargar_instituciones()
+    df_rips = cargar_rips()
+    
+    # 1b. TRACK NACIONAL DE MORTALIDAD MATERNA (todos los municipios DIVIPOLA)
+    feat_materna = None
+    if os.path.exists(MORTALIDAD_MATERNA_FILE):
+        feat_materna = generar_features_mortalidad_materna()
+        archivo_materna = os.path.join(os.path.dirname(output_file), 'features_materna_nacional'
+                                       + ('.csv' if granularidad == 'anio' else f'_{granularidad}.csv.gz'))
+        print(f"  → Tabla nacional: {guardar_tabla(feat_materna, archivo_materna, 'features.py')}")
+    else:
+        print(f"\n⚠️  {MORTALIDAD_MATERNA_FILE} no encontrado: se omiten las features de mortalidad materna")
+    
+    # 1c. FLUJOS RESIDENCIA → OCURRENCIA (matrices dispersas por año)
+    flujos = matrices_flujo(pd.concat([eventos_flujo(d) for d in (df_nac, df_def_fet, df_def_nofet)], ignore_index=True))
+    directorio_flujos = guardar_flujos(flujos, os.path.join(os.path.dirname(output_file), 'flujos'))
+    pares = sum(m.nnz for m in flujos['matrices'].values())
+    print(f"\nFlujos residencia → ocurrencia: {pares:,} pares municipio-año en {directorio_flujos}")
+    
+    # 2-5. GENERAR Y COMBINAR FEATURES
+    features = combinar_features(df_nac, df_def_fet, df_def_nofet, df_inst, df_rips, feat_materna, flujos)
+    
+    # 5b. INTERVALOS DE CONFIANZA DE LAS TASAS (exactos Poisson/binomial)
+    print("\nCalculando intervalos de confianza de las tasas (95%)...")
+    features = agregar_intervalos(features)
+    ancho = features['tasa_mortalidad_fetal_ci_high'] - features['tasa_mortalidad_fetal_ci_low']
+    pequenos = features['total_nacimientos'] < 10
+    print(f"  → Ancho medio IC mortalidad fetal: {ancho[~pequenos].mean():.1f}‰ (≥10 nacimientos), "
+          f"{ancho[pequenos].mean():.1f}‰ (<10 nacimientos)")
+    
+    # 6. SUAVIZADO EMPÍRICO-BAYESIANO (reemplaza el descarte por filtro OMS)
+    print(f"\nSuavizando tasas hacia el prior {'espacial' if SUAVIZADO_ESPACIAL else 'departamental'}...")
+    features = agregar_tasas_suavizadas(features, espacial=SUAVIZADO_ESPACIAL, columnas_periodo=CLAVE[2:])
+    print(f"  → Registros con < 10 nacimientos conservados: {pequenos.sum()} de {len(features)}")
+    print(f"  → Mortalidad fetal media (<10 nacimientos): "
+          f"{features.loc[pequenos, 'tasa_mortalidad_fetal'].mean():.1f}‰ bruta, "
+          f"{features.loc[pequenos, 'tasa_mortalidad_fetal_suavizada'].mean():.1f}‰ suavizada")
+    
+    # 6b. VENTANAS MÓVILES Y TIPOS COMPACTOS (solo granularidad sub-anual)
+    if granularidad != 'anio':
+        print(f"\nCalculando ventanas móviles de {VENTANA_MOVIL[granularidad]} periodos...")
+        features, estado_ventanas = agregar_ventanas_moviles(features)
+        features = compactar_tipos(features)
+        
+        # Estado de la ventana para procesar el próximo periodo sin recalcular (--periodo-nuevo)
+        archivo = guardar_ventanas(estado_ventanas, granularidad)
+        print(f"  → {len(estado_ventanas['municipios'])} municipios en la ventana; estado en {archivo}")
+        print(f"  → Memoria de la tabla: {features.memory_usage(deep=True).sum() / 1024 ** 2:.1f} MB")
+    
+    # 7. GUARDAR ARCHIVO (claves numéricas, como siempre las leyeron los consumidores del CSV)
+    features[CLAVE] = features[CLAVE].apply(pd.to_numeric)
+    guardar_tabla(features, output_file, 'features.py', particiones=PARTICIONES)
+    
+    # 7b. ALMACÉN DE FEATURES (solo la tabla anual, la que usan los modelos)
+    if granularidad == 'anio':
+        store_dir = os.path.join(os.path.dirname(output_file), 'feature_store')
+        print(f"\nAlmacén de features materializado en: {materializar(features, store_dir=store_dir)}")
     
     # 8. RESUMEN FINAL
     print("\n" + "=" * 80)
     print("RESUMEN FINAL")
     print("=" * 80)
-    print(f"Total de registros: {len(features_filtrado)}")
-    print(f"Total de features: {len(features_filtrado.columns) - 3}")  # Excluyendo COD_DPTO, COD_MUNIC, ANO
-    print(f"Años: {sorted(features_filtrado['ANO'].unique())}")
-    print(f"Departamentos: {sorted(features_filtrado['COD_DPTO'].unique())}")
-    print(f"Municipios únicos: {features_filtrado['COD_MUNIC'].nunique()}")
-    print(f"\nArchivo guardado en: {OUTPUT_FILE}")
+    print(f"Total de registros: {len(features)}")
+    print(f"Total de features: {len(features.columns) - 3}")  # Excluyendo COD_DPTO, COD_MUNIC, ANO
+    print(f"Años: {sorted(features['ANO'].unique())}")
+    print(f"Departamentos: {sorted(features['COD_DPTO'].unique())}")
+    print(f"Municipios únicos: {features['COD_MUNIC'].nunique()}")
+    print(f"\nArchivo guardado en: {ruta_parquet(output_file)} (exportación CSV: {output_file})")
     
     # Estadísticas clave
     print("\n" + "=" * 80)
     print("ESTADÍSTICAS CLAVE")
     print("=" * 80)
     print(f"\n📊 Mortalidad Neonatal:")
-    print(f"   Media: {features_filtrado['tasa_mortalidad_neonatal'].mean():.2f} por 1000 nacidos vivos")
-    print(f"   Rango: {features_filtrado['tasa_mortalidad_neonatal'].min():.2f} - {features_filtrado['tasa_mortalidad_neonatal'].max():.2f}")
-    print(f"   Municipios con tasa >15: {(features_filtrado['tasa_mortalidad_neonatal'] > 15).sum()}")
+    print(f"   Media: {features['tasa_mortalidad_neonatal'].mean():.2f} por 1000 nacidos vivos")
+    print(f"   Rango: {features['tasa_mortalidad_neonatal'].min():.2f} - {features['tasa_mortalidad_neonatal'].max():.2f}")
+    print(f"   Municipios con tasa >15: {(features['tasa_mortalidad_neonatal'] > 15).sum()}")
     
     print(f"\n📊 Mortalidad Evitable:")
-    print(f"   Media: {features_filtrado['pct_mortalidad_evitable'].mean():.1f}%")
-    print(f"   Municipios con >50% evitable: {(features_filtrado['pct_mortalidad_evitable'] > 50).sum()}")
+    print(f"   Media: {features['pct_mortalidad_evitable'].mean():.1f}%")
+    print(f"   Municipios con >50% evitable: {(features['pct_mortalidad_evitable'] > 50).sum()}")
     
     print(f"\n📊 Embarazos Alto Riesgo:")
-    print(f"   Media: {features_filtrado['pct_embarazos_alto_riesgo'].mean():.1f}%")
-    print(f"   Municipios con >30% alto riesgo: {(features_filtrado['pct_embarazos_alto_riesgo'] > 30).sum()}")
+    print(f"   Media: {features['pct_embarazos_alto_riesgo'].mean():.1f}%")
+    print(f"   Municipios con >30% alto riesgo: {(features['pct_embarazos_alto_riesgo'] > 30).sum()}")
     
     print(f"\n📊 Índice de Fragilidad:")
-    print(f"   Media: {features_filtrado['indice_fragilidad_sistema'].mean():.1f}")
-    print(f"   Municipios críticos (>80): {(features_filtrado['indice_fragilidad_sistema'] > 80).sum()}")
+    print(f"   Media: {features['indice_fragilidad_sistema'].mean():.1f}")
+    print(f"   Municipios críticos (>80): {(features['indice_fragilidad_sistema'] > 80).sum()}")
     
     print("\n✅ Proceso completado exitosamente!")
     print("\nPrimeras filas:")
-    print(features_filtrado.head())
+    print(features.head())
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Generación de features AlertaMaterna')
+    parser.add_argument('--granularidad', choices=list(PERIODOS), default=GRANULARIDAD)
+    parser.add_argument('--atribucion', choices=ATRIBUCIONES, default=ATRIBUCION)
+    parser.add_argument('--periodo-nuevo', metavar='ARCHIVO',
+                        help='Features de periodos nuevos: actualiza las ventanas móviles sin recalcular (trimestre/mes)')
+    args = parser.parse_args()
+    if args.periodo_nuevo:
+        if args.granularidad == 'anio':
+            parser.error('--periodo-nuevo requiere --granularidad trimestre o mes')
+        actualizar_periodos(args.periodo_nuevo, args.granularidad)
+    else:
+        main(args.granularidad, args.atribucion)
@@ -0,0 +1,137 @@
+"""
+Flujos de pacientes residencia → ocurrencia entre municipios.
+
+Cada nacimiento y cada defunción registra dónde ocurrió (COD_DPTO/COD_MUNIC) y
+dónde residía la madre (CODPTORE/CODMUNRE). Los nacimientos son la mayor parte
+de los eventos: dónde se atiende el parto es el flujo de referencia obstétrica.
+Por año se arma una matriz dispersa municipio de
+residencia × municipio de ocurrencia (scipy.sparse CSR): con ~1.100 municipios
+DIVIPOLA la matriz densa tendría 1,2 millones de celdas por año, pero solo
+unos pocos miles de pares tienen eventos.
+
+    data/processed/flujos/
+        municipios.npy        int64: ID_MUNICIPIO (DIVIPOLA 5 dígitos) de cada fila/columna
+        flujo_{año}.npz       CSR (residencia, ocurrencia) con el conteo de eventos
+
+features_flujo() deriva, por municipio-año:
+    pct_salida_residentes       % de eventos de residentes ocurridos en otro municipio
+    pct_atencion_no_residentes  % de eventos atendidos que son de no residentes (centros de referencia)
+    pct_destino_principal       % de eventos de residentes que van al principal municipio de destino
+    num_municipios_origen       municipios de residencia distintos que envían eventos
+
+Proyecto: AlertaMaterna
+"""
+
+import glob
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from almacen_features import id_municipio
+from suavizado import cargar_coordenadas_municipios
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'processed')
+FLUJOS_DIR = os.path.join(DATA_DIR, 'flujos')
+
+# ============================================================================
+# CONSTRUCCIÓN
+# ============================================================================
+
+def eventos_flujo(df):
+    """(ID_RESIDENCIA, ID_OCURRENCIA, ANO) de los registros con ambos municipios conocidos"""
+    conocidos = df[['CODPTORE', 'CODMUNRE', 'COD_DPTO', 'COD_MUNIC', 'ANO']].apply(
+        pd.to_numeric, errors='coerce').dropna()
+    return pd.DataFrame({
+        'ID_RESIDENCIA': id_municipio(conocidos['CODPTORE'], conocidos['CODMUNRE']),
+        'ID_OCURRENCIA': id_municipio(conocidos['COD_DPTO'], conocidos['COD_MUNIC']),
+        'ANO': conocidos['ANO'].astype(np.int64).to_numpy(),
+    })
+
+def matrices_flujo(eventos):
+    """
+    Una matriz CSR residencia × ocurrencia por año.
+
+    Filas y columnas: municipios DIVIPOLA más cualquier código observado fuera
+    de la división (ids ordenados, índice por searchsorted).
+    """
+    divipola = cargar_coordenadas_municipios()
+    ids = np.union1d(id_municipio(divipola['COD_DPTO'], divipola['COD_MUNIC']),
+                     np.concatenate([eventos['ID_RESIDENCIA'], eventos['ID_OCURRENCIA']]))
+
+    filas = np.searchsorted(ids, eventos['ID_RESIDENCIA'].to_numpy())
+    columnas = np.searchsorted(ids, eventos['ID_OCURRENCIA'].to_numpy())
+    anios = eventos['ANO'].to_numpy()
+
+    matrices = {}
+    for anio in np.unique(anios):
+        en_anio = anios == anio
+        # coo -> csr suma los pares repetidos: cada celda es el conteo de eventos
+        matrices[int(anio)] = sparse.coo_matrix(
+            (np.ones(en_anio.sum(), dtype=np.int32), (filas[en_anio], columnas[en_anio])),
+            shape=(len(ids), len(ids)),
+        ).tocsr()
+    return {'municipios': ids, 'matrices': matrices}
+
+# ============================================================================
+# FEATURES
+# ============================================================================
+
+def features_flujo(flujos):
+    """Features de salida y dependencia de referencia por municipio-año (solo municipios con eventos)"""
+    ids = flujos['municipios']
+    tablas = []
+    for anio, matriz in sorted(flujos['matrices'].items()):
+        propios = matriz.diagonal().astype(np.float64)
+        residentes = np.asarray(matriz.sum(axis=1)).ravel().astype(np.float64)
+        atendidos = np.asarray(matriz.sum(axis=0)).ravel().astype(np.float64)
+
+        externos = (matriz - sparse.diags(matriz.diagonal())).tocsr()
+        externos.eliminate_zeros()
+        destino_principal = externos.max(axis=1).toarray().ravel()
+        origenes = np.diff(externos.tocsc().indptr)
+
+        con_eventos = (residentes > 0) | (atendidos > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tablas.append(pd.DataFrame({
+                'ID_MUNICIPIO': ids[con_eventos],
+                'ANO': anio,
+                'pct_salida_residentes': np.nan_to_num((residentes - propios) / residentes * 100)[con_eventos],
+                'pct_atencion_no_residentes': np.nan_to_num((atendidos - propios) / atendidos * 100)[con_eventos],
+                'pct_destino_principal': np.nan_to_num(destino_principal / residentes * 100)[con_eventos],
+                'num_municipios_origen': origenes[con_eventos],
+            }))
+    return pd.concat(tablas, ignore_index=True)
+
+# ============================================================================
+# PERSISTENCIA
+# ============================================================================
+
+def guardar_flujos(flujos, directorio=FLUJOS_DIR):
+    """
+    Guarda el índice de municipios y una matriz .npz por año. Se escribe aparte y
+    reemplaza al directorio anterior al final: no quedan años de una corrida previa.
+    """
+    temporal = f'{directorio}.tmp'
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    np.save(os.path.join(temporal, 'municipios.npy'), flujos['municipios'])
+    for anio, matriz in flujos['matrices'].items():
+        sparse.save_npz(os.path.join(temporal, f'flujo_{anio}.npz'), matriz)
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.replace(temporal, directorio)
+    return directorio
+
+def cargar_flujos(directorio=FLUJOS_DIR):
+    """Inverso de guardar_flujos"""
+    matrices = {}
+    for ruta in sorted(glob.glob(os.path.join(directorio, 'flujo_*.npz'))):
+        anio = int(os.path.basename(ruta)[len('flujo_'):-len('.npz')])
+        matrices[anio] = sparse.load_npz(ruta).tocsr()
+    return {'municipios': np.load(os.path.join(directorio, 'municipios.npy')), 'matrices': matrices}
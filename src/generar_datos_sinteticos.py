@@ -0,0 +1,505 @@
+"""
+Generador de datos sintéticos con los esquemas DANE/REPS/RIPS que espera features.py.
+
+Permite reproducir el pipeline sin los archivos nacionales (que no están en el
+repositorio) y hacer pruebas de carga: se parametriza por departamentos, años y
+volumen, y escribe por bloques (streaming), por lo que produce 50M+ registros
+con memoria acotada por `chunksize`.
+
+Modelo de generación:
+- Nacimientos repartidos (multinomial) en celdas municipio de residencia × año;
+  el tamaño municipal sigue una log-normal y las capitales (COD_MUNIC=1) son mayores.
+- Una fracción de los eventos ocurre en la capital del departamento
+  (COD_DPTO/COD_MUNIC = ocurrencia, CODPTORE/CODMUNRE = residencia).
+- Defunciones fetales y no fetales: Poisson por celda con riesgo municipal gamma;
+  muertes maternas (track nacional): Poisson con una razón fija por nacimiento.
+- Columnas codificadas muestreadas de los diccionarios DANE (codigos_*_dane.csv)
+  o de distribuciones explícitas cuando importan para las features.
+
+Las distribuciones son plausibles, no reales.
+
+Uso (desde src/):
+    python generar_datos_sinteticos.py --nacimientos 20000000 --todos
+    python generar_datos_sinteticos.py --dptos 50 81 --anios 2022 2024 --nacimientos 500000
+
+Proyecto: AlertaMaterna
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from diccionario_codigos import diccionario_por_fuente
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'processed')
+DIVIPOLA_FILE = os.path.join(DATA_DIR, 'DIVIPOLA-_Códigos_municipios_20251128.csv')
+SALIDA_DIR = os.path.join(DATA_DIR, '..', 'sinteticos')
+
+DPTOS_ORINOQUIA = [50, 81, 85, 95, 99]
+ANIOS = list(range(2020, 2025))
+CHUNKSIZE = 250_000
+
+# Nombres de archivo iguales a los de features.py
+ARCHIVOS = {
+    'nacimientos': 'nacimientos_2020_2024.csv',
+    'defunciones_fetales': 'defunciones_fetales_2020_2024.csv',
+    'defunciones_no_fetales': 'defunciones_no_fetales_2020_2024.csv',
+    'reps': 'Registro_Especial_de_Prestadores_y_Sedes_de_Servicios_de_Salud_20251120.csv',
+    'rips': 'Registros_Individuales_de_Prestación_de_Servicios_de_Salud_–_RIPS_20251204.csv',
+    'mortalidad_materna': 'mortalidad_materna_2020_2024_nacional.csv',
+}
+
+# Esquemas de columnas (mismo orden que los archivos DANE procesados)
+ESQUEMAS = {
+    'nacimientos': [
+        'COD_DPTO', 'COD_MUNIC', 'AREANAC', 'SIT_PARTO', 'OTRO_SIT', 'SEXO', 'PESO_NAC', 'TALLA_NAC',
+        'ANO', 'MES', 'ATEN_PAR', 'T_GES', 'NUMCONSUL', 'TIPO_PARTO', 'MUL_PARTO', 'APGAR1', 'APGAR2',
+        'IDHEMOCLAS', 'IDFACTORRH', 'IDPERTET', 'EDAD_MADRE', 'EST_CIVM', 'NIV_EDUM', 'ULTCURMAD',
+        'CODPRES', 'CODPTORE', 'CODMUNRE', 'AREA_RES', 'N_HIJOSV', 'N_HIJOSM', 'N_EMB', 'EDAD_PADRE',
+        'NIV_EDUP', 'ULTCURPAD', 'PROFESION', 'SEG_SOCIAL', 'IDCLASADMI', 'CODPAISNACMAD',
+    ],
+    'defunciones_fetales': [
+        'COD_DPTO', 'COD_MUNIC', 'A_DEFUN', 'SIT_DEFUN', 'OTRSITIODE', 'TIPO_DEFUN', 'ANO', 'MES', 'HORA',
+        'MINUTOS', 'SEXO', 'CODPRES', 'CODPTORE', 'CODMUNRE', 'AREA_RES', 'SEG_SOCIAL', 'IDADMISALUD',
+        'P_PMAN_IRIS', 'CONS_EXP', 'MU_PARTO', 'T_PARTO', 'TIPO_EMB', 'T_GES', 'PESO_NAC', 'EDAD_MADRE',
+        'N_HIJOSV', 'N_HIJOSM', 'EST_CIVM', 'NIV_EDUM', 'ULTCURMAD', 'CODOCUR', 'CODMUNOC', 'C_MUERTE',
+        'C_MUERTEB', 'C_MUERTEC', 'C_MUERTED', 'C_MUERTEE', 'ASIS_MED', 'CAUSA_MULT', 'C_BAS1',
+        'CAUSA_667', 'IDPROFCER', 'CAU_HOMOL', 'T_GES_AGRU_CIE', 'C_MUERTEF', 'C_MUERTEG',
+        'CODPAISNACMAD', 'REGSOCIALMADRE',
+    ],
+    'defunciones_no_fetales': [
+        'COD_DPTO', 'COD_MUNIC', 'A_DEFUN', 'SIT_DEFUN', 'OTRSITIODE', 'TIPO_DEFUN', 'ANO', 'MES', 'HORA',
+        'MINUTOS', 'SEXO', 'EST_CIVIL', 'GRU_ED1', 'GRU_ED2', 'NIVEL_EDU', 'ULTCURFAL', 'MUERTEPORO',
+        'SIMUERTEPO', 'OCUPACION', 'IDPERTET', 'CODPRES', 'CODPTORE', 'CODMUNRE', 'AREA_RES', 'SEG_SOCIAL',
+        'IDADMISALUD', 'P_PMAN_IRIS', 'CONS_EXP', 'MU_PARTO', 'T_PARTO', 'TIPO_EMB', 'T_GES', 'PESO_NAC',
+        'EDAD_MADRE', 'N_HIJOSV', 'N_HIJOSM', 'EST_CIVM', 'NIV_EDUM', 'ULTCURMAD', 'EMB_FAL', 'EMB_SEM',
+        'EMB_MES', 'CODOCUR', 'CODMUNOC', 'C_MUERTE', 'C_MUERTEB', 'C_MUERTEC', 'C_MUERTED', 'C_MUERTEE',
+        'ASIS_MED', 'CAUSA_MULT', 'C_BAS1', 'CAUSA_667', 'IDPROFCER', 'CAU_HOMOL', 'T_GES_AGRU_CIE',
+        'TIPOFORMULARIO', 'C_MUERTEF', 'C_MUERTEG', 'CODPAISNACFAL', 'CODPAISNACMAD', 'REGSOCIALMADRE',
+    ],
+    'reps': [
+        'CodigoHabilitacionSede', 'NumeroSede', 'NombreSede', 'NombrePrestador', 'COD_DEP',
+        'DepartamentoSedeDesc', 'COD_MUN', 'MunicipioSedeDesc', 'NaturalezaJuridica', 'ClasePrestador', 'ESE',
+    ],
+    'rips': [
+        'COD_DEP', 'Departamento', 'COD_MUN', 'Municipio', 'ANO', 'TipoAtencion', 'Sexo',
+        'NumeroAtenciones', 'NumeroPersonas',
+    ],
+}
+# Las muertes maternas vienen en el mismo certificado de defunción no fetal
+ESQUEMAS['mortalidad_materna'] = ESQUEMAS['defunciones_no_fetales']
+
+# Distribuciones explícitas {código: probabilidad}; tienen prioridad sobre los diccionarios
+DISTRIBUCIONES = {
+    'EDAD_MADRE': {1: 0.005, 2: 0.17, 3: 0.30, 4: 0.25, 5: 0.16, 6: 0.09, 7: 0.02, 8: 0.003, 99: 0.002},
+    'PESO_NAC': {1: 0.002, 2: 0.005, 3: 0.008, 4: 0.015, 5: 0.06, 6: 0.22, 7: 0.38, 8: 0.24, 9: 0.07},
+    'T_GES': {1: 0.002, 2: 0.006, 3: 0.012, 4: 0.09, 5: 0.87, 6: 0.01, 99: 0.01},
+    'MUL_PARTO': {1: 0.98, 2: 0.019, 3: 0.001},
+    'TIPO_PARTO': {1: 0.52, 2: 0.01, 3: 0.47},
+    'SEG_SOCIAL': {1: 0.35, 2: 0.55, 3: 0.06, 4: 0.02, 5: 0.02},
+    'EST_CIVM': {1: 0.15, 2: 0.15, 3: 0.005, 4: 0.02, 5: 0.66, 9: 0.015},
+    'NIV_EDUM': {1: 0.02, 2: 0.005, 3: 0.15, 4: 0.20, 5: 0.38, 6: 0.12, 7: 0.05, 8: 0.06, 9: 0.01, 99: 0.005},
+    'SEXO': {1: 0.51, 2: 0.49},
+}
+
+# Las defunciones fetales son más prematuras y de menor peso
+DISTRIBUCIONES_TABLA = {
+    'defunciones_fetales': {
+        'T_GES': {1: 0.45, 2: 0.20, 3: 0.10, 4: 0.12, 5: 0.11, 6: 0.01, 99: 0.01},
+        'PESO_NAC': {1: 0.45, 2: 0.18, 3: 0.10, 4: 0.08, 5: 0.07, 6: 0.06, 7: 0.04, 8: 0.015, 9: 0.005},
+        'SEXO': {1: 0.48, 2: 0.44, 3: 0.08},
+    },
+    'defunciones_no_fetales': {
+        # GRU_ED1 1-5: menores de 1 año (~2% de las defunciones no fetales)
+        'GRU_ED1': {
+            1: 0.002, 2: 0.003, 3: 0.005, 4: 0.003, 5: 0.007, 6: 0.003, 7: 0.002, 8: 0.002, 9: 0.005,
+            10: 0.012, 11: 0.020, 12: 0.022, 13: 0.022, 14: 0.024, 15: 0.027, 16: 0.033, 17: 0.042,
+            18: 0.055, 19: 0.070, 20: 0.085, 21: 0.100, 22: 0.110, 23: 0.115, 24: 0.100, 25: 0.070,
+            26: 0.040,
+        },
+        'SEXO': {1: 0.56, 2: 0.44},
+    },
+    'mortalidad_materna': {
+        # GRU_ED1 10-17: 10-49 años
+        'GRU_ED1': {10: 0.01, 11: 0.12, 12: 0.20, 13: 0.20, 14: 0.19, 15: 0.15, 16: 0.10, 17: 0.03},
+        'SEXO': {2: 1.0},
+    },
+}
+
+# CAUSA_667: 401-410 obstétricas directas y 501-506 perinatales (evitables)
+CAUSAS_EVITABLES = list(range(401, 411)) + list(range(501, 507))
+CAUSAS_OTRAS = [101, 201, 301, 601, 612, 615]
+PROB_CAUSA_EVITABLE = 0.45
+
+# Causa básica CIE-10 (C_BAS1)
+CIE10_PERINATAL = ['P018', 'P021', 'P027', 'P209', 'P220', 'P369', 'P964', 'Q249', 'Q899']
+CIE10_GENERAL = ['I219', 'I640', 'J189', 'C169', 'E149', 'X959', 'V892', 'J449', 'I10X', 'K746']
+# Muertes maternas: directas (O00-O95), indirectas (O98-O99) y tardías (O96-O97)
+CIE10_MATERNA = {'O149': 0.20, 'O721': 0.18, 'O85X': 0.10, 'O069': 0.08, 'O882': 0.07, 'O622': 0.05,
+                 'O992': 0.12, 'O994': 0.08, 'O985': 0.04, 'O969': 0.05, 'O97X': 0.03}
+PROB_MATERNA_EXTERNA = 0.03    # Causa 6/67 externa (501-514): fuera de la razón de mortalidad
+
+TASA_FETAL_BASE = 0.015        # Defunciones fetales por nacimiento
+TASA_NO_FETAL_BASE = 0.55      # Defunciones no fetales (todas las edades) por nacimiento
+RAZON_MATERNA_BASE = 0.0008    # Muertes maternas por nacimiento (80 por 100.000)
+PROB_ATENCION_CAPITAL = 0.15   # Eventos que ocurren en la capital del departamento
+TENDENCIA_ANUAL = -0.02        # Variación anual de la natalidad
+
+SEDES_POR_1000_NAC = 4
+TIPOS_ATENCION = ['Consulta', 'Urgencias', 'Procedimiento', 'Hospitalización']
+
+# ============================================================================
+# MUNICIPIOS
+# ============================================================================
+
+def cargar_municipios(n_municipios=None, dptos=None):
+    """
+    Municipios DIVIPOLA reales para la generación.
+
+    Sin argumentos: Orinoquía. Con dptos: esos departamentos. Con n_municipios:
+    primero la Orinoquía y luego el resto del país, hasta completar n_municipios.
+    """
+    df = pd.read_csv(DIVIPOLA_FILE, sep=';', encoding='latin-1', dtype=str)
+    df.columns = ['COD_DPTO', 'NOM_DPTO', 'COD_MUNIC', 'NOMBRE_MUNICIPIO', 'TIPO', 'LONGITUD', 'LATITUD']
+    df['COD_DPTO'] = df['COD_DPTO'].astype(int)
+    df['COD_MUNIC'] = df['COD_MUNIC'].astype(int) % 1000
+    df['NOM_DPTO'] = df['NOM_DPTO'].str.title()
+    df['NOMBRE_MUNICIPIO'] = df['NOMBRE_MUNICIPIO'].str.title()
+
+    if dptos is not None:
+        df = df[df['COD_DPTO'].isin(dptos)]
+    elif n_municipios is None:
+        df = df[df['COD_DPTO'].isin(DPTOS_ORINOQUIA)]
+
+    if n_municipios is not None:
+        df = df.assign(_orden=~df['COD_DPTO'].isin(DPTOS_ORINOQUIA)).sort_values('_orden', kind='stable')
+        df = df.drop(columns='_orden').head(n_municipios)
+
+    df = df.sort_values(['COD_DPTO', 'COD_MUNIC'])
+    return df[['COD_DPTO', 'NOM_DPTO', 'COD_MUNIC', 'NOMBRE_MUNICIPIO']].reset_index(drop=True)
+
+# ============================================================================
+# PLAN DE GENERACIÓN (CELDAS MUNICIPIO × AÑO)
+# ============================================================================
+
+def planificar_celdas(rng, municipios, n_nacimientos, anios=ANIOS):
+    """
+    Reparte los volúmenes en celdas residencia × año (sin generar registros).
+
+    Devuelve un DataFrame con una fila por celda y los conteos de nacimientos,
+    defunciones fetales, no fetales y maternas, y el índice del municipio de atención
+    (capital del departamento) de cada celda.
+    """
+    n_mun = len(municipios)
+    pesos = rng.lognormal(mean=0.0, sigma=1.5, size=n_mun)
+    pesos[municipios['COD_MUNIC'].to_numpy() == 1] *= 5
+
+    # Capital = municipio 1 del departamento (o el de mayor peso si no existe)
+    capital = (
+        municipios.assign(peso=pesos, es_capital=municipios['COD_MUNIC'] == 1, idx=np.arange(n_mun))
+        .sort_values(['es_capital', 'peso'], ascending=False)
+        .groupby('COD_DPTO')['idx'].first()
+    )
+
+    factor_anio = (1 + TENDENCIA_ANUAL) ** np.arange(len(anios))
+    probs = np.outer(pesos, factor_anio).ravel()
+    nacimientos = rng.multinomial(n_nacimientos, probs / probs.sum())
+
+    idx_mun = np.repeat(np.arange(n_mun), len(anios))
+    riesgo_fetal = rng.gamma(shape=4.0, scale=TASA_FETAL_BASE / 4.0, size=n_mun)
+    riesgo_no_fetal = rng.gamma(shape=8.0, scale=TASA_NO_FETAL_BASE / 8.0, size=n_mun)
+
+    return pd.DataFrame({
+        'idx_mun': idx_mun,
+        'idx_capital': capital.reindex(municipios['COD_DPTO'].to_numpy()).to_numpy()[idx_mun],
+        'ANO': np.tile(anios, n_mun),
+        'nacimientos': nacimientos,
+        'defunciones_fetales': rng.poisson(nacimientos * riesgo_fetal[idx_mun]),
+        'defunciones_no_fetales': rng.poisson(nacimientos * riesgo_no_fetal[idx_mun]),
+        'mortalidad_materna': rng.poisson(nacimientos * RAZON_MATERNA_BASE),
+    })
+
+def iterar_bloques(celdas, conteo, chunksize=CHUNKSIZE):
+    """
+    Bloques de chunksize registros (el último, de menos) sobre las celdas en
+    orden: una celda más grande que chunksize se reparte entre bloques
+    consecutivos, con el conteo de cada parte en la columna `conteo`.
+    """
+    fin = celdas[conteo].cumsum().to_numpy()
+    inicio = fin - celdas[conteo].to_numpy()
+    total = int(fin[-1]) if len(fin) else 0
+    for desde in range(0, total, chunksize):
+        hasta = desde + chunksize
+        # Celdas que se solapan con los registros [desde, hasta)
+        i = np.searchsorted(fin, desde, side='right')
+        j = np.searchsorted(inicio, hasta, side='left')
+        bloque = celdas.iloc[i:j].copy()
+        bloque[conteo] = np.minimum(fin[i:j], hasta) - np.maximum(inicio[i:j], desde)
+        yield bloque[bloque[conteo] > 0]
+
+# ============================================================================
+# GENERACIÓN DE COLUMNAS
+# ============================================================================
+
+def _muestrear(rng, distribucion, n):
+    """Muestra n códigos de una distribución {código: probabilidad}"""
+    codigos = np.array(list(distribucion.keys()))
+    probs = np.array(list(distribucion.values()), dtype=float)
+    return codigos[rng.choice(len(codigos), size=n, p=probs / probs.sum())]
+
+def _codigos_diccionario(tabla):
+    """Códigos DANE por variable (enteros cuando son numéricos)"""
+    if tabla == 'mortalidad_materna':
+        tabla = 'defunciones_no_fetales'
+    if tabla not in ('nacimientos', 'defunciones_fetales', 'defunciones_no_fetales'):
+        return {}
+    codigos = {}
+    for variable, entrada in diccionario_por_fuente(tabla).items():
+        numericos = pd.to_numeric(pd.Series(entrada['codigos']), errors='coerce')
+        codigos[variable] = (numericos.astype(int).to_numpy() if numericos.notna().all()
+                             else np.array(entrada['codigos']))
+    return codigos
+
+def _causa_667(rng, n, cols):
+    evitable = rng.random(n) < PROB_CAUSA_EVITABLE
+    return np.where(evitable, rng.choice(CAUSAS_EVITABLES, size=n), rng.choice(CAUSAS_OTRAS, size=n))
+
+def _c_bas1(rng, n, cols):
+    perinatal = rng.choice(CIE10_PERINATAL, size=n)
+    if 'GRU_ED1' not in cols:
+        return perinatal
+    # Menores de 1 año: causas perinatales; resto: causas generales
+    return np.where(cols['GRU_ED1'] <= 5, perinatal, rng.choice(CIE10_GENERAL, size=n))
+
+def _c_bas1_materna(rng, n, cols):
+    return _muestrear(rng, CIE10_MATERNA, n)
+
+def _causa_667_materna(rng, n, cols):
+    externa = rng.random(n) < PROB_MATERNA_EXTERNA
+    return np.where(externa, rng.integers(501, 515, size=n), rng.integers(401, 411, size=n))
+
+def _gru_ed2(rng, n, cols):
+    return np.where(cols['GRU_ED1'] <= 5, 1, np.where(cols['GRU_ED1'] <= 9, 2, 3))
+
+def _apgar1(rng, n, cols):
+    return np.clip(10 - rng.poisson(2, size=n), 0, 10)
+
+def _apgar2(rng, n, cols):
+    return np.clip(cols['APGAR1'] + rng.integers(0, 3, size=n), 0, 10)
+
+def _pais(rng, n, cols):
+    # 170 = Colombia, 862 = Venezuela
+    return np.where(rng.random(n) < 0.05, 862, 170)
+
+# Columnas con generador propio: columna -> función(rng, n, columnas_generadas).
+# El orden importa: cada generador puede usar columnas de los anteriores.
+ESPECIALES = {
+    'NUMCONSUL': lambda rng, n, cols: np.where(rng.random(n) < 0.02, 99, rng.poisson(6, size=n)),
+    'APGAR1': _apgar1,
+    'APGAR2': _apgar2,
+    'N_HIJOSV': lambda rng, n, cols: 1 + rng.poisson(1.0, size=n),
+    'N_HIJOSM': lambda rng, n, cols: rng.poisson(0.05, size=n),
+    'N_EMB': lambda rng, n, cols: cols['N_HIJOSV'] + rng.poisson(0.2, size=n),
+    'EDAD_PADRE': lambda rng, n, cols: np.clip(rng.normal(30, 7, size=n).round(), 15, 80).astype(int),
+    'ULTCURMAD': lambda rng, n, cols: rng.integers(0, 12, size=n),
+    'ULTCURPAD': lambda rng, n, cols: rng.integers(0, 12, size=n),
+    'ULTCURFAL': lambda rng, n, cols: rng.integers(0, 12, size=n),
+    'HORA': lambda rng, n, cols: rng.integers(0, 24, size=n),
+    'MINUTOS': lambda rng, n, cols: rng.integers(0, 60, size=n),
+    'CODPRES': lambda rng, n, cols: np.full(n, 170),
+    'CODPAISNACMAD': _pais,
+    'CODPAISNACFAL': _pais,
+    'CAUSA_667': _causa_667,
+    'C_BAS1': _c_bas1,
+    'CAUSA_MULT': lambda rng, n, cols: cols['C_BAS1'],
+    'GRU_ED2': _gru_ed2,
+}
+
+# Generadores propios de una tabla (reemplazan al de ESPECIALES en la misma posición)
+ESPECIALES_TABLA = {
+    'mortalidad_materna': {'CAUSA_667': _causa_667_materna, 'C_BAS1': _c_bas1_materna},
+}
+
+def generar_registros(rng, bloque, conteo, municipios, tabla, codigos_dic):
+    """
+    Registros de un bloque de celdas con el esquema completo de la tabla.
+
+    Prioridad por columna: ubicación/año > generador especial > distribución
+    explícita > diccionario DANE (uniforme) > vacío.
+    """
+    filas = np.repeat(np.arange(len(bloque)), bloque[conteo].to_numpy())
+    n = len(filas)
+
+    idx_res = bloque['idx_mun'].to_numpy()[filas]
+    en_capital = rng.random(n) < PROB_ATENCION_CAPITAL
+    idx_ocu = np.where(en_capital, bloque['idx_capital'].to_numpy()[filas], idx_res)
+
+    cols = {
+        'COD_DPTO': municipios['COD_DPTO'].to_numpy()[idx_ocu],
+        'COD_MUNIC': municipios['COD_MUNIC'].to_numpy()[idx_ocu],
+        'ANO': bloque['ANO'].to_numpy()[filas],
+        'CODPTORE': municipios['COD_DPTO'].to_numpy()[idx_res],
+        'CODMUNRE': municipios['COD_MUNIC'].to_numpy()[idx_res],
+        'MES': rng.integers(1, 13, size=n),
+    }
+
+    distribuciones = {**DISTRIBUCIONES, **DISTRIBUCIONES_TABLA.get(tabla, {})}
+    especiales = {**ESPECIALES, **ESPECIALES_TABLA.get(tabla, {})}
+    for col in ESQUEMAS[tabla]:
+        if col in cols or col in especiales:
+            continue
+        if col in distribuciones:
+            cols[col] = _muestrear(rng, distribuciones[col], n)
+        elif col in codigos_dic:
+            cols[col] = codigos_dic[col][rng.integers(0, len(codigos_dic[col]), size=n)]
+        else:
+            cols[col] = np.full(n, np.nan)
+
+    # Los especiales van después, en el orden de ESPECIALES (pueden depender de otras columnas)
+    for col, generador in especiales.items():
+        if col in ESQUEMAS[tabla]:
+            cols[col] = generador(rng, n, cols)
+
+    return pd.DataFrame({col: cols[col] for col in ESQUEMAS[tabla]})
+
+def escribir_tabla_streaming(rng, celdas, municipios, tabla, archivo, chunksize=CHUNKSIZE):
+    """Genera y escribe una tabla bloque a bloque; devuelve el total de registros"""
+    codigos_dic = _codigos_diccionario(tabla)
+    total = 0
+    for i, bloque in enumerate(iterar_bloques(celdas, tabla, chunksize)):
+        df = generar_registros(rng, bloque, tabla, municipios, tabla, codigos_dic)
+        df.to_csv(archivo, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+        total += len(df)
+        if sys.stdout.isatty():
+            print(f"  → {tabla}: {total:,} registros", end='\r', flush=True)
+
+    if total == 0:
+        pd.DataFrame(columns=ESQUEMAS[tabla]).to_csv(archivo, index=False)
+    print(f"  → {tabla}: {total:,} registros")
+    return total
+
+# ============================================================================
+# REPS Y RIPS (AGREGADOS, CABEN EN MEMORIA)
+# ============================================================================
+
+def generar_reps(rng, municipios, celdas):
+    """Sedes de prestadores (REPS) por municipio"""
+    n_anios = celdas['ANO'].nunique()
+    nac_mun = celdas.groupby('idx_mun')['nacimientos'].sum().reindex(range(len(municipios)), fill_value=0)
+    n_sedes = 1 + rng.poisson(nac_mun.to_numpy() / n_anios / 1000 * SEDES_POR_1000_NAC)
+    idx = np.repeat(np.arange(len(municipios)), n_sedes)
+    cod_mun_completo = municipios['COD_DPTO'].to_numpy()[idx] * 1000 + municipios['COD_MUNIC'].to_numpy()[idx]
+    naturaleza = _muestrear(rng, {'Pública': 0.3, 'Privada': 0.65, 'Mixta': 0.05}, len(idx))
+
+    return pd.DataFrame({
+        'CodigoHabilitacionSede': [f'{c:05d}{i:05d}' for c, i in zip(cod_mun_completo, range(len(idx)))],
+        'NumeroSede': rng.integers(1, 10, size=len(idx)),
+        'NombreSede': [f'SEDE {i:07d}' for i in range(len(idx))],
+        'NombrePrestador': [f'PRESTADOR {i // 3:07d}' for i in range(len(idx))],
+        'COD_DEP': municipios['COD_DPTO'].to_numpy()[idx],
+        'DepartamentoSedeDesc': municipios['NOM_DPTO'].to_numpy()[idx],
+        'COD_MUN': municipios['COD_MUNIC'].to_numpy()[idx],
+        'MunicipioSedeDesc': municipios['NOMBRE_MUNICIPIO'].to_numpy()[idx],
+        'NaturalezaJuridica': naturaleza,
+        'ClasePrestador': _muestrear(rng, {'Instituciones Prestadoras de Servicios de Salud - IPS': 0.6,
+                                           'Profesional Independiente': 0.35,
+                                           'Objeto Social Diferente a la Prestación de Servicios de Salud': 0.05},
+                                     len(idx)),
+        'ESE': np.where(naturaleza == 'Pública', 'SI', 'NO'),
+    })
+
+def generar_rips(rng, municipios, celdas):
+    """Atenciones (RIPS) por municipio-año, tipo de atención y sexo"""
+    n = len(celdas)
+    combinaciones = [(tipo, sexo) for tipo in TIPOS_ATENCION for sexo in ['F', 'M']]
+    idx = np.repeat(np.arange(n), len(combinaciones))
+    tipos = np.tile([t for t, _ in combinaciones], n)
+    sexos = np.tile([s for _, s in combinaciones], n)
+    idx_mun = celdas['idx_mun'].to_numpy()[idx]
+
+    personas = rng.poisson(celdas['nacimientos'].to_numpy()[idx] * rng.uniform(0.5, 10, size=len(idx)))
+    return pd.DataFrame({
+        'COD_DEP': municipios['COD_DPTO'].to_numpy()[idx_mun],
+        'Departamento': municipios['NOM_DPTO'].to_numpy()[idx_mun],
+        'COD_MUN': municipios['COD_MUNIC'].to_numpy()[idx_mun],
+        'Municipio': municipios['NOMBRE_MUNICIPIO'].to_numpy()[idx_mun],
+        'ANO': celdas['ANO'].to_numpy()[idx],
+        'TipoAtencion': tipos,
+        'Sexo': sexos,
+        'NumeroAtenciones': personas + rng.poisson(personas * 0.8),
+        'NumeroPersonas': personas,
+    })
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def generar_dataset(directorio, n_nacimientos=10_000, n_municipios=None, anios=ANIOS, semilla=42,
+                    dptos=None, chunksize=CHUNKSIZE, tablas=None):
+    """
+    Genera los archivos de entrada de features.py en `directorio`.
+
+    Nacimientos y defunciones se escriben por bloques de `chunksize` registros;
+    REPS y RIPS son agregados y se escriben de una vez (separador ';', latin1).
+    Devuelve un dict tabla -> ruta del archivo generado.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    municipios = cargar_municipios(n_municipios, dptos)
+    celdas = planificar_celdas(rng, municipios, n_nacimientos, list(anios))
+    tablas = tablas or list(ARCHIVOS)
+
+    print(f"Generando {n_nacimientos:,} nacimientos en {len(municipios)} municipios "
+          f"de {municipios['COD_DPTO'].nunique()} departamentos, años {min(anios)}-{max(anios)}...")
+
+    rutas = {}
+    for tabla in tablas:
+        rutas[tabla] = os.path.join(directorio, ARCHIVOS[tabla])
+        if tabla in ('reps', 'rips'):
+            generador = generar_reps if tabla == 'reps' else generar_rips
+            df = generador(rng, municipios, celdas)
+            df.to_csv(rutas[tabla], index=False, sep=';', encoding='latin1')
+            print(f"  → {tabla}: {len(df):,} registros")
+        else:
+            escribir_tabla_streaming(rng, celdas, municipios, tabla, rutas[tabla], chunksize)
+
+    return rutas
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador de datos sintéticos DANE/REPS/RIPS')
+    parser.add_argument('--nacimientos', type=int, default=100_000, help='Total de nacimientos a generar')
+    parser.add_argument('--dptos', type=int, nargs='+', default=None,
+                        help='Códigos de departamento (por defecto: Orinoquía)')
+    parser.add_argument('--todos', action='store_true', help='Todos los municipios del país')
+    parser.add_argument('--anios', type=int, nargs=2, default=[ANIOS[0], ANIOS[-1]], metavar=('DESDE', 'HASTA'))
+    parser.add_argument('--tablas', nargs='+', choices=list(ARCHIVOS), default=None)
+    parser.add_argument('--directorio', default=SALIDA_DIR)
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("GENERACIÓN DE DATOS SINTÉTICOS - ALERTAMATERNA")
+    print("=" * 80)
+
+    generar_dataset(
+        args.directorio,
+        n_nacimientos=args.nacimientos,
+        n_municipios=10_000 if args.todos else None,
+        anios=range(args.anios[0], args.anios[1] + 1),
+        semilla=args.semilla,
+        dptos=args.dptos,
+        chunksize=args.chunksize,
+        tablas=args.tablas,
+    )
+    print(f"\n✅ Archivos generados en {args.directorio}")
+
+if __name__ == "__main__":
+    main()
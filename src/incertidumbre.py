@@ -0,0 +1,153 @@
+"""
+Intervalos de confianza para las tasas de mortalidad por municipio-año.
+
+Los municipios pequeños tienen tasas muy ruidosas (1 defunción en 12 nacimientos
+= 83‰). En lugar de descartarlos, cada tasa lleva su intervalo:
+- Exacto Poisson (Garwood, chi²) para defunciones fetales por 1000 nacidos vivos
+- Exacto binomial (Clopper-Pearson, beta) para defunciones neonatales, que son
+  un subconjunto de los nacidos vivos
+- Bootstrap paramétrico: todas las réplicas se generan como un solo arreglo
+  NumPy (réplicas × municipios-año), sin ciclos por réplica
+
+Todo está vectorizado sobre todos los municipios-año a la vez.
+
+Proyecto: AlertaMaterna
+"""
+
+import numpy as np
+from scipy import stats
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+NIVEL_CONFIANZA = 0.95
+POR_MIL = 1000
+N_REPLICAS = 10_000
+
+# Máximo de elementos por arreglo de réplicas (~160 MB en int64)
+MAX_ELEMENTOS_BOOTSTRAP = 20_000_000
+
+# Tasa -> (columna de conteo o None si se reconstruye desde la tasa, modelo)
+TASAS_INTERVALO = {
+    'tasa_mortalidad_fetal': ('defunciones_fetales', 'poisson'),
+    'tasa_mortalidad_neonatal': (None, 'binomial'),
+}
+
+SUFIJO_CI_BAJO = '_ci_low'
+SUFIJO_CI_ALTO = '_ci_high'
+
+# ============================================================================
+# INTERVALOS EXACTOS
+# ============================================================================
+
+def intervalo_poisson_exacto(eventos, expuestos, nivel=NIVEL_CONFIANZA, por=POR_MIL):
+    """Intervalo exacto (Garwood) de una tasa Poisson eventos/expuestos × por"""
+    eventos = np.asarray(eventos, dtype=float)
+    expuestos = np.asarray(expuestos, dtype=float)
+    alfa = 1 - nivel
+
+    bajo = np.where(eventos > 0, stats.chi2.ppf(alfa / 2, 2 * eventos) / 2, 0.0)
+    alto = stats.chi2.ppf(1 - alfa / 2, 2 * (eventos + 1)) / 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return bajo / expuestos * por, alto / expuestos * por
+
+def intervalo_binomial_exacto(eventos, expuestos, nivel=NIVEL_CONFIANZA, por=POR_MIL):
+    """Intervalo exacto (Clopper-Pearson) de una proporción eventos/expuestos × por"""
+    eventos = np.asarray(eventos, dtype=float)
+    expuestos = np.asarray(expuestos, dtype=float)
+    alfa = 1 - nivel
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bajo = np.where(eventos > 0, stats.beta.ppf(alfa / 2, eventos, expuestos - eventos + 1), 0.0)
+        alto = np.where(eventos < expuestos, stats.beta.ppf(1 - alfa / 2, eventos + 1, expuestos - eventos), 1.0)
+    return bajo * por, alto * por
+
+# ============================================================================
+# BOOTSTRAP PARAMÉTRICO
+# ============================================================================
+
+def bootstrap_tasas(eventos, expuestos, n_replicas=N_REPLICAS, nivel=NIVEL_CONFIANZA, por=POR_MIL,
+                    modelo='poisson', semilla=42):
+    """
+    Intervalo bootstrap paramétrico de cada tasa.
+
+    Las réplicas de todos los municipios-año se generan en un solo arreglo
+    (n_replicas × n) y los percentiles se toman sobre el eje de réplicas. Solo si
+    el arreglo supera MAX_ELEMENTOS_BOOTSTRAP se procesa por bloques de columnas.
+    Los municipios-año con conteos faltantes (NaN) o negativos quedan con límites NaN.
+    """
+    eventos = np.asarray(eventos, dtype=float)
+    expuestos = np.asarray(expuestos, dtype=float)
+    rng = np.random.default_rng(semilla)
+    alfa = 1 - nivel
+
+    bajo = np.full(len(eventos), np.nan)
+    alto = np.full(len(eventos), np.nan)
+
+    # rng.poisson no acepta NaN y astype(int64) los convierte en basura: solo conteos válidos
+    validos = np.isfinite(eventos) & np.isfinite(expuestos) & (eventos >= 0) & (expuestos >= 0)
+    eventos_validos = eventos[validos]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proporcion = np.nan_to_num(eventos_validos / expuestos[validos])
+    n_expuestos = expuestos[validos].astype(np.int64)
+
+    bajo_validos = np.empty(len(eventos_validos))
+    alto_validos = np.empty(len(eventos_validos))
+    ancho_bloque = max(1, MAX_ELEMENTOS_BOOTSTRAP // n_replicas)
+
+    for inicio in range(0, len(eventos_validos), ancho_bloque):
+        fin = inicio + ancho_bloque
+        if modelo == 'binomial':
+            replicas = rng.binomial(n_expuestos[inicio:fin], np.clip(proporcion[inicio:fin], 0, 1),
+                                    size=(n_replicas, len(proporcion[inicio:fin])))
+        else:
+            replicas = rng.poisson(eventos_validos[inicio:fin], size=(n_replicas, len(eventos_validos[inicio:fin])))
+
+        percentiles = np.percentile(replicas, [alfa / 2 * 100, (1 - alfa / 2) * 100], axis=0)
+        bajo_validos[inicio:fin], alto_validos[inicio:fin] = percentiles
+
+    bajo[validos], alto[validos] = bajo_validos, alto_validos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return bajo / expuestos * por, alto / expuestos * por
+
+# ============================================================================
+# INTEGRACIÓN CON FEATURES
+# ============================================================================
+
+def agregar_intervalos(df, metodo='exacto', nivel=NIVEL_CONFIANZA, n_replicas=N_REPLICAS,
+                       col_expuestos='total_nacimientos'):
+    """
+    Agrega {tasa}_ci_low / {tasa}_ci_high para cada tasa de TASAS_INTERVALO.
+
+    metodo: 'exacto' (Poisson/binomial según la tasa) o 'bootstrap'.
+    """
+    df = df.copy()
+    expuestos = df[col_expuestos].to_numpy(dtype=float)
+
+    for tasa, (col_eventos, modelo) in TASAS_INTERVALO.items():
+        if tasa not in df.columns:
+            continue
+
+        if col_eventos is not None and col_eventos in df.columns:
+            eventos = df[col_eventos].to_numpy(dtype=float)
+        else:
+            # Conteo reconstruido desde la tasa por mil
+            eventos = np.rint(df[tasa].to_numpy(dtype=float) * expuestos / POR_MIL)
+
+        if metodo == 'bootstrap':
+            bajo, alto = bootstrap_tasas(eventos, expuestos, n_replicas, nivel, modelo=modelo)
+        elif modelo == 'binomial':
+            bajo, alto = intervalo_binomial_exacto(eventos, expuestos, nivel)
+        else:
+            bajo, alto = intervalo_poisson_exacto(eventos, expuestos, nivel)
+
+        df[f'{tasa}{SUFIJO_CI_BAJO}'] = bajo
+        df[f'{tasa}{SUFIJO_CI_ALTO}'] = alto
+
+    return df
+
+def columnas_intervalo(columnas):
+    """Columnas de intervalos de confianza (para excluirlas como features de modelos)"""
+    return [col for col in columnas if col.endswith((SUFIJO_CI_BAJO, SUFIJO_CI_ALTO))]
@@ -8,6 +8,8 @@ Proyecto: AlertaMaterna
 import pandas as pd
 import numpy as np
 
+from almacenamiento import guardar_tabla, leer_tabla
+
 # Rutas
 DATA_DIR = '../data/processed/'
 FEATURES_FILE = f'{DATA_DIR}features_municipio_anio.csv'
@@ -31,169 +33,136 @@ EDAD_MADRE_MAP = {
     99: "Sin información"
 }
 
+# ============================================================================
+# TABLAS DE INTERPRETACIÓN (límites + etiquetas)
+# ============================================================================
+#
+# Cada tabla es (límites, etiquetas) con len(etiquetas) == len(límites) + 1.
+# Un valor v recibe etiquetas[i], donde i = número de límites <= v; es decir,
+# "v < límite" cae en la categoría anterior al límite. Los NaN caen en la
+# última categoría (igual que las cadenas if/elif originales).
+
+TABLA_EDAD_MATERNA = (
+    [18, 25, 35],
+    ["Adolescentes (muy alto riesgo)", "Jóvenes (bajo riesgo)",
+     "Adultas jóvenes (óptimo)", "Edad avanzada (alto riesgo)"]
+)
+
+TABLAS_TASA_MORTALIDAD = {
+    "infantil": (
+        [5, 10, 20],
+        ["🟢 Normal (OMS: <5‰)", "🟡 Moderado (5-10‰)", "🟠 Alto (10-20‰)", "🔴 Crítico (>20‰)"]
+    ),
+    "fetal": (
+        [10, 20, 50],
+        ["🟢 Bajo", "🟡 Moderado", "🟠 Alto", "🔴 Crítico"]
+    ),
+}
+
+TABLAS_PORCENTAJE = {
+    "bajo_peso": (
+        [8, 12, 15],
+        ["🟢 Bajo", "🟡 Moderado", "🟠 Alto", "🔴 Muy alto"]
+    ),
+    "prematuros": (
+        [8, 12, 15],
+        ["🟢 Bajo", "🟡 Moderado", "🟠 Alto", "🔴 Muy alto"]
+    ),
+    "sin_control_prenatal": (
+        [5, 10, 20],
+        ["🟢 Excelente cobertura", "🟡 Buena cobertura", "🟠 Cobertura deficiente", "🔴 Cobertura crítica"]
+    ),
+    "cesareas": (
+        [15, 45],
+        ["🟡 Bajo (riesgo de subutilización)", "🟢 Óptimo (OMS: 10-15%)", "🔴 Alto (OMS: máx 15%)"]
+    ),
+    "adolescentes": (
+        [10, 20, 30],
+        ["🟢 Bajo", "🟡 Moderado", "🟠 Alto", "🔴 Muy alto"]
+    ),
+}
+
+# Tabla por defecto para variables sin tabla propia
+TABLA_PORCENTAJE_GENERICA = (
+    [33, 66],
+    ["🟢 Bajo", "🟡 Moderado", "🔴 Alto"]
+)
+
+TABLA_FRAGILIDAD = (
+    [25, 50, 75],
+    ["🟢 Sistema fuerte", "🟡 Sistema moderadamente frágil", "🟠 Sistema frágil", "🔴 Sistema muy frágil"]
+)
+
+TABLA_PRESION_OBSTETRICA = (
+    [10, 30, 50],
+    ["🟢 Baja (buena capacidad)", "🟡 Moderada", "🟠 Alta", "🔴 Muy alta (saturación)"]
+)
+
+# Columnas de interpretación generadas por decodificar_features:
+# columna_salida -> (columna_origen, tabla)
+INTERPRETACIONES = {
+    'edad_materna_categoria': ('edad_materna_promedio', TABLA_EDAD_MATERNA),
+    'tasa_mortalidad_fetal_categoria': ('tasa_mortalidad_fetal', TABLAS_TASA_MORTALIDAD["fetal"]),
+    'tasa_mortalidad_neonatal_categoria': ('tasa_mortalidad_neonatal', TABLAS_TASA_MORTALIDAD["infantil"]),
+    'bajo_peso_categoria': ('pct_bajo_peso', TABLAS_PORCENTAJE["bajo_peso"]),
+    'prematuros_categoria': ('pct_prematuros', TABLAS_PORCENTAJE["prematuros"]),
+    'sin_prenatal_categoria': ('pct_sin_control_prenatal', TABLAS_PORCENTAJE["sin_control_prenatal"]),
+    'cesareas_categoria': ('pct_cesareas', TABLAS_PORCENTAJE["cesareas"]),
+    'madres_adolescentes_categoria': ('pct_madres_adolescentes', TABLAS_PORCENTAJE["adolescentes"]),
+    'fragilidad_categoria': ('indice_fragilidad_sistema', TABLA_FRAGILIDAD),
+    'presion_obstetrica_categoria': ('presion_obstetrica', TABLA_PRESION_OBSTETRICA),
+}
+
+# ============================================================================
+# MOTOR DE INTERPRETACIÓN VECTORIZADO
+# ============================================================================
+
+def categorizar(valores, tabla):
+    """
+    Asigna la etiqueta de la tabla a cada valor en una sola pasada vectorizada.
+
+    Devuelve un Categorical ordenado (o una Series categórica con el mismo
+    índice si la entrada es una Series), mucho más liviano que strings.
+    """
+    limites, etiquetas = tabla
+    codigos = np.searchsorted(np.asarray(limites, dtype=float),
+                              np.asarray(valores, dtype=float), side='right')
+    categorias = pd.Categorical.from_codes(codigos, categories=etiquetas, ordered=True)
+
+    if isinstance(valores, pd.Series):
+        return pd.Series(categorias, index=valores.index, name=valores.name)
+    return categorias
+
+def interpretar_valor(valor, tabla):
+    """Interpreta un único valor con una tabla de límites"""
+    limites, etiquetas = tabla
+    return etiquetas[int(np.searchsorted(np.asarray(limites, dtype=float), float(valor), side='right'))]
+
 # Rango de edad materna real (para interpretar promedios)
 def interpretar_edad_materna(edad_promedio):
     """Interpreta el promedio de edad materna"""
-    if edad_promedio < 18:
-        return "Adolescentes (muy alto riesgo)"
-    elif edad_promedio < 25:
-        return "Jóvenes (bajo riesgo)"
-    elif edad_promedio < 35:
-        return "Adultas jóvenes (óptimo)"
-    else:
-        return "Edad avanzada (alto riesgo)"
+    return interpretar_valor(edad_promedio, TABLA_EDAD_MATERNA)
 
 # Interpretación de tasas
 def interpretar_tasa_mortalidad(tasa, tipo="infantil"):
     """Interpreta tasas de mortalidad según estándares OMS"""
-    if tipo == "infantil":
-        if tasa < 5:
-            return "🟢 Normal (OMS: <5‰)"
-        elif tasa < 10:
-            return "🟡 Moderado (5-10‰)"
-        elif tasa < 20:
-            return "🟠 Alto (10-20‰)"
-        else:
-            return "🔴 Crítico (>20‰)"
-    elif tipo == "fetal":
-        if tasa < 10:
-            return "🟢 Bajo"
-        elif tasa < 20:
-            return "🟡 Moderado"
-        elif tasa < 50:
-            return "🟠 Alto"
-        else:
-            return "🔴 Crítico"
+    if tipo not in TABLAS_TASA_MORTALIDAD:
+        return None
+    return interpretar_valor(tasa, TABLAS_TASA_MORTALIDAD[tipo])
 
 # Interpretación de porcentajes
 def interpretar_porcentaje(valor, variable):
     """Interpreta porcentajes según variable"""
-    if variable == "bajo_peso":
-        if valor < 8:
-            return "🟢 Bajo"
-        elif valor < 12:
-            return "🟡 Moderado"
-        elif valor < 15:
-            return "🟠 Alto"
-        else:
-            return "🔴 Muy alto"
-    
-    elif variable == "prematuros":
-        if valor < 8:
-            return "🟢 Bajo"
-        elif valor < 12:
-            return "🟡 Moderado"
-        elif valor < 15:
-            return "🟠 Alto"
-        else:
-            return "🔴 Muy alto"
-    
-    elif variable == "sin_control_prenatal":
-        if valor < 5:
-            return "🟢 Excelente cobertura"
-        elif valor < 10:
-            return "🟡 Buena cobertura"
-        elif valor < 20:
-            return "🟠 Cobertura deficiente"
-        else:
-            return "🔴 Cobertura crítica"
-    
-    elif variable == "cesareas":
-        if valor < 15:
-            return "🟡 Bajo (riesgo de subutilización)"
-        elif valor < 45:
-            return "🟢 Óptimo (OMS: 10-15%)"
-        else:
-            return "🔴 Alto (OMS: máx 15%)"
-    
-    elif variable == "adolescentes":
-        if valor < 10:
-            return "🟢 Bajo"
-        elif valor < 20:
-            return "🟡 Moderado"
-        elif valor < 30:
-            return "🟠 Alto"
-        else:
-            return "🔴 Muy alto"
-    
-    else:
-        if valor < 33:
-            return "🟢 Bajo"
-        elif valor < 66:
-            return "🟡 Moderado"
-        else:
-            return "🔴 Alto"
+    return interpretar_valor(valor, TABLAS_PORCENTAJE.get(variable, TABLA_PORCENTAJE_GENERICA))
 
 def decodificar_features(df):
-    """Decodifica features para interpretación"""
+    """Decodifica features para interpretación (columnas categóricas, vectorizado)"""
     print("Decodificando features para interpretación...")
     
     df_output = df.copy()
     
-    # Crear columna de interpretación de edad materna
-    df_output['edad_materna_categoria'] = df_output['edad_materna_promedio'].apply(
-        interpretar_edad_materna
-    )
-    
-    # Crear interpretaciones de tasas de mortalidad
-    df_output['tasa_mortalidad_fetal_categoria'] = df_output['tasa_mortalidad_fetal'].apply(
-        lambda x: interpretar_tasa_mortalidad(x, "fetal")
-    )
-    
-    df_output['tasa_mortalidad_neonatal_categoria'] = df_output['tasa_mortalidad_neonatal'].apply(
-        lambda x: interpretar_tasa_mortalidad(x, "infantil")
-    )
-    
-    # Crear interpretaciones de porcentajes
-    df_output['bajo_peso_categoria'] = df_output['pct_bajo_peso'].apply(
-        lambda x: interpretar_porcentaje(x, "bajo_peso")
-    )
-    
-    df_output['prematuros_categoria'] = df_output['pct_prematuros'].apply(
-        lambda x: interpretar_porcentaje(x, "prematuros")
-    )
-    
-    df_output['sin_prenatal_categoria'] = df_output['pct_sin_control_prenatal'].apply(
-        lambda x: interpretar_porcentaje(x, "sin_control_prenatal")
-    )
-    
-    df_output['cesareas_categoria'] = df_output['pct_cesareas'].apply(
-        lambda x: interpretar_porcentaje(x, "cesareas")
-    )
-    
-    df_output['madres_adolescentes_categoria'] = df_output['pct_madres_adolescentes'].apply(
-        lambda x: interpretar_porcentaje(x, "adolescentes")
-    )
-    
-    # Clasificación de fragilidad
-    def interpretar_fragilidad(indice):
-        if indice < 25:
-            return "🟢 Sistema fuerte"
-        elif indice < 50:
-            return "🟡 Sistema moderadamente frágil"
-        elif indice < 75:
-            return "🟠 Sistema frágil"
-        else:
-            return "🔴 Sistema muy frágil"
-    
-    df_output['fragilidad_categoria'] = df_output['indice_fragilidad_sistema'].apply(
-        interpretar_fragilidad
-    )
-    
-    # Presión obstétrica
-    def interpretar_presion(presion):
-        if presion < 10:
-            return "🟢 Baja (buena capacidad)"
-        elif presion < 30:
-            return "🟡 Moderada"
-        elif presion < 50:
-            return "🟠 Alta"
-        else:
-            return "🔴 Muy alta (saturación)"
-    
-    df_output['presion_obstetrica_categoria'] = df_output['presion_obstetrica'].apply(
-        interpretar_presion
-    )
+    for col_salida, (col_origen, tabla) in INTERPRETACIONES.items():
+        df_output[col_salida] = categorizar(df_output[col_origen], tabla)
     
     return df_output
 
@@ -206,7 +175,7 @@ def main():
     
     # Cargar features
     print("Cargando features...")
-    df = pd.read_csv(FEATURES_FILE)
+    df = leer_tabla(FEATURES_FILE)
     print(f"  ✓ {len(df)} registros cargados")
     print(f"  ✓ {len(df.columns)} columnas")
     print()
@@ -215,10 +184,10 @@ def main():
     df_interpretado = decodificar_features(df)
     
     # Guardar
-    df_interpretado.to_csv(OUTPUT_FILE, index=False)
+    destino = guardar_tabla(df_interpretado, OUTPUT_FILE, 'interpretar_resultados.py')
     print()
     print("=" * 80)
-    print(f"Archivo guardado: {OUTPUT_FILE}")
+    print(f"Archivo guardado: {destino} (exportación CSV: {OUTPUT_FILE})")
     print("=" * 80)
     print()
     
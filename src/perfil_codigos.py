@@ -0,0 +1,269 @@
+"""
+Perfilador en streaming de esquema y cobertura de códigos para archivos DANE crudos.
+
+Recorre el archivo COMPLETO por bloques (con memory_map), sin cargarlo en memoria,
+y mantiene por columna:
+- Registros y nulos
+- Valores distintos: conjunto exacto para cardinalidad baja y HyperLogLog
+  cuando la cardinalidad supera UMBRAL_EXACTO
+- Conteo por código para las columnas con diccionario DANE, para reportar
+  códigos fuera de diccionario y códigos del diccionario que nunca aparecen
+
+Reemplaza la muestra de nrows=1000 de analizar_codigos.py, que puede perder
+códigos que solo aparecen más adelante en el archivo.
+
+Proyecto: AlertaMaterna
+"""
+
+import codecs
+import math
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from diccionario_codigos import diccionario_por_fuente
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+DATA_DIR = os.path.join(BASE_DIR, 'data', 'processed')
+
+# Archivos a perfilar: nombre -> (archivo, fuente del diccionario)
+ARCHIVOS_PERFIL = {
+    'defunciones_fetales_2024': (os.path.join(RAW_DIR, 'BD-EEVV-Defuncionesfetales-2024.csv'), 'defunciones_fetales'),
+    'nacimientos': (os.path.join(DATA_DIR, 'nacimientos_2020_2024.csv'), 'nacimientos'),
+    'defunciones_fetales': (os.path.join(DATA_DIR, 'defunciones_fetales_2020_2024.csv'), 'defunciones_fetales'),
+    'defunciones_no_fetales': (os.path.join(DATA_DIR, 'defunciones_no_fetales_2020_2024.csv'), 'defunciones_no_fetales'),
+}
+
+CHUNKSIZE = 1_000_000
+UMBRAL_EXACTO = 50_000   # Distintos exactos hasta este valor; luego HyperLogLog
+HLL_PRECISION = 14       # 2^14 registros → error estándar ~0.8%
+MAX_EJEMPLOS = 10
+BLOQUE_CODIFICACION = 16 * 1024 ** 2  # bytes por lectura al detectar la codificación
+
+# ============================================================================
+# HYPERLOGLOG
+# ============================================================================
+
+def _hashes(valores):
+    """Hash de 64 bits vectorizado de un arreglo de valores"""
+    return pd.util.hash_array(np.asarray(valores, dtype=object))
+
+def hll_nuevo(precision=HLL_PRECISION):
+    """Registros vacíos de un HyperLogLog"""
+    return np.zeros(1 << precision, dtype=np.uint8)
+
+def hll_agregar(registros, valores):
+    """Agrega valores a un HyperLogLog (vectorizado)"""
+    if len(valores) == 0:
+        return registros
+
+    p = int(np.log2(len(registros)))
+    h = _hashes(valores)
+
+    indices = (h >> np.uint64(64 - p)).astype(np.int64)
+    # Siguientes 32 bits: rango = ceros a la izquierda + 1 (exacto en float64)
+    resto = ((h << np.uint64(p)) >> np.uint64(32)).astype(np.float64)
+    rangos = np.where(resto > 0, 32 - np.floor(np.log2(np.maximum(resto, 1))), 33).astype(np.uint8)
+
+    np.maximum.at(registros, indices, rangos)
+    return registros
+
+def hll_estimar(registros):
+    """Estimación de cardinalidad con corrección de rango pequeño"""
+    m = len(registros)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimado = alpha * m * m / np.sum(np.power(2.0, -registros.astype(np.float64)))
+
+    ceros = int((registros == 0).sum())
+    if estimado <= 2.5 * m and ceros > 0:
+        estimado = m * np.log(m / ceros)
+    return int(round(estimado))
+
+# ============================================================================
+# PERFIL POR COLUMNA
+# ============================================================================
+
+def _normalizar_codigo(valor):
+    """'05', '5', '5.0' y ' 5' son el mismo código numérico"""
+    texto = str(valor).strip()
+    try:
+        numero = float(texto)
+    except ValueError:
+        return texto
+    # 'inf' / 'nan' son texto: int() fallaría (OverflowError / ValueError)
+    if not math.isfinite(numero) or numero != int(numero):
+        return texto
+    return str(int(numero))
+
+def _nuevo_estado():
+    return {'registros': 0, 'nulos': 0, 'distintos': set(), 'hll': None, 'conteos': None}
+
+def _actualizar_estado(estado, serie, con_diccionario):
+    """Actualiza el perfil de una columna con un bloque"""
+    no_nulos = serie.dropna()
+    no_nulos = no_nulos[no_nulos.str.strip() != '']
+
+    estado['registros'] += len(serie)
+    estado['nulos'] += len(serie) - len(no_nulos)
+
+    if con_diccionario:
+        # Columnas codificadas: cardinalidad baja, se cuentan todos los códigos
+        conteos = no_nulos.value_counts()
+        if estado['conteos'] is None:
+            estado['conteos'] = Counter()
+        estado['conteos'].update(conteos.to_dict())
+        return
+
+    unicos = pd.unique(no_nulos.to_numpy())
+    if estado['hll'] is not None:
+        hll_agregar(estado['hll'], unicos)
+        return
+
+    estado['distintos'].update(unicos.tolist())
+    if len(estado['distintos']) > UMBRAL_EXACTO:
+        # Cambiar a HyperLogLog y liberar el conjunto exacto
+        estado['hll'] = hll_agregar(hll_nuevo(), list(estado['distintos']))
+        estado['distintos'] = set()
+
+def detectar_codificacion(archivo, bloque=BLOQUE_CODIFICACION):
+    """
+    'utf-8-sig' si todo el archivo es utf-8 válido, si no 'latin-1'. Lee bytes sin
+    parsear y se detiene en el primer byte inválido.
+    """
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    with open(archivo, 'rb') as f:
+        try:
+            for datos in iter(lambda: f.read(bloque), b''):
+                decodificador.decode(datos)
+            decodificador.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return 'latin-1'
+    return 'utf-8-sig'
+
+def perfilar_archivo(archivo, diccionario=None, chunksize=CHUNKSIZE, encoding=None, usecols=None):
+    """
+    Perfila un archivo completo por bloques.
+
+    Devuelve un DataFrame con una fila por columna: registros, nulos, distintos
+    (exactos o HLL), códigos fuera de diccionario y códigos del diccionario sin uso.
+    """
+    if encoding is None:
+        # Los procesados están en utf-8; los crudos del DANE en latin-1. Se decide antes
+        # de perfilar: un byte inválido a mitad de archivo obligaba a perfilarlo dos veces
+        encoding = detectar_codificacion(archivo)
+        if encoding == 'latin-1':
+            print("  → El archivo no es utf-8, se lee como latin-1")
+
+    diccionario = diccionario or {}
+    estados = {}
+    total = 0
+
+    lector = pd.read_csv(archivo, dtype=str, chunksize=chunksize, encoding=encoding,
+                         usecols=usecols, memory_map=True, keep_default_na=True)
+    for bloque in lector:
+        for col in bloque.columns:
+            estado = estados.setdefault(col, _nuevo_estado())
+            _actualizar_estado(estado, bloque[col], col in diccionario)
+        total += len(bloque)
+        print(f"  → {total:,} registros perfilados", end='\r')
+    print()
+
+    filas = []
+    for col, estado in estados.items():
+        fila = {
+            'columna': col,
+            'registros': estado['registros'],
+            'nulos': estado['nulos'],
+            'pct_nulos': estado['nulos'] / estado['registros'] * 100 if estado['registros'] else 0.0,
+            'con_diccionario': col in diccionario,
+        }
+
+        if col in diccionario:
+            # Normalizar códigos observados y del diccionario antes de comparar
+            observados = Counter()
+            for valor, n in estado['conteos'].items():
+                observados[_normalizar_codigo(valor)] += n
+            codigos_dic = {_normalizar_codigo(c) for c in diccionario[col]['codigos']}
+
+            fuera = {c: n for c, n in observados.items() if c not in codigos_dic}
+            sin_uso = sorted(codigos_dic - set(observados), key=lambda c: (len(c), c))
+
+            fila.update({
+                'distintos': len(observados),
+                'metodo_distintos': 'exacto',
+                'codigos_fuera_diccionario': len(fuera),
+                'registros_fuera_diccionario': sum(fuera.values()),
+                'ejemplos_fuera_diccionario': ', '.join(
+                    c for c, _ in Counter(fuera).most_common(MAX_EJEMPLOS)
+                ),
+                'codigos_sin_uso': ', '.join(sin_uso),
+            })
+        elif estado['hll'] is not None:
+            fila.update({'distintos': hll_estimar(estado['hll']), 'metodo_distintos': 'hll'})
+        else:
+            fila.update({'distintos': len(estado['distintos']), 'metodo_distintos': 'exacto'})
+
+        filas.append(fila)
+
+    return pd.DataFrame(filas)
+
+def reportar_brechas(perfil, nombre):
+    """Imprime las brechas de cobertura de un perfil"""
+    print(f"\n📊 {nombre}: {perfil['registros'].max():,} registros, {len(perfil)} columnas")
+
+    codificadas = perfil[perfil['con_diccionario']]
+    brechas = codificadas[codificadas['registros_fuera_diccionario'] > 0]
+    if brechas.empty:
+        print("   ✅ Todos los códigos observados están en el diccionario DANE")
+    else:
+        print(f"   ❌ Columnas con códigos fuera de diccionario ({len(brechas)}):")
+        for _, fila in brechas.iterrows():
+            print(f"      • {fila['columna']:15s} {int(fila['registros_fuera_diccionario']):,} registros "
+                  f"({int(fila['codigos_fuera_diccionario'])} códigos): {fila['ejemplos_fuera_diccionario']}")
+
+    sin_uso = codificadas[codificadas['codigos_sin_uso'] != '']
+    if not sin_uso.empty:
+        print(f"   ℹ️  Códigos del diccionario que no aparecen en el archivo:")
+        for _, fila in sin_uso.iterrows():
+            print(f"      • {fila['columna']:15s} {fila['codigos_sin_uso']}")
+
+    muy_nulas = perfil[perfil['pct_nulos'] > 50]
+    if not muy_nulas.empty:
+        print(f"   ⚠️  Columnas con >50% nulos: {', '.join(muy_nulas['columna'])}")
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def main(nombres=None):
+    """Perfila los archivos DANE disponibles y guarda un reporte por archivo"""
+    print("=" * 80)
+    print("PERFIL DE ESQUEMA Y COBERTURA DE CÓDIGOS - ALERTAMATERNA")
+    print("=" * 80)
+
+    for nombre in nombres or ARCHIVOS_PERFIL:
+        archivo, fuente = ARCHIVOS_PERFIL[nombre]
+        if not os.path.exists(archivo):
+            print(f"\n⏭️  {nombre}: archivo no encontrado ({archivo})")
+            continue
+
+        print(f"\nPerfilando {nombre}...")
+        perfil = perfilar_archivo(archivo, diccionario_por_fuente(fuente))
+        reportar_brechas(perfil, nombre)
+
+        salida = os.path.join(DATA_DIR, f'perfil_cobertura_{nombre}.csv')
+        perfil.to_csv(salida, index=False)
+        print(f"   → Reporte guardado en {salida}")
+
+    print("\n✅ Perfilado completado")
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or None)
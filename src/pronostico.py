@@ -0,0 +1,246 @@
+"""
+Pronóstico de mortalidad fetal del año siguiente por municipio.
+
+Un solo modelo global (regresión por cuantiles P10/P50/P90) se entrena sobre
+todas las series municipales a la vez:
+- Panel completo municipio × año (los años faltantes quedan como NaN, así que
+  shift(1) siempre es el año anterior)
+- Rezagos y ventanas móviles vectorizados con groupby().shift() / rolling(),
+  sin ciclos por municipio
+- Validación temporal: se entrena hasta el año T-1 y se evalúa en T
+- Pronóstico en lote: una fila por municipio para el año T+1
+
+Uso (desde src/):
+    python pronostico.py
+
+Proyecto: AlertaMaterna
+"""
+
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error
+
+from almacenamiento import guardar_tabla, leer_tabla
+
+warnings.filterwarnings('ignore')
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = '../data/processed/'
+MODEL_DIR = '../models/'
+FEATURES_FILE = f'{DATA_DIR}features_municipio_anio.csv'
+OUTPUT_FILE = f'{DATA_DIR}pronostico_municipio.csv'
+
+CLAVE = ['COD_DPTO', 'COD_MUNIC']
+OBJETIVO = 'tasa_mortalidad_fetal'
+
+# Series de las que se derivan rezagos y ventanas
+SERIES = ['tasa_mortalidad_fetal', 'tasa_mortalidad_neonatal', 'total_nacimientos',
+          'pct_sin_control_prenatal', 'pct_bajo_peso']
+REZAGOS = [1, 2, 3]
+VENTANA = 3
+
+# Filas de entrenamiento: el objetivo solo es confiable con ≥ 10 nacimientos (OMS)
+MIN_NACIMIENTOS = 10
+
+CUANTILES = {
+    'p10': {'alpha': 0.10, 'min_samples_leaf': 15},
+    'p50': {'alpha': 0.50, 'min_samples_leaf': 8},
+    'p90': {'alpha': 0.90, 'min_samples_leaf': 15},
+}
+
+# ============================================================================
+# PANEL Y FEATURES TEMPORALES
+# ============================================================================
+
+def construir_panel(df, anio_pronostico=None):
+    """
+    Panel completo municipio × año, incluyendo el año a pronosticar (sin datos).
+
+    Los municipios-año sin registro quedan con NaN para que los rezagos no
+    salten años.
+    """
+    anios = sorted(df['ANO'].unique())
+    if anio_pronostico is None:
+        anio_pronostico = anios[-1] + 1
+
+    municipios = df[CLAVE].drop_duplicates()
+    todos_anios = pd.DataFrame({'ANO': list(range(anios[0], anio_pronostico + 1))})
+    panel = municipios.merge(todos_anios, how='cross')
+
+    columnas = CLAVE + ['ANO'] + [c for c in SERIES if c in df.columns]
+    panel = panel.merge(df[columnas], on=CLAVE + ['ANO'], how='left')
+    return panel.sort_values(CLAVE + ['ANO']).reset_index(drop=True)
+
+def agregar_features_temporales(panel):
+    """
+    Rezagos, media/desviación móvil y tendencia de cada serie, usando solo
+    información de años anteriores (shift antes de cada ventana).
+    """
+    g = panel.groupby(CLAVE, sort=False)
+    nuevas = {}
+
+    for serie in [s for s in SERIES if s in panel.columns]:
+        for k in REZAGOS:
+            nuevas[f'{serie}_lag{k}'] = g[serie].shift(k)
+
+        previa = nuevas[f'{serie}_lag1']
+        ventana = previa.groupby([panel[c] for c in CLAVE], sort=False).rolling(VENTANA, min_periods=1)
+        nuevas[f'{serie}_media{VENTANA}'] = ventana.mean().reset_index(level=list(range(len(CLAVE))), drop=True)
+        nuevas[f'{serie}_std{VENTANA}'] = ventana.std().reset_index(level=list(range(len(CLAVE))), drop=True)
+        nuevas[f'{serie}_delta'] = nuevas[f'{serie}_lag1'] - nuevas[f'{serie}_lag2']
+
+    nuevas = pd.DataFrame(nuevas, index=panel.index)
+
+    # Años con dato observado antes del año actual
+    observado = panel[OBJETIVO].notna()
+    nuevas['anios_historia'] = observado.groupby([panel[c] for c in CLAVE], sort=False).cumsum() - observado
+
+    # Contexto departamental del año anterior (ponderado por nacimientos)
+    lag_obj, lag_nac = f'{OBJETIVO}_lag1', 'total_nacimientos_lag1'
+    muertes = (nuevas[lag_obj] * nuevas[lag_nac]).fillna(0)
+    por_dpto = [panel['COD_DPTO'], panel['ANO']]
+    nuevas[f'{OBJETIVO}_dpto_lag1'] = (muertes.groupby(por_dpto).transform('sum')
+                                       / nuevas[lag_nac].fillna(0).groupby(por_dpto).transform('sum'))
+
+    return pd.concat([panel, nuevas], axis=1)
+
+def columnas_modelo(panel):
+    """Features del modelo: todo lo derivado de años anteriores"""
+    return [c for c in panel.columns if c not in CLAVE + ['ANO'] + SERIES]
+
+def filas_entrenamiento(panel, hasta_anio):
+    """Municipios-año con objetivo confiable y al menos un año de historia"""
+    return panel[
+        (panel['ANO'] <= hasta_anio)
+        & panel[OBJETIVO].notna()
+        & (panel['total_nacimientos'] >= MIN_NACIMIENTOS)
+        & panel[f'{OBJETIVO}_lag1'].notna()
+    ]
+
+# ============================================================================
+# MODELO GLOBAL POR CUANTILES
+# ============================================================================
+
+def entrenar_cuantiles(X, y):
+    """Un modelo de gradient boosting por cuantil, sobre todas las series a la vez"""
+    modelos = {}
+    for nombre, cfg in CUANTILES.items():
+        modelo = GradientBoostingRegressor(
+            loss='quantile',
+            alpha=cfg['alpha'],
+            n_estimators=80,
+            max_depth=3,
+            learning_rate=0.08,
+            min_samples_split=15,
+            min_samples_leaf=cfg['min_samples_leaf'],
+            subsample=0.75,
+            random_state=42
+        )
+        # Los árboles de sklearn no aceptan NaN en versiones antiguas: rezagos faltantes → -1
+        modelos[nombre] = modelo.fit(np.nan_to_num(X, nan=-1), y)
+    return modelos
+
+def predecir_cuantiles(modelos, X):
+    """Predicción P10/P50/P90 en lote, ordenada para evitar cruces de cuantiles"""
+    X = np.nan_to_num(X, nan=-1)
+    predicciones = np.column_stack([modelos[nombre].predict(X) for nombre in CUANTILES])
+    predicciones = np.sort(np.clip(predicciones, 0, None), axis=1)
+    return pd.DataFrame(predicciones, columns=list(CUANTILES))
+
+def validar_temporal(panel, feature_cols, anio_prueba):
+    """Entrena con años < anio_prueba y evalúa en anio_prueba"""
+    entrenamiento = filas_entrenamiento(panel, anio_prueba - 1)
+    prueba = filas_entrenamiento(panel, anio_prueba)
+    prueba = prueba[prueba['ANO'] == anio_prueba]
+
+    if entrenamiento.empty or prueba.empty:
+        print(f"  Sin datos suficientes para validar en {anio_prueba}")
+        return None
+
+    modelos = entrenar_cuantiles(entrenamiento[feature_cols].to_numpy(), entrenamiento[OBJETIVO].to_numpy())
+    pred = predecir_cuantiles(modelos, prueba[feature_cols].to_numpy())
+    real = prueba[OBJETIVO].to_numpy()
+
+    ingenuo = prueba[f'{OBJETIVO}_lag1'].to_numpy()
+    metricas = {
+        'anio_prueba': anio_prueba,
+        'n_prueba': len(prueba),
+        'mae_p50': mean_absolute_error(real, pred['p50']),
+        'mae_ingenuo': mean_absolute_error(real, ingenuo),
+        'cobertura_p10_p90': ((real >= pred['p10']) & (real <= pred['p90'])).mean(),
+    }
+
+    print(f"  Entrenamiento: {len(entrenamiento)} municipios-año (≤ {anio_prueba - 1})")
+    print(f"  Prueba: {metricas['n_prueba']} municipios-año ({anio_prueba})")
+    print(f"  MAE P50: {metricas['mae_p50']:.2f}‰ (ingenuo año anterior: {metricas['mae_ingenuo']:.2f}‰)")
+    print(f"  Cobertura [P10, P90]: {metricas['cobertura_p10_p90']:.1%} (esperado: 80%)")
+    return metricas
+
+def pronosticar(df, anio_pronostico=None):
+    """
+    Entrena el modelo global con todos los años observados y pronostica el
+    año siguiente para todos los municipios en una sola pasada.
+    """
+    panel = agregar_features_temporales(construir_panel(df, anio_pronostico))
+    feature_cols = columnas_modelo(panel)
+    anio_pronostico = panel['ANO'].max()
+
+    entrenamiento = filas_entrenamiento(panel, anio_pronostico - 1)
+    modelos = entrenar_cuantiles(entrenamiento[feature_cols].to_numpy(), entrenamiento[OBJETIVO].to_numpy())
+
+    destino = panel[(panel['ANO'] == anio_pronostico) & panel[f'{OBJETIVO}_lag1'].notna()]
+    pred = predecir_cuantiles(modelos, destino[feature_cols].to_numpy())
+
+    pronostico = destino[CLAVE + ['ANO']].reset_index(drop=True)
+    pronostico['ultimo_valor'] = destino[f'{OBJETIVO}_lag1'].to_numpy()
+    pronostico = pd.concat([pronostico, pred], axis=1)
+    return pronostico, modelos, feature_cols, panel
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def main():
+    print("=" * 80)
+    print("PRONÓSTICO DE MORTALIDAD FETAL - ALERTAMATERNA")
+    print("=" * 80)
+
+    df = leer_tabla(FEATURES_FILE)
+    print(f"\nCargando {FEATURES_FILE}: {len(df):,} registros, "
+          f"{df[CLAVE].drop_duplicates().shape[0]} municipios, años {df['ANO'].min()}-{df['ANO'].max()}")
+
+    print("\n[1/3] Validación temporal...")
+    panel = agregar_features_temporales(construir_panel(df))
+    validar_temporal(panel, columnas_modelo(panel), df['ANO'].max())
+
+    print("\n[2/3] Entrenando modelo global y pronosticando...")
+    pronostico, modelos, feature_cols, _ = pronosticar(df)
+    print(f"  → {len(feature_cols)} features temporales")
+    print(f"  → {len(pronostico)} municipios pronosticados para {pronostico['ANO'].max()}")
+
+    print("\n[3/3] Guardando resultados...")
+    print(f"  ✓ {guardar_tabla(pronostico, OUTPUT_FILE, 'pronostico.py')} (exportación CSV: {OUTPUT_FILE})")
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    for nombre, modelo in modelos.items():
+        with open(f'{MODEL_DIR}modelo_pronostico_{nombre}.pkl', 'wb') as f:
+            pickle.dump(modelo, f)
+        print(f"  ✓ {MODEL_DIR}modelo_pronostico_{nombre}.pkl")
+    with open(f'{MODEL_DIR}feature_names_pronostico.pkl', 'wb') as f:
+        pickle.dump(feature_cols, f)
+    print(f"  ✓ {MODEL_DIR}feature_names_pronostico.pkl")
+
+    alza = pronostico[pronostico['p50'] > pronostico['ultimo_valor']]
+    print(f"\n📈 Municipios con alza esperada (P50 > último año): {len(alza)} de {len(pronostico)}")
+    print(f"🚨 Municipios con P90 > 50‰: {(pronostico['p90'] > 50).sum()}")
+
+if __name__ == "__main__":
+    main()
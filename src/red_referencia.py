@@ -0,0 +1,178 @@
+"""
+Analítica de la red de referencia entre municipios.
+
+Las matrices de flujo residencia → ocurrencia (flujos_pacientes.py) forman,
+por año, un grafo dirigido y ponderado: una arista i → j con peso = eventos
+de residentes de i atendidos en j. Sobre la adyacencia dispersa se calculan,
+para todos los municipios DIVIPOLA:
+
+    centralidad_referencia     PageRank ponderado × n (1 = municipio promedio)
+    es_hub_referencia          1 si está entre los N_HUBS más centrales del año
+    pct_dependencia_hub        % de eventos de residentes atendidos en un solo hub
+    concentracion_referencia   Herfindahl de los destinos de salida (1 = un único destino)
+    km_hub_cercano             distancia en línea recta (haversine) al hub más cercano
+    km_cadena_referencia       km de la cadena de remisiones más corta hasta un hub
+    saltos_cadena_referencia   número de remisiones de esa cadena
+
+Todo es álgebra dispersa y scipy.sparse.csgraph (Dijkstra multi-origen), sin
+bucles por municipio: los ~1.100 nodos × todos los años se procesan en segundos.
+
+Uso (desde src/, después de features.py):
+    python red_referencia.py
+
+Proyecto: AlertaMaterna
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+
+from almacen_features import id_municipio
+from flujos_pacientes import FLUJOS_DIR, cargar_flujos
+from suavizado import cargar_coordenadas_municipios
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+AMORTIGUACION = 0.85
+N_HUBS = 5
+RADIO_TIERRA_KM = 6371.0
+
+# ============================================================================
+# ALGORITMOS
+# ============================================================================
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia de gran círculo (vectorizada, grados -> km)"""
+    lat1, lon1, lat2, lon2 = (np.deg2rad(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(a))
+
+def pagerank(pesos, amortiguacion=AMORTIGUACION, tolerancia=1e-10, max_iter=200):
+    """PageRank ponderado por iteración de potencias (los nodos sin salida reparten uniforme)"""
+    n = pesos.shape[0]
+    salida = np.asarray(pesos.sum(axis=1)).ravel()
+    transicion = (sparse.diags(np.divide(1.0, salida, out=np.zeros(n), where=salida > 0)) @ pesos).T.tocsr()
+    colgantes = salida == 0
+
+    rango = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        nuevo = amortiguacion * (transicion @ rango + rango[colgantes].sum() / n) + (1 - amortiguacion) / n
+        if np.abs(nuevo - rango).sum() < tolerancia:
+            return nuevo
+        rango = nuevo
+    return rango
+
+def grafo_distancias(externos, lat, lon):
+    """Misma topología que las remisiones, con la longitud haversine de cada arista como peso"""
+    aristas = externos.tocoo()
+    km = haversine_km(lat[aristas.row], lon[aristas.row], lat[aristas.col], lon[aristas.col])
+    validas = np.isfinite(km)
+    # csgraph interpreta 0 como "sin arista": municipios con la misma coordenada quedan a 1 m
+    return sparse.csr_matrix(
+        (np.maximum(km[validas], 1e-3), (aristas.row[validas], aristas.col[validas])),
+        shape=externos.shape,
+    )
+
+# ============================================================================
+# FEATURES DE RED
+# ============================================================================
+
+def metricas_anio(matriz, lat, lon, n_hubs=N_HUBS):
+    """Métricas de red de un año (arreglos de largo n, en el orden de los municipios)"""
+    n = matriz.shape[0]
+    matriz = matriz.astype(np.float64)
+    externos = (matriz - sparse.diags(matriz.diagonal())).tocsr()
+    externos.eliminate_zeros()
+
+    residentes = np.asarray(matriz.sum(axis=1)).ravel()
+    salida = np.asarray(externos.sum(axis=1)).ravel()
+
+    # Centralidad y hubs (solo nodos que reciben remisiones)
+    rango = pagerank(externos)
+    recibe = np.asarray(externos.sum(axis=0)).ravel() > 0
+    candidatos = np.flatnonzero(recibe)
+    hubs = candidatos[np.argsort(rango[candidatos])[::-1][:n_hubs]]
+
+    # Dependencia de un solo hub y concentración de destinos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if len(hubs):
+            a_hub = externos[:, hubs].max(axis=1).toarray().ravel()
+        else:
+            a_hub = np.zeros(n)
+        pct_dependencia = np.nan_to_num(a_hub / residentes * 100)
+        proporciones = sparse.diags(np.divide(1.0, salida, out=np.zeros(n), where=salida > 0)) @ externos
+        concentracion = np.asarray(proporciones.multiply(proporciones).sum(axis=1)).ravel()
+
+    # Distancias: línea recta al hub más cercano y cadena de remisiones más corta
+    km_hub = np.full(n, np.nan)
+    km_cadena = np.full(n, np.nan)
+    saltos = np.full(n, np.nan)
+    if len(hubs):
+        km_hub = np.fmin.reduce(haversine_km(lat[:, None], lon[:, None], lat[hubs][None, :], lon[hubs][None, :]), axis=1)
+        # Dijkstra desde los hubs sobre el grafo transpuesto = distancia de cada nodo HACIA un hub
+        distancias = grafo_distancias(externos, lat, lon).T.tocsr()
+        km_cadena = dijkstra(distancias, directed=True, indices=hubs, min_only=True)
+        saltos = dijkstra(distancias, directed=True, indices=hubs, min_only=True, unweighted=True)
+        km_cadena[~np.isfinite(km_cadena)] = np.nan
+        saltos[~np.isfinite(saltos)] = np.nan
+
+    return {
+        'centralidad_referencia': rango * n,
+        'es_hub_referencia': np.isin(np.arange(n), hubs).astype(int),
+        'pct_dependencia_hub': pct_dependencia,
+        'concentracion_referencia': concentracion,
+        'km_hub_cercano': km_hub,
+        'km_cadena_referencia': km_cadena,
+        'saltos_cadena_referencia': saltos,
+    }
+
+def features_red(flujos, coordenadas=None, n_hubs=N_HUBS):
+    """Features de red por municipio-año para todos los municipios del índice de flujos"""
+    ids = flujos['municipios']
+    coords = coordenadas if coordenadas is not None else cargar_coordenadas_municipios()
+    ids_coords = id_municipio(coords['COD_DPTO'], coords['COD_MUNIC'])
+    posicion = pd.Series(np.arange(len(ids_coords)), index=ids_coords)
+    posicion = posicion[~posicion.index.duplicated()].reindex(ids).to_numpy()
+    tiene = ~np.isnan(posicion)
+    lat = np.full(len(ids), np.nan)
+    lon = np.full(len(ids), np.nan)
+    lat[tiene] = coords['LATITUD'].to_numpy()[posicion[tiene].astype(int)]
+    lon[tiene] = coords['LONGITUD'].to_numpy()[posicion[tiene].astype(int)]
+
+    tablas = []
+    for anio, matriz in sorted(flujos['matrices'].items()):
+        tabla = pd.DataFrame(metricas_anio(matriz, lat, lon, n_hubs))
+        tabla.insert(0, 'ANO', anio)
+        tabla.insert(0, 'ID_MUNICIPIO', ids)
+        tablas.append(tabla)
+    return pd.concat(tablas, ignore_index=True)
+
+# ============================================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================================
+
+def main():
+    print("=" * 80)
+    print("RED DE REFERENCIA - ALERTAMATERNA")
+    print("=" * 80)
+    if not os.path.exists(os.path.join(FLUJOS_DIR, 'municipios.npy')):
+        print(f"⚠️  {FLUJOS_DIR} no existe: ejecutar primero features.py")
+        return
+    flujos = cargar_flujos()
+    inicio = time.perf_counter()
+    red = features_red(flujos)
+    print(f"  ✓ {len(flujos['municipios'])} municipios × {len(flujos['matrices'])} años "
+          f"en {time.perf_counter() - inicio:.2f} s")
+
+    for anio, tabla in red[red['es_hub_referencia'] == 1].groupby('ANO'):
+        hubs = tabla.sort_values('centralidad_referencia', ascending=False)
+        print(f"  {anio}: hubs {', '.join(f'{i} ({c:.1f})' for i, c in zip(hubs['ID_MUNICIPIO'], hubs['centralidad_referencia']))}")
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,10 @@ from sklearn.linear_model import Ridge, ElasticNet
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import os
 
+from almacen_features import DEFINICIONES, FEATURES_MODELO, tabla_features
+from explicaciones import generar_cache_explicaciones
+from transformador import compilar_transformador, guardar_transformador
+
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -46,7 +50,8 @@ def cargar_y_limpiar_datos():
     print("CARGA Y LIMPIEZA DE DATOS")
     print("="*80)
     
-    df = pd.read_csv(f'{DATA_DIR}features_municipio_anio.csv')
+    # Features derivadas y objetivo ya calculados en el almacén de features
+    df = tabla_features()
     print(f"Registros totales: {len(df)}")
     
     # Filtrar municipios muy pequeños (datos poco confiables)
@@ -54,9 +59,6 @@ def cargar_y_limpiar_datos():
     df = df[df['total_nacimientos'] >= MIN_NAC].copy()
     print(f"Registros con ≥{MIN_NAC} nacimientos: {len(df)}")
     
-    # Calcular target: tasa de mortalidad infantil
-    df['tasa_mortalidad_infantil'] = (df['total_defunciones'] / df['total_nacimientos']) * 1000
-    
     # Estadísticas del target
     print(f"\nTarget (Tasa Mortalidad Infantil ‰):")
     print(f"  Media: {df['tasa_mortalidad_infantil'].mean():.2f}")
@@ -67,81 +69,9 @@ def cargar_y_limpiar_datos():
     
     return df
 
-def crear_features_sinteticas(df):
-    """Crea features adicionales basadas en conocimiento del dominio"""
-    print("\n" + "="*80)
-    print("INGENIERÍA DE FEATURES")
-    print("="*80)
-    
-    # Ratio mortalidad neonatal / fetal (indica calidad de atención)
-    df['ratio_neonatal_fetal'] = np.where(
-        df['tasa_mortalidad_fetal'] > 0,
-        df['tasa_mortalidad_neonatal'] / df['tasa_mortalidad_fetal'],
-        0
-    )
-    
-    # Índice de cobertura prenatal (inverso de sin control)
-    df['cobertura_prenatal'] = 1 - df['pct_sin_control_prenatal']
-    
-    # Índice de riesgo neonatal compuesto
-    df['indice_riesgo_neonatal'] = (
-        df['tasa_mortalidad_neonatal'] * 0.5 +
-        df['pct_bajo_peso'] * 100 * 0.3 +
-        df['pct_prematuros'] * 100 * 0.2
-    )
-    
-    # Interacción: mortalidad neonatal * falta de control
-    df['neonatal_x_sin_prenatal'] = (
-        df['tasa_mortalidad_neonatal'] * df['pct_sin_control_prenatal'] * 100
-    )
-    
-    # Indicador de infraestructura deficiente
-    df['infraestructura_deficiente'] = (df['num_instituciones'] < 5).astype(int)
-    
-    # Log de nacimientos (para escala)
-    df['log_nacimientos'] = np.log1p(df['total_nacimientos'])
-    
-    print(f"Features sintéticas creadas: 6")
-    
-    return df
-
 def seleccionar_features_clave():
-    """Retorna lista de features más relevantes para el modelo"""
-    # Features principales basadas en importancia y conocimiento del dominio
-    features_clave = [
-        # Mortalidad directa (más importantes)
-        'tasa_mortalidad_neonatal',
-        'tasa_mortalidad_fetal',
-        
-        # Factores de riesgo clínico
-        'pct_bajo_peso',
-        'pct_prematuros',
-        'pct_apgar_bajo',
-        
-        # Acceso a salud
-        'pct_sin_control_prenatal',
-        'cobertura_prenatal',
-        'num_instituciones',
-        'consultas_promedio',
-        
-        # Factores demográficos
-        'pct_madres_adolescentes',
-        'pct_educacion_baja',
-        'total_nacimientos',
-        'log_nacimientos',
-        
-        # Features sintéticas
-        'indice_riesgo_neonatal',
-        'neonatal_x_sin_prenatal',
-        'infraestructura_deficiente',
-        
-        # Otros relevantes
-        'pct_cesareas',
-        'presion_obstetrica',
-        'pct_mortalidad_evitable',
-    ]
-    
-    return features_clave
+    """Features del modelo: la lista explícita del almacén, compartida con train_model.py"""
+    return list(FEATURES_MODELO)
 
 # ============================================================================
 # ENTRENAMIENTO DEL MODELO
@@ -330,8 +260,11 @@ def main():
     # 1. Cargar datos
     df = cargar_y_limpiar_datos()
     
-    # 2. Crear features sintéticas
-    df = crear_features_sinteticas(df)
+    # 2. Features sintéticas (definidas y materializadas en almacen_features.py)
+    print("\n" + "="*80)
+    print("INGENIERÍA DE FEATURES")
+    print("="*80)
+    print(f"Features sintéticas del almacén: {len(DEFINICIONES) - 1}")
     
     # 3. Seleccionar features
     feature_cols = seleccionar_features_clave()
@@ -388,6 +321,17 @@ def main():
     print(f"✓ Scaler guardado en {MODEL_DIR}scaler_mortalidad.pkl")
     print(f"✓ Feature names guardados en {MODEL_DIR}feature_names.pkl")
     
+    # Transformador compilado: derivadas + imputación + escalado en NumPy (lo usa el dashboard)
+    transformador = compilar_transformador(feature_cols, scaler, imputer.statistics_)
+    guardar_transformador(transformador, f'{MODEL_DIR}transformador_features.pkl')
+    print(f"✓ Transformador guardado en {MODEL_DIR}transformador_features.pkl")
+    
+    # 9. Caché de explicaciones TreeSHAP (todas las filas, incluso < 10 nacimientos)
+    print("\n" + "="*80)
+    print("CACHÉ DE EXPLICACIONES")
+    print("="*80)
+    generar_cache_explicaciones(model, transformador, tabla_features(), MODEL_DIR)
+    
     print("\n" + "="*80)
     print("REENTRENAMIENTO COMPLETADO")
     print("="*80)
@@ -0,0 +1,183 @@
+"""
+Suavizado empírico-bayesiano de tasas para áreas pequeñas.
+
+En vez de descartar los municipios-año con < 10 nacimientos (filtro OMS), cada
+tasa bruta se contrae hacia una tasa a priori con un peso que depende de su
+tamaño: los municipios grandes conservan su tasa, los pequeños se acercan al
+prior. Estimador de momentos de Marshall (1991), equivalente a la media
+posterior de un modelo Poisson-gamma (tasas) o beta-binomial (proporciones):
+
+    m   = Σy / Σn                        (tasa del grupo)
+    s²  = Σ n·(r - m)² / Σn               (varianza ponderada de las tasas)
+    A   = max(s² - V(m)/n̄, 0)            (varianza entre municipios)
+    w   = A / (A + V(m)/n)                (peso de la tasa propia)
+    r̃   = m + w·(r - m)
+
+con V(m) = m (Poisson) o m(1-m) (binomial).
+
+Priors:
+- Departamental (por defecto): un prior por departamento
+- Espacial (opcional): prior local con los k municipios vecinos más cercanos
+  (DIVIPOLA) en el mismo año
+
+Todo está vectorizado con groupby/transform y arreglos municipio × año.
+
+Proyecto: AlertaMaterna
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'processed')
+DIVIPOLA_FILE = os.path.join(DATA_DIR, 'DIVIPOLA-_Códigos_municipios_20251128.csv')
+
+# Tasa -> (columna de eventos o None si se reconstruye desde la tasa, columna de expuestos, escala, modelo)
+TASAS_SUAVIZADO = {
+    'tasa_mortalidad_fetal': ('defunciones_fetales', 'total_nacimientos', 1000, 'poisson'),
+    'tasa_mortalidad_neonatal': (None, 'total_nacimientos', 1000, 'binomial'),
+    'pct_mortalidad_evitable': (None, 'total_defunciones', 100, 'binomial'),
+    'razon_mortalidad_materna': ('defunciones_maternas', 'total_nacimientos', 100000, 'poisson'),
+}
+
+SUFIJO_SUAVIZADA = '_suavizada'
+GRUPO_PRIOR = ['COD_DPTO']
+K_VECINOS = 5
+
+# ============================================================================
+# ESTIMADOR
+# ============================================================================
+
+def _varianza_muestral(m, modelo):
+    """V(m): varianza de un evento individual bajo el modelo"""
+    return m * (1 - m) if modelo == 'binomial' else m
+
+def _contraer(r, n, m, s2, nbar, modelo):
+    """Tasa suavizada r̃ = m + w·(r - m) (arreglos alineados)"""
+    v = _varianza_muestral(m, modelo)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = np.maximum(s2 - v / nbar, 0)
+        w = np.where(n > 0, A / (A + v / n), 0.0)
+    w = np.nan_to_num(w)
+    return m + w * (np.nan_to_num(r) - m)
+
+def suavizar_por_grupo(eventos, expuestos, grupos, modelo='poisson'):
+    """
+    Suavizado hacia el prior de cada grupo (p. ej. departamento).
+
+    eventos, expuestos: arreglos por municipio-año; grupos: claves alineadas.
+    Devuelve la tasa suavizada por unidad (sin escalar).
+    """
+    df = pd.DataFrame({'y': eventos, 'n': expuestos, 'g': grupos})
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['r'] = df['y'] / df['n']
+
+    g = df.groupby('g')
+    suma_y = g['y'].transform('sum')
+    suma_n = g['n'].transform('sum')
+    m = (suma_y / suma_n).fillna(0).to_numpy()
+
+    df['desvio'] = df['n'] * (df['r'].fillna(0) - m) ** 2
+    s2 = (df.groupby('g')['desvio'].transform('sum') / suma_n).fillna(0).to_numpy()
+    nbar = (suma_n / g['n'].transform('size')).to_numpy()
+
+    return _contraer(df['r'].to_numpy(), df['n'].to_numpy(), m, s2, nbar, modelo)
+
+def cargar_coordenadas_municipios():
+    """Latitud/longitud de todos los municipios DIVIPOLA (COD_MUNIC corto, como en features)"""
+    df = pd.read_csv(DIVIPOLA_FILE, sep=';', encoding='latin-1', dtype=str)
+    df.columns = ['COD_DPTO', 'NOM_DPTO', 'COD_MUNIC', 'NOMBRE_MUNICIPIO', 'TIPO', 'LONGITUD', 'LATITUD']
+    return pd.DataFrame({
+        'COD_DPTO': df['COD_DPTO'].astype(int),
+        'COD_MUNIC': df['COD_MUNIC'].astype(int) % 1000,
+        'LATITUD': df['LATITUD'].str.replace(',', '.').astype(float),
+        'LONGITUD': df['LONGITUD'].str.replace(',', '.').astype(float),
+    })
+
+def vecinos_cercanos(lat, lon, k=K_VECINOS):
+    """Índices de los k vecinos más cercanos de cada punto (incluye el propio punto)"""
+    lat0 = np.deg2rad(np.nanmean(lat))
+    puntos = np.column_stack([np.asarray(lon) * np.cos(lat0), lat])
+    k = min(k + 1, len(puntos))
+    _, indices = cKDTree(puntos).query(puntos, k=k)
+    return indices.reshape(len(puntos), k)
+
+def suavizar_espacial(eventos, expuestos, idx_mun, idx_anio, vecinos, modelo='poisson'):
+    """
+    Suavizado hacia un prior local: el propio municipio y sus vecinos en el mismo periodo.
+
+    Se arman matrices municipio × periodo de eventos y expuestos; las sumas de
+    vecindario son un solo `take` sobre la matriz de vecinos (n_mun × k).
+    """
+    n_mun, n_anios = vecinos.shape[0], int(idx_anio.max()) + 1
+    Y = np.zeros((n_mun, n_anios))
+    N = np.zeros((n_mun, n_anios))
+    np.add.at(Y, (idx_mun, idx_anio), eventos)
+    np.add.at(N, (idx_mun, idx_anio), expuestos)
+
+    Y_vec, N_vec = Y[vecinos], N[vecinos]  # (n_mun, k, n_anios)
+    suma_n = N_vec.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m = np.nan_to_num(Y_vec.sum(axis=1) / suma_n)
+        R_vec = np.nan_to_num(Y_vec / N_vec)
+        s2 = np.nan_to_num((N_vec * (R_vec - m[:, None, :]) ** 2).sum(axis=1) / suma_n)
+        nbar = suma_n / np.maximum((N_vec > 0).sum(axis=1), 1)
+
+    filas = (idx_mun, idx_anio)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.asarray(eventos, dtype=float) / np.asarray(expuestos, dtype=float)
+    return _contraer(r, np.asarray(expuestos, dtype=float), m[filas], s2[filas], nbar[filas], modelo)
+
+# ============================================================================
+# INTEGRACIÓN CON FEATURES
+# ============================================================================
+
+def agregar_tasas_suavizadas(df, espacial=False, k=K_VECINOS, coordenadas=None, columnas_periodo=('ANO',)):
+    """
+    Agrega {tasa}_suavizada para cada tasa de TASAS_SUAVIZADO.
+
+    espacial=False: prior departamental. espacial=True: prior con los k vecinos
+    más cercanos en el mismo periodo (columnas_periodo: año, o año + mes/trimestre);
+    los municipios sin coordenadas usan el prior departamental.
+    """
+    df = df.copy()
+    grupos = df[GRUPO_PRIOR].astype(str).agg('-'.join, axis=1).to_numpy()
+
+    if espacial:
+        coords = coordenadas if coordenadas is not None else cargar_coordenadas_municipios()
+        claves = df[['COD_DPTO', 'COD_MUNIC']].astype(int)
+        municipios = claves.drop_duplicates().merge(coords, on=['COD_DPTO', 'COD_MUNIC'], how='left')
+        con_coords = municipios['LATITUD'].notna().to_numpy()
+        municipios = municipios[con_coords].reset_index(drop=True)
+
+        vecinos = vecinos_cercanos(municipios['LATITUD'].to_numpy(), municipios['LONGITUD'].to_numpy(), k)
+        idx_mun = claves.merge(municipios.reset_index(), on=['COD_DPTO', 'COD_MUNIC'], how='left')['index'].to_numpy()
+        tiene_vecinos = ~np.isnan(idx_mun)
+        idx_anio = df.groupby(list(columnas_periodo), sort=True).ngroup().to_numpy()
+
+    for tasa, (col_eventos, col_expuestos, escala, modelo) in TASAS_SUAVIZADO.items():
+        if tasa not in df.columns or col_expuestos not in df.columns:
+            continue
+
+        expuestos = df[col_expuestos].to_numpy(dtype=float)
+        if col_eventos is not None and col_eventos in df.columns:
+            eventos = df[col_eventos].to_numpy(dtype=float)
+        else:
+            eventos = np.rint(df[tasa].to_numpy(dtype=float) * expuestos / escala)
+
+        suavizada = suavizar_por_grupo(eventos, expuestos, grupos, modelo)
+        if espacial and tiene_vecinos.any():
+            suavizada[tiene_vecinos] = suavizar_espacial(
+                eventos[tiene_vecinos], expuestos[tiene_vecinos],
+                idx_mun[tiene_vecinos].astype(int), idx_anio[tiene_vecinos], vecinos, modelo,
+            )
+
+        df[f'{tasa}{SUFIJO_SUAVIZADA}'] = suavizada * escala
+
+    return df
@@ -22,6 +22,14 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from almacen_features import FEATURES_MODELO, derivar_features, tabla_features
+from almacenamiento import guardar_tabla, leer_tabla
+from explicaciones import generar_cache_explicaciones
+from transformador import compilar_transformador, guardar_transformador
+from umbrales_riesgo import (ESTRATIFICACION, MIN_FILAS_ESTRATO, UMBRAL_CRITICO_MORTALIDAD,
+                             UMBRAL_CRITICO_SIN_PRENATAL, calcular_umbrales, columna_mortalidad_fetal,
+                             guardar_sketches, puntuar_riesgo, umbrales_estratificados)
+
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -63,9 +71,7 @@ def crear_indice_riesgo_obstetrico(df):
     print("MODELO 1: ÍNDICE DE RIESGO OBSTÉTRICO (HÍBRIDO)")
     print("="*80)
     
-    # UMBRALES CRÍTICOS ABSOLUTOS (OMS/Literatura médica)
-    UMBRAL_CRITICO_MORTALIDAD = 50.0  # 50‰ es 10x la tasa normal (5‰)
-    UMBRAL_CRITICO_SIN_PRENATAL = 0.5  # 50% sin atención prenatal
+    # UMBRALES CRÍTICOS ABSOLUTOS (OMS/Literatura médica, ver umbrales_riesgo.py)
     MIN_NACIMIENTOS = 10  # Filtrar municipios muy pequeños
     
     print("\n UMBRALES CRÍTICOS (alertas automáticas):")
@@ -80,38 +86,29 @@ def crear_indice_riesgo_obstetrico(df):
     if excluidos > 0:
         print(f"\n {excluidos} registros excluidos (< {MIN_NACIMIENTOS} nacimientos)")
     
-    # Calcular percentiles sobre datos filtrados
-    p25_cesarea = df_filtrado['pct_cesareas'].quantile(0.25)
-    p75_mort_fetal = df_filtrado['tasa_mortalidad_fetal'].quantile(0.75)
-    p75_sin_prenatal = df_filtrado['pct_sin_control_prenatal'].quantile(0.75)
-    p75_bajo_peso = df_filtrado['pct_bajo_peso'].quantile(0.75)
-    p75_prematuro = df_filtrado['pct_prematuros'].quantile(0.75)
-    p75_presion_obs = df_filtrado['presion_obstetrica'].quantile(0.75)
+    # Tasa fetal suavizada (empírico-bayes) si features.py la generó
+    col_mort_fetal = columna_mortalidad_fetal(df.columns)
+    
+    # Percentiles sobre datos filtrados: sketches por departamento combinados
+    umbrales, sketches = calcular_umbrales(df_filtrado, col_mort_fetal)
+    umbrales_fila, por_estrato = umbrales, None
+    if ESTRATIFICACION is not None:
+        umbrales_fila, por_estrato = umbrales_estratificados(df_filtrado, ESTRATIFICACION, col_mort_fetal, umbrales)
     
     print("\n Criterios basados en percentiles:")
-    print(f"  - Tasa mortalidad fetal > {p75_mort_fetal:.2f}‰")
-    print(f"  - % sin control prenatal > {p75_sin_prenatal:.2%}")
-    print(f"  - % bajo peso > {p75_bajo_peso:.2%}")
-    print(f"  - % prematuro > {p75_prematuro:.2%}")
-    print(f"  - % cesárea < {p25_cesarea:.2%}")
-    print(f"  - Presión obstétrica > {p75_presion_obs:.1f}")
-    
-    # Calcular puntuación para datos filtrados (0-8 puntos máximo)
-    df_filtrado['puntos_riesgo'] = 0
-    
-    # Criterios con peso normal (1 punto c/u)
-    df_filtrado.loc[df_filtrado['tasa_mortalidad_fetal'] > p75_mort_fetal, 'puntos_riesgo'] += 1
-    df_filtrado.loc[df_filtrado['pct_bajo_peso'] > p75_bajo_peso, 'puntos_riesgo'] += 1
-    df_filtrado.loc[df_filtrado['pct_prematuros'] > p75_prematuro, 'puntos_riesgo'] += 1
-    df_filtrado.loc[df_filtrado['pct_cesareas'] < p25_cesarea, 'puntos_riesgo'] += 1
-    df_filtrado.loc[df_filtrado['presion_obstetrica'] > p75_presion_obs, 'puntos_riesgo'] += 1
-    
-    # Criterio de atención prenatal (peso doble si es extremo)
-    df_filtrado.loc[df_filtrado['pct_sin_control_prenatal'] > p75_sin_prenatal, 'puntos_riesgo'] += 1
-    df_filtrado.loc[df_filtrado['pct_sin_control_prenatal'] > UMBRAL_CRITICO_SIN_PRENATAL, 'puntos_riesgo'] += 1
-    
-    # ALERTA CRÍTICA: Mortalidad extrema suma +3 puntos (garantiza alto riesgo)
-    df_filtrado.loc[df_filtrado['tasa_mortalidad_fetal'] > UMBRAL_CRITICO_MORTALIDAD, 'puntos_riesgo'] += 3
+    print(f"  - Tasa mortalidad fetal > {umbrales['p75_mort_fetal']:.2f}‰ ({col_mort_fetal})")
+    print(f"  - % sin control prenatal > {umbrales['p75_sin_prenatal']:.2%}")
+    print(f"  - % bajo peso > {umbrales['p75_bajo_peso']:.2%}")
+    print(f"  - % prematuro > {umbrales['p75_prematuro']:.2%}")
+    print(f"  - % cesárea < {umbrales['p25_cesarea']:.2%}")
+    print(f"  - Presión obstétrica > {umbrales['p75_presion_obs']:.1f}")
+    if por_estrato is not None:
+        print(f"\n Percentiles estratificados por {ESTRATIFICACION} ({len(por_estrato)} estratos, "
+              f"{(por_estrato['filas'] < MIN_FILAS_ESTRATO).sum()} con < {MIN_FILAS_ESTRATO} registros usan el global):")
+        print(por_estrato.round(2).to_string())
+    
+    # Puntuación para datos filtrados (percentiles + alertas críticas)
+    df_filtrado['puntos_riesgo'] = puntuar_riesgo(df_filtrado, umbrales_fila, col_mort_fetal)
     
     # Marcar municipios excluidos con puntos = -1
     df['puntos_riesgo'] = -1
@@ -135,12 +132,12 @@ def crear_indice_riesgo_obstetrico(df):
     print(f"  - Bajo riesgo: {bajo_riesgo:,} ({bajo_riesgo/total_validos:.1%})")
     
     # Mostrar municipios con mortalidad crítica
-    criticos = df[df['tasa_mortalidad_fetal'] > UMBRAL_CRITICO_MORTALIDAD]
+    criticos = df[df[col_mort_fetal] > UMBRAL_CRITICO_MORTALIDAD]
     if len(criticos) > 0:
         print(f"\n ALERTA: {len(criticos)} municipios con mortalidad >50‰:")
         for _, row in criticos.iterrows():
             print(f"    - Código {int(row['COD_DPTO'])}-{int(row['COD_MUNIC'])} ({int(row['ANO'])}): "
-                  f"{row['tasa_mortalidad_fetal']:.1f}‰ | {int(row['total_nacimientos'])} nac | "
+                  f"{row[col_mort_fetal]:.1f}‰ | {int(row['total_nacimientos'])} nac | "
                   f"Puntaje: {int(row['puntos_riesgo'])}")
     
     # Guardar umbrales para uso en producción
@@ -148,17 +145,17 @@ def crear_indice_riesgo_obstetrico(df):
         'min_nacimientos': MIN_NACIMIENTOS,
         'umbral_critico_mortalidad': UMBRAL_CRITICO_MORTALIDAD,
         'umbral_critico_sin_prenatal': UMBRAL_CRITICO_SIN_PRENATAL,
-        'p25_cesarea': p25_cesarea,
-        'p75_mort_fetal': p75_mort_fetal,
-        'p75_sin_prenatal': p75_sin_prenatal,
-        'p75_bajo_peso': p75_bajo_peso,
-        'p75_prematuro': p75_prematuro,
-        'p75_presion_obs': p75_presion_obs
+        **umbrales,
+        'estratificacion': ESTRATIFICACION,
+        'umbrales_por_estrato': por_estrato,
     }
     
     with open(f'{MODEL_DIR}umbral_riesgo_obstetrico.pkl', 'wb') as f:
         pickle.dump(umbral, f)
     
+    # Sketches de los percentiles: permiten actualizar los umbrales con datos nuevos
+    guardar_sketches(sketches, f'{MODEL_DIR}sketches_umbrales.pkl')
+    
     return df
 
 # ============================================================================
@@ -179,6 +176,9 @@ def preparar_datos_mortalidad(df):
     # ========================================================================
     print("\n[1/4] Limpiando y validando datos...")
     
+    # El target es la tasa bruta: municipios-año con < 10 nacimientos son ruido (filtro OMS)
+    df = df[df['total_nacimientos'] >= 10].copy()
+    
     # Reemplazar infinitos y valores extremos
     df = df.replace([np.inf, -np.inf], np.nan)
     
@@ -215,7 +215,8 @@ def preparar_datos_mortalidad(df):
     
     # Calcular tasa de mortalidad por 1000 nacimientos
     print("\n[2/4] Calculando target...")
-    df['tasa_mortalidad_infantil'] = (df['total_defunciones'] / df['total_nacimientos']) * 1000
+    # Misma definición del objetivo que el almacén de features (almacen_features.py)
+    df = derivar_features(df, columnas=['tasa_mortalidad_infantil'])
     
     # Estadísticas del target
     print(f"\n[3/4] Estadísticas de Tasa de Mortalidad Infantil (‰):")
@@ -238,11 +239,10 @@ def preparar_datos_mortalidad(df):
     print(f"  - Alto (10-20‰): {alto} ({alto/len(df):.1%})")
     print(f"  - Crítico (>20‰): {critico} ({critico/len(df):.1%})")
     
-    # Features para el modelo (excluir IDs, targets y variables derivadas)
-    features_excluir = ['COD_DPTO', 'COD_MUNIC', 'ANO', 'riesgo_obstetrico', 'puntos_riesgo', 
-                        'alta_mortalidad', 'tasa_mortalidad_infantil', 'total_defunciones']
-    
-    feature_cols = [col for col in df.columns if col not in features_excluir]
+    # Features para el modelo: lista explícita del almacén (IDs, objetivo, intervalos y
+    # familias que reutilizan las defunciones del objetivo nunca entran por omisión)
+    df = derivar_features(df, columnas=FEATURES_MODELO)
+    feature_cols = list(FEATURES_MODELO)
     
     X = df[feature_cols].copy()
     y = df['tasa_mortalidad_infantil'].copy()
@@ -319,8 +319,8 @@ def entrenar_modelo_mortalidad(X, y, feature_cols):
         idx_mort_fetal = feature_cols.index('tasa_mortalidad_fetal')
         idx_mort_neonatal = feature_cols.index('tasa_mortalidad_neonatal')
         
-        mort_fetal = X_test.iloc[i][idx_mort_fetal]
-        mort_neonatal = X_test.iloc[i][idx_mort_neonatal]
+        mort_fetal = X_test.iloc[i, idx_mort_fetal]
+        mort_neonatal = X_test.iloc[i, idx_mort_neonatal]
         
         # REGLA 1: Coherencia epidemiológica - Techo según contexto
         # Si mort_neonatal es baja y mort_fetal es baja, NO puede haber alta mortalidad infantil
@@ -366,8 +366,8 @@ def entrenar_modelo_mortalidad(X, y, feature_cols):
         idx_mort_fetal = feature_cols.index('tasa_mortalidad_fetal')
         idx_mort_neonatal = feature_cols.index('tasa_mortalidad_neonatal')
         
-        mort_fetal = X_test.iloc[i][idx_mort_fetal]
-        mort_neonatal = X_test.iloc[i][idx_mort_neonatal]
+        mort_fetal = X_test.iloc[i, idx_mort_fetal]
+        mort_neonatal = X_test.iloc[i, idx_mort_neonatal]
         
         # Solo aplicar piso si NO es contexto de excelencia
         if not (mort_neonatal <= 2 and mort_fetal <= 5):
@@ -378,8 +378,8 @@ def entrenar_modelo_mortalidad(X, y, feature_cols):
         idx_mort_fetal = feature_cols.index('tasa_mortalidad_fetal')
         idx_mort_neonatal = feature_cols.index('tasa_mortalidad_neonatal')
         
-        mort_fetal = X_train.iloc[i][idx_mort_fetal]
-        mort_neonatal = X_train.iloc[i][idx_mort_neonatal]
+        mort_fetal = X_train.iloc[i, idx_mort_fetal]
+        mort_neonatal = X_train.iloc[i, idx_mort_neonatal]
         
         if not (mort_neonatal <= 2 and mort_fetal <= 5):
             y_pred_train[i] = max(y_pred_train[i], 3.0)
@@ -499,7 +499,7 @@ def main():
     
     # Cargar features
     print(f"\nCargando features desde {FEATURES_FILE}...")
-    df = pd.read_csv(FEATURES_FILE)
+    df = leer_tabla(FEATURES_FILE)
     print(f"  → {len(df):,} registros cargados")
     print(f"  → {len(df.columns)} columnas")
     
@@ -516,10 +516,18 @@ def main():
     X, y, feature_cols = preparar_datos_mortalidad(df)
     
     # Guardar dataset con labels (incluyendo tasa_mortalidad_infantil)
-    df.to_csv(f'{DATA_DIR}features_alerta_materna.csv', index=False)
-    print(f"\n Dataset con labels guardado en {DATA_DIR}features_alerta_materna.csv")
+    destino = guardar_tabla(df, f'{DATA_DIR}features_alerta_materna.csv', 'train_model.py')
+    print(f"\n Dataset con labels guardado en {destino}")
     model, scaler, importances = entrenar_modelo_mortalidad(X, y, feature_cols)
     
+    # El dashboard lee modelo, transformador, nombres y caché SHAP juntos: se reescriben
+    # todos con este modelo (retrain_model_v2.py hace lo mismo con el suyo)
+    transformador = compilar_transformador(feature_cols, scaler, X.median().to_numpy())
+    guardar_transformador(transformador, f'{MODEL_DIR}transformador_features.pkl')
+    with open(f'{MODEL_DIR}feature_names.pkl', 'wb') as f:
+        pickle.dump(feature_cols, f)
+    generar_cache_explicaciones(model, transformador, tabla_features(), MODEL_DIR)
+    
     # No guardamos umbral porque ahora es regresión (no hay umbral de clasificación)
     
     print("\n" + "="*80)
@@ -530,6 +538,8 @@ def main():
     print(f"  - {DATA_DIR}feature_importance_mortality.csv")
     print(f"  - {MODEL_DIR}modelo_mortalidad_xgb.pkl")
     print(f"  - {MODEL_DIR}scaler_mortalidad.pkl")
+    print(f"  - {MODEL_DIR}transformador_features.pkl")
+    print(f"  - {MODEL_DIR}feature_names.pkl")
     print(f"  - {MODEL_DIR}umbral_riesgo_obstetrico.pkl")
 
 if __name__ == "__main__":
@@ -27,6 +27,9 @@ from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 import os
 
+from almacen_features import tabla_features
+from transformador import compilar_transformador, guardar_transformador
+
 warnings.filterwarnings('ignore')
 
 # ============================================================================
@@ -48,15 +51,13 @@ def cargar_datos():
     print("CARGA DE DATOS")
     print("="*70)
     
-    df = pd.read_csv(f'{DATA_DIR}features_municipio_anio.csv')
+    # Incluye el objetivo (tasa_mortalidad_infantil) del almacén de features
+    df = tabla_features()
     
     # Filtrar municipios con suficientes nacimientos
     MIN_NAC = 10
     df = df[df['total_nacimientos'] >= MIN_NAC].copy()
     
-    # Calcular target
-    df['tasa_mortalidad_infantil'] = (df['total_defunciones'] / df['total_nacimientos']) * 1000
-    
     print(f"Registros: {len(df)}")
     print(f"Target - Media: {df['tasa_mortalidad_infantil'].mean():.2f}‰")
     print(f"Target - Mediana: {df['tasa_mortalidad_infantil'].median():.2f}‰")
@@ -244,6 +245,11 @@ def main():
         pickle.dump(feature_cols, f)
     print(f"✓ {MODEL_DIR}feature_names_quantile.pkl")
     
+    # Transformador compilado (imputación + escalado) que usa el dashboard
+    guardar_transformador(compilar_transformador(feature_cols, scaler, imputer.statistics_),
+                          f'{MODEL_DIR}transformador_quantile.pkl')
+    print(f"✓ {MODEL_DIR}transformador_quantile.pkl")
+    
     # Actualizar versión
     with open(f'{MODEL_DIR}MODEL_VERSION.txt', 'w') as f:
         f.write("v3.0 - Quantile Models (P10, P50, P90)\n")
@@ -0,0 +1,123 @@
+"""
+Transformador compilado de features: vector crudo -> arreglo escalado del modelo.
+
+Entrenamiento y dashboard aplican exactamente la misma secuencia:
+
+    1. features derivadas (DEFINICIONES de almacen_features.py)
+    2. imputación con las medianas del entrenamiento
+    3. escalado (RobustScaler / StandardScaler)
+
+compilar_transformador() resuelve una vez el orden de columnas, las
+definiciones necesarias y los parámetros del imputador y el scaler;
+transformar() es NumPy puro sobre arreglos (1 fila o millones), sin construir
+DataFrames ni alinear columnas en cada predicción.
+
+El transformador es un dict serializable con pickle:
+    models/transformador_features.pkl   (modelo de mortalidad, retrain_model_v2)
+    models/transformador_quantile.pkl   (modelos P10/P50/P90)
+
+Proyecto: AlertaMaterna
+"""
+
+import pickle
+
+import numpy as np
+
+from almacen_features import DEFINICIONES
+
+# Distancia (en escalas del scaler) a partir de la cual una entrada queda fuera
+# de lo visto en el entrenamiento
+LIMITE_ESCALAS = 4.0
+
+# ============================================================================
+# COMPILACIÓN
+# ============================================================================
+
+def compilar_transformador(feature_cols, scaler, medianas):
+    """
+    Plan de transformación para un modelo ya entrenado.
+
+    feature_cols: columnas del modelo en orden; scaler: el ajustado en el
+    entrenamiento; medianas: las del imputador (SimpleImputer.statistics_).
+    """
+    feature_cols = list(feature_cols)
+
+    # Entradas crudas: features directas del modelo + insumos de las derivadas
+    entradas = [c for c in feature_cols if c not in DEFINICIONES]
+    for c in feature_cols:
+        if c in DEFINICIONES:
+            entradas += [e for e in DEFINICIONES[c][1] if e not in entradas]
+
+    # Por cada columna de salida: índice de entrada o función derivada
+    pasos = [
+        (j, None, entradas.index(c)) if c not in DEFINICIONES else (j, DEFINICIONES[c][0], None)
+        for j, c in enumerate(feature_cols)
+    ]
+
+    # RobustScaler: center_ (None sin centrado); StandardScaler: mean_ solo si with_mean
+    if hasattr(scaler, 'center_'):
+        centro = scaler.center_
+    else:
+        centro = scaler.mean_ if scaler.with_mean else None
+
+    return {
+        'feature_cols': feature_cols,
+        'entradas': entradas,
+        'pasos': pasos,
+        'medianas': np.asarray(medianas, dtype=np.float64),
+        'centro': np.zeros(len(feature_cols)) if centro is None else np.asarray(centro, dtype=np.float64),
+        'escala': np.ones(len(feature_cols)) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64),
+    }
+
+# ============================================================================
+# APLICACIÓN
+# ============================================================================
+
+def transformar(transformador, X_crudo):
+    """
+    X_crudo: (filas, entradas) o un solo vector, columnas en transformador['entradas'].
+    Devuelve (filas, features) escalado, listo para model.predict.
+    """
+    X = np.asarray(X_crudo, dtype=np.float64)
+    X = X.reshape(1, -1) if X.ndim == 1 else X
+    columnas = {c: X[:, i] for i, c in enumerate(transformador['entradas'])}
+
+    salida = np.empty((X.shape[0], len(transformador['feature_cols'])))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for j, funcion, i in transformador['pasos']:
+            salida[:, j] = X[:, i] if funcion is None else funcion(columnas)
+
+    faltantes = np.isnan(salida)
+    if faltantes.any():
+        salida[faltantes] = np.broadcast_to(transformador['medianas'], salida.shape)[faltantes]
+
+    salida -= transformador['centro']
+    salida /= transformador['escala']
+    return salida
+
+def fuera_de_rango(transformador, X_escalado, limite=LIMITE_ESCALAS):
+    """
+    Features de una fila escalada a más de `limite` escalas del centro del
+    entrenamiento: {columna: escalas}. Señala entradas en otras unidades o con
+    otra definición que la tabla de entrenamiento.
+    """
+    fila = np.asarray(X_escalado, dtype=np.float64).reshape(-1)
+    return {c: float(z) for c, z in zip(transformador['feature_cols'], fila) if abs(z) > limite}
+
+def vector_entrada(transformador, valores):
+    """Vector crudo de una fila desde un dict {columna: valor} (faltantes -> NaN -> mediana)"""
+    return np.array([valores.get(c, np.nan) for c in transformador['entradas']], dtype=np.float64)
+
+# ============================================================================
+# PERSISTENCIA
+# ============================================================================
+
+def guardar_transformador(transformador, ruta):
+    """Guarda el transformador junto al modelo"""
+    with open(ruta, 'wb') as f:
+        pickle.dump(transformador, f)
+
+def cargar_transformador(ruta):
+    """Carga un transformador guardado con guardar_transformador"""
+    with open(ruta, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,333 @@
+"""
+Umbrales percentiles del índice de riesgo obstétrico con sketches de cuantiles.
+
+El índice suma puntos cuando un municipio-periodo supera el p75 (o queda bajo
+el p25) de seis indicadores. En lugar de quantile() sobre la tabla completa en
+memoria, cada indicador se resume en un sketch KLL (Karnin, Lang, Liberty
+2016) que:
+
+- se calcula por partición (p. ej. departamento) y se combina sin ordenar
+  la tabla global: combinar_sketches() es asociativa;
+- se actualiza incrementalmente cuando llegan nuevos municipios-mes
+  (actualizar_umbrales), sin releer lo ya procesado;
+- es exacto mientras el sketch no se compacta (≤ K_SKETCH valores por
+  indicador, como las tablas anuales actuales) y, por encima, tiene un error
+  de rango del orden de 1/K_SKETCH.
+
+Los sketches del entrenamiento se guardan en models/sketches_umbrales.pkl. Al
+cerrar un periodo, sus features se incorporan a esos sketches y a los umbrales
+globales de models/umbral_riesgo_obstetrico.pkl sin releer la tabla histórica:
+
+    python umbrales_riesgo.py --actualizar ../data/processed/features_2025.csv
+
+Estratificación (ESTRATIFICACION): los umbrales pueden calcularse por año,
+departamento o banda de tamaño (nacimientos) para no comparar un municipio
+grande del Meta con uno remoto del Vichada en la misma escala. Los seis
+percentiles de todos los estratos salen de una sola llamada agrupada a
+quantile() y se devuelven alineados por índice a cada fila; los estratos con
+menos de MIN_FILAS_ESTRATO registros usan los umbrales globales.
+
+Proyecto: AlertaMaterna
+"""
+
+import argparse
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento import leer_tabla
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+MODEL_DIR = '../models/'
+SKETCHES_FILE = f'{MODEL_DIR}sketches_umbrales.pkl'
+UMBRAL_FILE = f'{MODEL_DIR}umbral_riesgo_obstetrico.pkl'
+
+K_SKETCH = 1024
+FACTOR_CAPACIDAD = 2 / 3
+
+# Umbral -> (columna, cuantil). 'tasa_mortalidad_fetal' puede reemplazarse por la suavizada
+INDICADORES = {
+    'p75_mort_fetal': ('tasa_mortalidad_fetal', 0.75),
+    'p75_sin_prenatal': ('pct_sin_control_prenatal', 0.75),
+    'p75_bajo_peso': ('pct_bajo_peso', 0.75),
+    'p75_prematuro': ('pct_prematuros', 0.75),
+    'p25_cesarea': ('pct_cesareas', 0.25),
+    'p75_presion_obs': ('presion_obstetrica', 0.75),
+}
+
+# Tasa fetal del índice en orden de preferencia: la suavizada (suavizado.py) si la tabla la tiene
+COLUMNAS_MORT_FETAL = ['tasa_mortalidad_fetal_suavizada', 'tasa_mortalidad_fetal']
+
+# Estratificación de los percentiles: None (global), 'anio', 'departamento', 'tamano'
+# o una lista (p. ej. ['departamento', 'anio'])
+ESTRATIFICACION = None
+ESTRATOS = {'anio': 'ANO', 'departamento': 'COD_DPTO', 'tamano': 'BANDA_TAMANO'}
+BANDAS_TAMANO = [0, 50, 200, 1000, np.inf]  # nacimientos por municipio-periodo
+ETIQUETAS_TAMANO = ['<50', '50-199', '200-999', '1000+']
+MIN_FILAS_ESTRATO = 20
+
+# Umbrales críticos absolutos (OMS/literatura médica)
+UMBRAL_CRITICO_MORTALIDAD = 50.0  # 50‰ es 10x la tasa normal (5‰)
+UMBRAL_CRITICO_SIN_PRENATAL = 0.5  # 50% sin atención prenatal
+
+# ============================================================================
+# SKETCH KLL
+# ============================================================================
+
+def nuevo_sketch(k=K_SKETCH):
+    """Sketch vacío: niveles[h] guarda valores con peso 2^h"""
+    return {'k': k, 'niveles': [np.empty(0)], 'n': 0, 'compactaciones': 0}
+
+def _capacidad(sketch, nivel):
+    """Capacidad del nivel: k en el nivel superior, decreciendo (2/3)^profundidad hacia abajo"""
+    altura = len(sketch['niveles'])
+    return max(2, int(np.ceil(sketch['k'] * FACTOR_CAPACIDAD ** (altura - 1 - nivel))))
+
+def _compactar(sketch):
+    """Compacta el primer nivel sobre su capacidad hasta que todos caben"""
+    while True:
+        llenos = [h for h, items in enumerate(sketch['niveles']) if len(items) > _capacidad(sketch, h)]
+        if not llenos:
+            return sketch
+        h = llenos[0]
+        if h + 1 == len(sketch['niveles']):
+            sketch['niveles'].append(np.empty(0))
+
+        items = np.sort(sketch['niveles'][h])
+        resto = items[-1:] if len(items) % 2 else items[:0]
+        pares = items[:len(items) - len(resto)]
+        # Desplazamiento alternado (versión determinista del sorteo de KLL)
+        desplazamiento = sketch['compactaciones'] % 2
+        sketch['compactaciones'] += 1
+
+        sketch['niveles'][h] = resto
+        sketch['niveles'][h + 1] = np.concatenate([sketch['niveles'][h + 1], pares[desplazamiento::2]])
+
+def actualizar_sketch(sketch, valores):
+    """Agrega un lote de valores (los NaN se ignoran, como en quantile())"""
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    sketch['niveles'][0] = np.concatenate([sketch['niveles'][0], valores])
+    sketch['n'] += len(valores)
+    return _compactar(sketch)
+
+def combinar_sketches(a, b):
+    """Sketch de la unión de los datos de a y b (no modifica los originales)"""
+    altura = max(len(a['niveles']), len(b['niveles']))
+    niveles = [
+        np.concatenate([s['niveles'][h] for s in (a, b) if h < len(s['niveles'])])
+        for h in range(altura)
+    ]
+    combinado = {
+        'k': max(a['k'], b['k']),
+        'niveles': niveles,
+        'n': a['n'] + b['n'],
+        'compactaciones': a['compactaciones'] + b['compactaciones'],
+    }
+    return _compactar(combinado)
+
+def cuantil_sketch(sketch, q):
+    """Cuantil q; sin compactaciones es exacto (interpolación lineal, igual que pandas)"""
+    if sketch['n'] == 0:
+        return np.nan
+    if len(sketch['niveles']) == 1:
+        return float(np.quantile(sketch['niveles'][0], q))
+
+    valores = np.concatenate(sketch['niveles'])
+    pesos = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(sketch['niveles'])])
+    orden = np.argsort(valores, kind='stable')
+    acumulado = np.cumsum(pesos[orden])
+    i = np.searchsorted(acumulado, q * acumulado[-1], side='left')
+    return float(valores[orden][min(i, len(valores) - 1)])
+
+# ============================================================================
+# UMBRALES DEL ÍNDICE DE RIESGO
+# ============================================================================
+
+def columna_mortalidad_fetal(columnas):
+    """Columna de mortalidad fetal del índice (la misma en entrenamiento, dashboard y verificación)"""
+    return next(c for c in COLUMNAS_MORT_FETAL if c in columnas)
+
+def _columnas(col_mort_fetal):
+    return {umbral: (col_mort_fetal if col == 'tasa_mortalidad_fetal' else col, q)
+            for umbral, (col, q) in INDICADORES.items()}
+
+def sketches_tabla(df, col_mort_fetal='tasa_mortalidad_fetal', k=K_SKETCH):
+    """Un sketch por indicador para una tabla (o partición)"""
+    return {umbral: actualizar_sketch(nuevo_sketch(k), df[col].to_numpy())
+            for umbral, (col, _) in _columnas(col_mort_fetal).items()}
+
+def combinar_umbrales(a, b):
+    """Combina dos juegos de sketches indicador por indicador"""
+    return {umbral: combinar_sketches(a[umbral], b[umbral]) for umbral in a}
+
+def umbrales_desde_sketches(sketches):
+    """Valores de los umbrales (p25/p75) a partir de los sketches"""
+    return {umbral: cuantil_sketch(sketches[umbral], q) for umbral, (_, q) in INDICADORES.items()}
+
+def calcular_umbrales(df, col_mort_fetal='tasa_mortalidad_fetal', particion='COD_DPTO', procesos=1):
+    """
+    Sketches por partición (en paralelo si procesos > 1) combinados en los umbrales globales.
+
+    Devuelve (umbrales, sketches) para poder actualizarlos después.
+    """
+    if particion is None or particion not in df.columns:
+        partes = [df]
+    else:
+        partes = [grupo for _, grupo in df.groupby(particion, sort=False)]
+
+    if procesos > 1 and len(partes) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+            parciales = list(ejecutor.map(sketches_tabla, partes, [col_mort_fetal] * len(partes)))
+    else:
+        parciales = [sketches_tabla(parte, col_mort_fetal) for parte in partes]
+
+    sketches = parciales[0]
+    for parcial in parciales[1:]:
+        sketches = combinar_umbrales(sketches, parcial)
+    return umbrales_desde_sketches(sketches), sketches
+
+def umbrales_por_partes(partes, col_mort_fetal='tasa_mortalidad_fetal'):
+    """Umbrales globales desde un iterable de DataFrames (p. ej. leídos partición por partición)"""
+    sketches = None
+    for parte in partes:
+        parcial = sketches_tabla(parte, col_mort_fetal)
+        sketches = parcial if sketches is None else combinar_umbrales(sketches, parcial)
+    return umbrales_desde_sketches(sketches), sketches
+
+def actualizar_umbrales(sketches, df_nuevo, col_mort_fetal='tasa_mortalidad_fetal'):
+    """Incorpora nuevos municipios-periodo a sketches existentes"""
+    sketches = combinar_umbrales(sketches, sketches_tabla(df_nuevo, col_mort_fetal))
+    return umbrales_desde_sketches(sketches), sketches
+
+def claves_estrato(estratificacion):
+    """Columnas de agrupación para un modo de estratificación (texto o lista)"""
+    modos = [estratificacion] if isinstance(estratificacion, str) else list(estratificacion)
+    invalidos = [m for m in modos if m not in ESTRATOS]
+    if invalidos:
+        raise ValueError(f"Estratificación inválida: {invalidos} (opciones: {list(ESTRATOS)})")
+    return [ESTRATOS[m] for m in modos]
+
+def columnas_indicadores(col_mort_fetal='tasa_mortalidad_fetal'):
+    """Columnas que necesitan los umbrales (para leer solo esas)"""
+    return list(dict.fromkeys(col for col, _ in _columnas(col_mort_fetal).values()))
+
+def _datos_estrato(df, claves, columnas=()):
+    """Columnas pedidas más las claves de estrato (la banda de tamaño se calcula aquí)"""
+    datos = df[list(columnas)].copy()
+    for clave in claves:
+        if clave == 'BANDA_TAMANO':
+            datos[clave] = pd.cut(df['total_nacimientos'], BANDAS_TAMANO, right=False, labels=ETIQUETAS_TAMANO)
+        else:
+            datos[clave] = df[clave]
+    return datos
+
+def tabla_estratos(df, estratificacion, col_mort_fetal='tasa_mortalidad_fetal'):
+    """Umbrales de todos los estratos con una sola llamada agrupada (más 'filas' por estrato)"""
+    columnas = _columnas(col_mort_fetal)
+    claves = claves_estrato(estratificacion)
+    grupos = _datos_estrato(df, claves, columnas_indicadores(col_mort_fetal)).groupby(claves, observed=True)
+    cuantiles = grupos.quantile([0.25, 0.75])
+    tabla = pd.DataFrame({umbral: cuantiles[col].xs(q, level=-1) for umbral, (col, q) in columnas.items()})
+    tabla['filas'] = grupos.size()
+    return tabla
+
+def umbrales_por_fila(df, tabla, estratificacion, globales):
+    """Difunde la tabla de estratos a las filas de df por alineación de índice; estratos pequeños -> global"""
+    claves = claves_estrato(estratificacion)
+    por_fila = _datos_estrato(df, claves).join(tabla, on=claves)
+    pequenos = por_fila['filas'] < MIN_FILAS_ESTRATO
+    return por_fila[list(INDICADORES)].mask(pequenos).fillna(globales)
+
+def umbrales_estratificados(df, estratificacion, col_mort_fetal='tasa_mortalidad_fetal', globales=None):
+    """
+    Umbrales por estrato con una sola llamada agrupada, alineados a las filas de df.
+
+    Devuelve (umbrales por fila: DataFrame con el índice de df y una columna
+    por umbral, tabla por estrato). globales: respaldo para estratos pequeños.
+    """
+    tabla = tabla_estratos(df, estratificacion, col_mort_fetal)
+    if globales is None:
+        globales, _ = calcular_umbrales(df, col_mort_fetal)
+    return umbrales_por_fila(df, tabla, estratificacion, globales), tabla
+
+def puntuar_riesgo(df, umbrales, col_mort_fetal='tasa_mortalidad_fetal'):
+    """
+    Puntos de riesgo (0-10) con los criterios híbridos: percentiles + umbrales críticos.
+
+    umbrales: dict de valores globales o DataFrame por fila (umbrales_estratificados).
+    """
+    puntos = (
+        (df[col_mort_fetal] > umbrales['p75_mort_fetal']).astype(int)
+        + (df['pct_bajo_peso'] > umbrales['p75_bajo_peso']).astype(int)
+        + (df['pct_prematuros'] > umbrales['p75_prematuro']).astype(int)
+        + (df['pct_cesareas'] < umbrales['p25_cesarea']).astype(int)
+        + (df['presion_obstetrica'] > umbrales['p75_presion_obs']).astype(int)
+        # Atención prenatal: peso doble si es extrema
+        + (df['pct_sin_control_prenatal'] > umbrales['p75_sin_prenatal']).astype(int)
+        + (df['pct_sin_control_prenatal'] > UMBRAL_CRITICO_SIN_PRENATAL).astype(int)
+        # Mortalidad extrema suma +3 puntos (garantiza alto riesgo)
+        + (df[col_mort_fetal] > UMBRAL_CRITICO_MORTALIDAD).astype(int) * 3
+    )
+    return puntos
+
+# ============================================================================
+# PERSISTENCIA
+# ============================================================================
+
+def guardar_sketches(sketches, ruta):
+    with open(ruta, 'wb') as f:
+        pickle.dump(sketches, f)
+
+def cargar_sketches(ruta):
+    with open(ruta, 'rb') as f:
+        return pickle.load(f)
+
+def actualizar_archivos_umbrales(archivo_nuevo, sketches_file=SKETCHES_FILE, umbral_file=UMBRAL_FILE):
+    """
+    Incorpora las features de archivo_nuevo (periodos que no estaban en el
+    entrenamiento) a los sketches guardados y reescribe los umbrales globales.
+    Cada archivo se incorpora una sola vez: repetirlo contaría dos veces sus filas.
+    """
+    sketches = cargar_sketches(sketches_file)
+    with open(umbral_file, 'rb') as f:
+        umbral = pickle.load(f)
+
+    lote = os.path.basename(archivo_nuevo)
+    incorporados = umbral.get('lotes_incorporados', [])
+    if lote in incorporados:
+        raise ValueError(f"{lote} ya fue incorporado a {sketches_file}")
+
+    df = leer_tabla(archivo_nuevo)
+    df = df[df['total_nacimientos'] >= umbral['min_nacimientos']]
+    col_mort_fetal = columna_mortalidad_fetal(df.columns)
+
+    anteriores = {nombre: umbral[nombre] for nombre in INDICADORES}
+    umbrales, sketches = actualizar_umbrales(sketches, df, col_mort_fetal)
+    umbral.update(umbrales)
+    umbral['lotes_incorporados'] = incorporados + [lote]
+
+    guardar_sketches(sketches, sketches_file)
+    with open(umbral_file, 'wb') as f:
+        pickle.dump(umbral, f)
+
+    print(f"  → {len(df):,} municipios-periodo de {lote} incorporados "
+          f"({sketches[next(iter(INDICADORES))]['n']:,} en los sketches)")
+    for nombre in INDICADORES:
+        print(f"    {nombre:18s} {anteriores[nombre]:10.3f} → {umbral[nombre]:10.3f}")
+    if umbral.get('umbrales_por_estrato') is not None:
+        print(f"  ⚠️  Los umbrales por estrato ({umbral['estratificacion']}) no se actualizan: reentrenar con train_model.py")
+    return umbral
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Umbrales del índice de riesgo obstétrico')
+    parser.add_argument('--actualizar', metavar='ARCHIVO', required=True,
+                        help='Features de periodos nuevos: actualiza sketches y umbrales sin releer la tabla histórica')
+    args = parser.parse_args()
+    actualizar_archivos_umbrales(args.actualizar)
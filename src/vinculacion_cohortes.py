@@ -0,0 +1,221 @@
+"""
+Vinculación nacimiento–defunción para tasas de mortalidad por cohorte.
+
+La tasa de periodo (defunciones del año / nacimientos del año) asigna al año
+equivocado a los nacidos en diciembre que mueren en enero. Aquí cada
+defunción < 1 año se asigna a la cohorte (municipio de residencia, mes de
+nacimiento) de la que proviene.
+
+Los registros no comparten identificador, así que la vinculación es
+probabilística y por bloques, sin comparar nunca todos los pares:
+
+1. Meses de nacimiento candidatos según la edad al morir (GRU_ED1, con los
+   códigos del libro de códigos DANE): mes de la defunción o el anterior para
+   neonatales, 1-12 meses antes para posneonatales, con un prior por grupo de
+   edad (PRIOR_POR_EDAD).
+2. Índice de bloqueo sobre los nacimientos: conteo por (residencia, mes de
+   nacimiento, sexo, banda de peso, banda de edad materna), como arreglo
+   ordenado de claves int64 (búsqueda con np.searchsorted).
+3. Cada defunción reparte su peso entre sus candidatos en proporción a
+   prior × nacimientos del bloque. Si ningún candidato tiene nacimientos se
+   relaja el bloque (NIVELES_BLOQUEO); sin coincidencia en ningún nivel
+   queda solo el prior.
+
+Proyecto: AlertaMaterna
+"""
+
+import numpy as np
+import pandas as pd
+
+from almacen_features import id_municipio
+from diccionario_codigos import decodificar_columna, diccionario_por_fuente
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Del bloque más fino al más grueso (el mes de nacimiento candidato siempre es parte del bloque)
+NIVELES_BLOQUEO = [
+    ['SEXO', 'PESO_NAC', 'EDAD_MADRE'],
+    ['SEXO'],
+    [],
+]
+CAMPOS_BLOQUEO = ['SEXO', 'PESO_NAC', 'EDAD_MADRE']
+BASES = {'SEXO': 4, 'PESO_NAC': 16, 'EDAD_MADRE': 128}  # códigos DANE: 1-3, 1-9, 1-9/99
+DESCONOCIDOS = {'SEXO': 3, 'PESO_NAC': 9, 'EDAD_MADRE': 99}  # el registro pasa al siguiente nivel
+BASE_MES = 12 * 3000
+
+# Edad al morir (descripción de GRU_ED1 en codigos_defunciones_no_fetales_dane.csv)
+# -> meses entre el nacimiento y la defunción -> probabilidad a priori.
+# Los códigos se toman del libro de códigos (codigos_edad), no se suponen.
+PRIOR_POR_EDAD = {
+    'Menor de una hora': {0: 0.99, 1: 0.01},
+    'Menor de un día': {0: 0.98, 1: 0.02},
+    '1-6 días': {0: 0.88, 1: 0.12},    # edad media ~3.5 días
+    '7-27 días': {0: 0.44, 1: 0.56},   # edad media ~17 días
+    '28-29 días': {0: 0.08, 1: 0.92},  # mismo mes solo si muere después del día 28
+    '1-5 meses': {1: 0.1, 2: 0.2, 3: 0.2, 4: 0.2, 5: 0.2, 6: 0.1},
+    '6-11 meses': {6: 1 / 12, **{m: 1 / 6 for m in range(7, 12)}, 12: 1 / 12},
+}
+EDADES_NEONATALES = ['Menor de una hora', 'Menor de un día', '1-6 días', '7-27 días']  # < 28 días
+
+# ============================================================================
+# CODIFICACIÓN DE LA EDAD (LIBRO DE CÓDIGOS DANE)
+# ============================================================================
+
+def codigos_edad():
+    """Código GRU_ED1 de cada edad de PRIOR_POR_EDAD según el libro de códigos; falla si falta alguna"""
+    entrada = diccionario_por_fuente('defunciones_no_fetales')['GRU_ED1']
+    etiquetas = pd.Series(decodificar_columna(entrada['codigos'], entrada), index=entrada['codigos'])
+    codigos = {}
+    for edad in PRIOR_POR_EDAD:
+        encontrados = etiquetas.index[etiquetas == edad]
+        if len(encontrados) != 1:
+            raise ValueError(f"GRU_ED1 '{edad}': {len(encontrados)} códigos en el libro de códigos (se esperaba 1)")
+        codigos[edad] = int(encontrados[0])
+    return codigos
+
+def priors_desfase():
+    """PRIOR_POR_EDAD indexado por código GRU_ED1 y códigos neonatales"""
+    codigos = codigos_edad()
+    return ({codigos[edad]: prior for edad, prior in PRIOR_POR_EDAD.items()},
+            [codigos[edad] for edad in EDADES_NEONATALES])
+
+# ============================================================================
+# ÍNDICE DE BLOQUEO
+# ============================================================================
+
+def _mes_ordinal(anio, mes):
+    return np.asarray(anio, dtype=np.int64) * 12 + np.asarray(mes, dtype=np.int64) - 1
+
+def codificar_bloque(municipio, mes_ordinal, campos, valores):
+    """Clave int64 del bloque: municipio, mes y los campos del nivel (los demás en 0)"""
+    clave = np.asarray(municipio, dtype=np.int64) * BASE_MES + mes_ordinal
+    for campo in CAMPOS_BLOQUEO:
+        codigo = np.asarray(valores[campo], dtype=np.int64) if campo in campos else 0
+        clave = clave * BASES[campo] + codigo
+    return clave
+
+def indice_bloqueo(nacimientos, campos):
+    """Claves de bloque ordenadas y nacimientos por bloque"""
+    conocidos = np.ones(len(nacimientos), dtype=bool)
+    for campo in campos:
+        conocidos &= nacimientos[campo].to_numpy() != DESCONOCIDOS[campo]
+    n = nacimientos[conocidos]
+    claves = codificar_bloque(n['ID_RESIDENCIA'], n['MES_ORDINAL'], campos, n)
+    return np.unique(claves, return_counts=True)
+
+def _preparar(df, columnas):
+    """Registros con residencia, año y mes conocidos; códigos como enteros (desconocido si falta)"""
+    df = df[['CODPTORE', 'CODMUNRE', 'ANO', 'MES'] + columnas].apply(pd.to_numeric, errors='coerce')
+    df = df.dropna(subset=['CODPTORE', 'CODMUNRE', 'ANO', 'MES'])
+    df = df[df['MES'].between(1, 12)]
+    for campo in CAMPOS_BLOQUEO:
+        df[campo] = df[campo].fillna(DESCONOCIDOS[campo])
+    df = df.fillna(-1).astype(np.int64)
+    df['ID_RESIDENCIA'] = id_municipio(df['CODPTORE'], df['CODMUNRE'])
+    df['MES_ORDINAL'] = _mes_ordinal(df['ANO'], df['MES'])
+    return df.reset_index(drop=True)
+
+# ============================================================================
+# VINCULACIÓN
+# ============================================================================
+
+def vincular_defunciones(df_nac, df_def):
+    """
+    Reparte cada defunción < 1 año entre sus cohortes candidatas.
+
+    Devuelve una fila por (defunción, mes de nacimiento) con peso > 0:
+    ID_RESIDENCIA, MES_ORDINAL (de nacimiento), peso (suma 1 por defunción),
+    neonatal, nivel (índice de NIVELES_BLOQUEO; len(NIVELES_BLOQUEO) = solo prior).
+    """
+    prior_desfase, grupos_neonatales = priors_desfase()
+    nacimientos = _preparar(df_nac, CAMPOS_BLOQUEO)
+    defunciones = _preparar(df_def, CAMPOS_BLOQUEO + ['GRU_ED1'])
+    defunciones = defunciones[defunciones['GRU_ED1'].isin(list(prior_desfase))].reset_index(drop=True)
+
+    # Candidatos: una fila por (defunción, desfase posible)
+    desfases = {g: np.array(list(p)) for g, p in prior_desfase.items()}
+    priors = {g: np.array(list(p.values())) for g, p in prior_desfase.items()}
+    grupo = defunciones['GRU_ED1'].to_numpy()
+    n_cand = np.array([len(desfases[g]) for g in grupo], dtype=np.int64)
+    idx = np.repeat(np.arange(len(defunciones)), n_cand)
+    desfase = np.concatenate([desfases[g] for g in grupo]) if len(grupo) else np.zeros(0, dtype=np.int64)
+    prior = np.concatenate([priors[g] for g in grupo]) if len(grupo) else np.zeros(0)
+
+    candidatos = defunciones.iloc[idx].reset_index(drop=True)
+    candidatos['MES_ORDINAL'] = candidatos['MES_ORDINAL'].to_numpy() - desfase
+
+    # Meses anteriores al primer nacimiento registrado: se consulta el mismo mes del año
+    # siguiente (si no, toda la defunción iría al primer mes observado)
+    primer_mes = nacimientos['MES_ORDINAL'].min() if len(nacimientos) else 0
+    antes = np.maximum(primer_mes - candidatos['MES_ORDINAL'].to_numpy(), 0)
+    mes_consulta = candidatos['MES_ORDINAL'].to_numpy() + 12 * ((antes + 11) // 12)
+
+    peso = np.zeros(len(candidatos))
+    nivel_def = np.full(len(defunciones), len(NIVELES_BLOQUEO))
+    for nivel, campos in enumerate(NIVELES_BLOQUEO):
+        pendientes = nivel_def[idx] == len(NIVELES_BLOQUEO)
+        for campo in campos:
+            pendientes &= candidatos[campo].to_numpy() != DESCONOCIDOS[campo]
+        if not pendientes.any():
+            continue
+
+        claves_bloque, conteos = indice_bloqueo(nacimientos, campos)
+        c = candidatos[pendientes]
+        claves = codificar_bloque(c['ID_RESIDENCIA'], mes_consulta[pendientes], campos, c)
+        pos = np.clip(np.searchsorted(claves_bloque, claves), 0, max(len(claves_bloque) - 1, 0))
+        encontrado = (claves_bloque[pos] == claves) if len(claves_bloque) else np.zeros(len(claves), dtype=bool)
+        peso_nivel = prior[pendientes] * np.where(encontrado, conteos[pos] if len(conteos) else 0, 0)
+
+        total = np.bincount(idx[pendientes], weights=peso_nivel, minlength=len(defunciones))
+        vinculadas = (total > 0) & (nivel_def == len(NIVELES_BLOQUEO))
+        nivel_def[vinculadas] = nivel
+        usar = vinculadas[idx[pendientes]]
+        peso[np.flatnonzero(pendientes)[usar]] = peso_nivel[usar]
+
+    # Sin nacimientos en ningún bloque: solo el prior del grupo de edad
+    sin_vinculo = nivel_def[idx] == len(NIVELES_BLOQUEO)
+    peso[sin_vinculo] = prior[sin_vinculo]
+    peso /= np.bincount(idx, weights=peso, minlength=len(defunciones))[idx]
+
+    asignacion = pd.DataFrame({
+        'ID_RESIDENCIA': candidatos['ID_RESIDENCIA'].to_numpy(),
+        'MES_ORDINAL': candidatos['MES_ORDINAL'].to_numpy(),
+        'peso': peso,
+        'neonatal': np.isin(grupo[idx], grupos_neonatales),
+        'nivel': nivel_def[idx],
+    })
+    return asignacion[asignacion['peso'] > 0].reset_index(drop=True), nacimientos, defunciones
+
+def cohortes_mensuales(df_nac, df_def):
+    """
+    Nacimientos y defunciones vinculadas por cohorte (residencia, año y mes de nacimiento).
+
+    meses_seguimiento: meses de defunciones observados después del mes de
+    nacimiento (la cohorte infantil está completa con ≥ 12, la neonatal con ≥ 1).
+    """
+    asignacion, nacimientos, defunciones = vincular_defunciones(df_nac, df_def)
+    clave = ['ID_RESIDENCIA', 'MES_ORDINAL']
+
+    nac = nacimientos.groupby(clave).size().rename('nacimientos_cohorte')
+    asignacion['peso_neonatal'] = asignacion['peso'] * asignacion['neonatal']
+    muertes = asignacion.groupby(clave).agg(
+        defunciones_infantiles_cohorte=('peso', 'sum'),
+        defunciones_neonatales_cohorte=('peso_neonatal', 'sum'),
+    )
+    cohortes = pd.concat([nac, muertes], axis=1).fillna(0).reset_index()
+
+    ultimo_mes = defunciones['MES_ORDINAL'].max() if len(defunciones) else nacimientos['MES_ORDINAL'].max()
+    cohortes['meses_seguimiento'] = ultimo_mes - cohortes['MES_ORDINAL']
+    cohortes['COD_DPTO'] = cohortes['ID_RESIDENCIA'] // 1000
+    cohortes['COD_MUNIC'] = cohortes['ID_RESIDENCIA'] % 1000
+    cohortes['ANO'] = cohortes['MES_ORDINAL'] // 12
+    cohortes['MES'] = cohortes['MES_ORDINAL'] % 12 + 1
+    return cohortes.drop(columns=['ID_RESIDENCIA', 'MES_ORDINAL']), asignacion
+
+def resumen_vinculacion(asignacion):
+    """Defunciones vinculadas por nivel de bloqueo (los pesos de cada defunción suman 1)"""
+    nombres = ['+'.join(['mes'] + campos) for campos in NIVELES_BLOQUEO] + ['solo prior']
+    por_nivel = asignacion.groupby('nivel')['peso'].sum()
+    return {nombres[n]: por_nivel.get(n, 0.0) for n in range(len(nombres))}
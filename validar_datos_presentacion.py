@@ -1,10 +1,14 @@
 """
 Script para validar los datos que aparecen en la presentación
 """
-import pandas as pd
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from almacenamiento import leer_tabla
 
 # Cargar datos
-feat = pd.read_csv('data/processed/features_municipio_anio_interpretado.csv')
+feat = leer_tabla('data/processed/features_municipio_anio_interpretado.csv')
 
 print('=' * 60)
 print('VALIDACION DATOS PRESENTACION - AlertaMaterna')
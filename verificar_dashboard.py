@@ -1,11 +1,16 @@
 """
 Script para verificar qué datos muestra el dashboard
 """
-import pandas as pd
-import numpy as np
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from almacenamiento import leer_tabla
+from umbrales_riesgo import (ESTRATIFICACION, calcular_umbrales, columna_mortalidad_fetal, puntuar_riesgo,
+                             umbrales_estratificados)
 
 # Cargar datos como lo hace el dashboard
-df = pd.read_csv('data/processed/features_municipio_anio.csv')
+df = leer_tabla('data/processed/features_municipio_anio.csv')
 
 # Filtrar registros válidos (>=10 nacimientos)
 df = df[df['total_nacimientos'] >= 10].copy()
@@ -24,25 +29,11 @@ mort_ponderada = (df['tasa_mortalidad_fetal'] * df['total_nacimientos']).sum() /
 print(f'Mortalidad fetal ponderada: {mort_ponderada:.1f}‰')
 
 # Alto riesgo usando mismo algoritmo del dashboard
-UMBRAL_CRITICO_MORTALIDAD = 50.0
-UMBRAL_CRITICO_SIN_PRENATAL = 0.50
-
-p75_mort_fetal = df['tasa_mortalidad_fetal'].quantile(0.75)
-p75_sin_prenatal = df['pct_sin_control_prenatal'].quantile(0.75)
-p75_bajo_peso = df['pct_bajo_peso'].quantile(0.75)
-p75_prematuro = df['pct_prematuros'].quantile(0.75)
-p25_cesarea = df['pct_cesareas'].quantile(0.25)
-p75_presion_obs = df['presion_obstetrica'].quantile(0.75)
-
-df['puntos_riesgo'] = 0
-df.loc[df['tasa_mortalidad_fetal'] > p75_mort_fetal, 'puntos_riesgo'] += 1
-df.loc[df['pct_bajo_peso'] > p75_bajo_peso, 'puntos_riesgo'] += 1
-df.loc[df['pct_prematuros'] > p75_prematuro, 'puntos_riesgo'] += 1
-df.loc[df['pct_cesareas'] < p25_cesarea, 'puntos_riesgo'] += 1
-df.loc[df['presion_obstetrica'] > p75_presion_obs, 'puntos_riesgo'] += 1
-df.loc[df['pct_sin_control_prenatal'] > p75_sin_prenatal, 'puntos_riesgo'] += 1
-df.loc[df['pct_sin_control_prenatal'] > UMBRAL_CRITICO_SIN_PRENATAL, 'puntos_riesgo'] += 1
-df.loc[df['tasa_mortalidad_fetal'] > UMBRAL_CRITICO_MORTALIDAD, 'puntos_riesgo'] += 3
+col_mort_fetal = columna_mortalidad_fetal(df.columns)
+umbrales, _ = calcular_umbrales(df, col_mort_fetal)
+if ESTRATIFICACION is not None:
+    umbrales, _ = umbrales_estratificados(df, ESTRATIFICACION, col_mort_fetal, umbrales)
+df['puntos_riesgo'] = puntuar_riesgo(df, umbrales, col_mort_fetal)
 
 df['alto_riesgo'] = df['puntos_riesgo'] >= 3
 